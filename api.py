@@ -0,0 +1,319 @@
+# --- api.py ---
+"""Serviço HTTP sem interface para outros sistemas: avaliações, pontuação e relatórios.
+
+Usa o mesmo armazenamento (data/avaliacoes, com trava e controle de versão) e o mesmo modelo de
+critérios do sistema_final.py. As requisições são atendidas por um servidor assíncrono (aiohttp) e os
+relatórios são gerados em um pool de processos, sem bloquear as demais chamadas.
+
+Autenticação: cabeçalho "Authorization: Bearer <token>", com os tokens em config.yaml:
+
+    api:
+      tokens:
+        "<token>": <usuario>      # usuário de credentials.usernames (define nome e template)
+
+Rotas (segmento pelo nome da matriz; município pelo nome, com ?uf= se não for do MA, ou pelo código IBGE,
+ex.: /avaliacoes/Prefeitura/Bom%20Jardim ou /avaliacoes/Prefeitura/2101400):
+    GET   /saude
+    GET   /metrics                                         métricas no formato do Prometheus (só de 127.0.0.1)
+    GET   /avaliacoes/{segmento}/{municipio}               respostas + versão (ETag = hash)
+    PUT   /avaliacoes/{segmento}/{municipio}               {"respostas": {...}} substitui tudo
+    PATCH /avaliacoes/{segmento}/{municipio}               {"respostas": {...}} altera chaves (null remove)
+    GET   /avaliacoes/{segmento}/{municipio}/resultado     índice, selo e pontuação por seção
+    POST  /avaliacoes/{segmento}/{municipio}/relatorios    enfileira um relatório -> 202 {"id": ...}
+    GET   /relatorios/{id}                                 situação do trabalho
+    GET   /relatorios/{id}/arquivo                         download do PDF (ou do DOCX, se a conversão falhar)
+PUT e PATCH aceitam "If-Match: <hash>" e respondem 412 se o arquivo tiver mudado desde a leitura.
+
+Uso:
+    python api.py --porta 8600 --processos 2
+"""
+import argparse
+import asyncio
+import hmac
+import os
+import time
+import uuid
+
+import yaml
+from aiohttp import web
+from yaml.loader import SafeLoader
+
+from municipios import UF_PADRAO, codigo_municipio, municipio_por_codigo
+from modelos_relatorio import ErroModelo, modelos_vigentes
+from nucleo import (
+    ARQUIVO_CRITERIOS, CHAVE_MUNICIPIOS, PASTA_RELATORIOS, ConflitoDeVersao, TravaIndisponivel,
+    aplicar_cascata_disponibilidade, caminho_avaliacao, chave_resposta, carregar_avaliacao_com_meta, carregar_criterios, iterar_itens,
+    salvar_avaliacao, segmentos, validar_respostas, versao_criterios,
+)
+from observabilidade import TIPO_CONTEUDO_METRICAS, configurar_logs, incorporar_observacoes, retirar_observacoes, texto_metricas
+from pontuacao import calcular_indice_e_selo, calcular_pontuacao_secao
+from relatorio import criar_pool_relatorios, gerar_relatorio_novo_modelo, limpar_relatorios_antigos
+
+ARQUIVO_CONFIG = "config.yaml"
+PASTA_RELATORIOS_API = os.path.join(PASTA_RELATORIOS, "api")
+TOKEN_DE_EXEMPLO = "troque_este_token_da_api"  # o da documentação: a API não sobe com ele configurado
+VALIDADE_TRABALHOS = 3600  # segundos que um trabalho concluído fica disponível para download
+ROTAS_PUBLICAS = {"/saude", "/metrics"}
+ENDERECOS_LOCAIS = {"127.0.0.1", "::1"}
+
+
+def _executar_relatorio(respostas, municipio, segmento, matriz_perguntas, tipo_relatorio, nome_usuario, usuario_config, incluir_plano_melhoria):
+    """Roda em um processo do pool: gera o relatório e devolve (path_docx, path_pdf, erro_conversao, métricas medidas)."""
+    try:
+        path_docx, path_pdf, erro = gerar_relatorio_novo_modelo(respostas, municipio, segmento, matriz_perguntas, tipo_relatorio,
+                                                                nome_usuario, usuario_config, incluir_plano_melhoria, PASTA_RELATORIOS_API)
+    except Exception as e:
+        e.metricas = retirar_observacoes()
+        raise
+    return path_docx, path_pdf, str(erro) if erro else None, retirar_observacoes()
+
+
+def _erro(status, mensagem, **extras):
+    return web.json_response(dict(extras, erro=mensagem), status=status)
+
+
+@web.middleware
+async def autenticacao(request, handler):
+    if request.path in ROTAS_PUBLICAS:
+        return await handler(request)
+    cabecalho = request.headers.get("Authorization", "")
+    token = cabecalho[len("Bearer "):] if cabecalho.startswith("Bearer ") else ""
+    usuario = next((u for t, u in request.app["tokens"].items() if token and hmac.compare_digest(t, token)), None)
+    if usuario is None:
+        return _erro(401, "Token ausente ou inválido.")
+    request["usuario"] = usuario
+    return await handler(request)
+
+
+def _entidade(request):
+    """Valida segmento/município da URL e devolve (segmento, municipio, caminho_do_arquivo).
+    O município pode vir pelo nome (da UF em ?uf=, padrão MA) ou pelo código IBGE."""
+    matriz_completa = request.app["matriz"]
+    segmento, municipio = request.match_info["segmento"], request.match_info["municipio"]
+    uf = request.query.get("uf", UF_PADRAO).upper()
+    if segmento not in segmentos(matriz_completa):
+        raise web.HTTPNotFound(text=f"Segmento desconhecido: {segmento}")
+    registro = municipio_por_codigo(municipio) if municipio.isdigit() else None
+    if registro and registro["tipo"] == "municipio":
+        municipio, uf = registro["nome"], registro["uf"]
+    elif codigo_municipio(municipio, uf) is None:
+        raise web.HTTPNotFound(text=f"Município desconhecido: {municipio}")
+    caminho = caminho_avaliacao(segmento, municipio, request["usuario"], uf)
+    return segmento, municipio, caminho
+
+
+def _resposta_avaliacao(respostas, meta):
+    return web.json_response({"respostas": respostas, "meta": meta}, headers={"ETag": meta.get("hash") or ""})
+
+
+async def obter_avaliacao(request):
+    _, _, caminho = _entidade(request)
+    respostas, meta = await asyncio.to_thread(carregar_avaliacao_com_meta, caminho)
+    return _resposta_avaliacao(respostas, meta)
+
+
+async def _gravar(request, montar_respostas):
+    """Carrega, aplica `montar_respostas(atuais, corpo)` e grava com compare-and-swap."""
+    segmento, _, caminho = _entidade(request)
+    try:
+        corpo = await request.json()
+    except ValueError:
+        return _erro(400, "Corpo da requisição não é um JSON válido.")
+    if not isinstance(corpo, dict) or not isinstance(corpo.get("respostas"), dict):
+        return _erro(400, "Envie um objeto com a chave 'respostas'.")
+
+    matriz_perguntas = request.app["matriz"][segmento]
+    respostas_atuais, meta = await asyncio.to_thread(carregar_avaliacao_com_meta, caminho)
+    if_match = request.headers.get("If-Match", "").strip('"')
+    if if_match and if_match != meta.get("hash"):
+        return _erro(412, "A avaliação mudou desde a última leitura.", meta=meta)
+
+    # Só as chaves recebidas são validadas: arquivos antigos podem ter chaves órfãs (ver validar_avaliacoes.py).
+    erros = validar_respostas({k: v for k, v in corpo["respostas"].items() if v is not None}, matriz_perguntas)
+    if erros:
+        return _erro(422, "Respostas inválidas.", detalhes=erros)
+    novas = montar_respostas(respostas_atuais, corpo["respostas"], matriz_perguntas)
+    resultado = calcular_indice_e_selo(novas, matriz_perguntas)
+    extras = {"regras": resultado["regras"], "indice": round(resultado["indice"], 2), "selo": resultado["selo"],
+              "criterios": versao_criterios(request.app["matriz"])}
+    try:
+        nova_meta = await asyncio.to_thread(salvar_avaliacao, caminho, novas, meta, request["usuario"], extras)
+    except ConflitoDeVersao as e:
+        return _erro(409, str(e), meta=e.meta_atual)
+    except TravaIndisponivel as e:
+        return _erro(503, str(e))
+    return _resposta_avaliacao(novas, nova_meta)
+
+
+def _substituir(atuais, recebidas, matriz_perguntas):
+    return {k: v for k, v in recebidas.items() if v is not None}
+
+
+def _alterar(atuais, alteracoes, matriz_perguntas):
+    """Aplica um PATCH: null remove a chave. A cascata da Disponibilidade vem depois dos valores enviados:
+    com "Não Atende", nenhum subcritério do item fica "Atende"; com "Atende", valem os subcritérios enviados.
+    Observações enviadas no mesmo PATCH são mantidas."""
+    novas = dict(atuais)
+    for chave, valor in alteracoes.items():
+        if valor is None: novas.pop(chave, None)
+        else: novas[chave] = valor
+    for secao, item in iterar_itens(matriz_perguntas):
+        chave_disp = chave_resposta(secao, item['criterio'], "Disponibilidade")
+        chaves_sub = [chave_resposta(secao, item['criterio'], sub) for sub in item["subcriterios"] if sub != "Disponibilidade"]
+        if alteracoes.get(chave_disp) is not None and alteracoes[chave_disp] != atuais.get(chave_disp, "Atende"):
+            aplicar_cascata_disponibilidade(novas, secao, item['criterio'], item["subcriterios"], alteracoes[chave_disp])
+            for chave in chaves_sub:
+                if alteracoes.get(f"{chave}_obs") is not None: novas[f"{chave}_obs"] = alteracoes[f"{chave}_obs"]
+                if alteracoes[chave_disp] == "Atende" and alteracoes.get(chave) is not None: novas[chave] = alteracoes[chave]
+        elif novas.get(chave_disp) == "Não Atende":
+            for chave in chaves_sub:
+                if chave in alteracoes: novas[chave] = "Não Atende"
+    return novas
+
+
+async def substituir_avaliacao(request):
+    return await _gravar(request, _substituir)
+
+
+async def alterar_avaliacao(request):
+    return await _gravar(request, _alterar)
+
+
+async def obter_resultado(request):
+    segmento, _, caminho = _entidade(request)
+    respostas, meta = await asyncio.to_thread(carregar_avaliacao_com_meta, caminho)
+    matriz_perguntas = request.app["matriz"][segmento]
+    resultado = calcular_indice_e_selo(respostas, matriz_perguntas)
+    resultado["secoes"] = {secao: calcular_pontuacao_secao(respostas, perguntas, secao)
+                           for secao, perguntas in matriz_perguntas.items() if secao != CHAVE_MUNICIPIOS}
+    resultado["versao"] = meta["versao"]
+    return web.json_response(resultado)
+
+
+async def enfileirar_relatorio(request):
+    segmento, municipio, caminho = _entidade(request)
+    try:
+        opcoes = await request.json() if request.can_read_body else {}
+    except ValueError:
+        return _erro(400, "Corpo da requisição não é um JSON válido.")
+    if not isinstance(opcoes, dict):
+        return _erro(400, "Envie um objeto com as opções do relatório (ex.: {\"incluir_plano_melhoria\": true}).")
+    respostas, meta = await asyncio.to_thread(carregar_avaliacao_com_meta, caminho)
+    usuario_config = request.app["usuarios"].get(request["usuario"], {})
+    _limpar_trabalhos(request.app)
+
+    id_trabalho = uuid.uuid4().hex
+    trabalho = {"id": id_trabalho, "status": "na_fila", "segmento": segmento, "municipio": municipio,
+                "versao_avaliacao": meta["versao"], "usuario": request["usuario"], "criado_em": time.time()}
+    request.app["trabalhos"][id_trabalho] = trabalho
+    futuro = asyncio.get_running_loop().run_in_executor(
+        request.app["pool"], _executar_relatorio, respostas, municipio, segmento, request.app["matriz"][segmento],
+        opcoes.get("tipo_relatorio", "Apenas Não Conformidades"), usuario_config.get("name", request["usuario"]),
+        usuario_config, bool(opcoes.get("incluir_plano_melhoria", False)))
+    trabalho["status"] = "gerando"
+    asyncio.ensure_future(_acompanhar(trabalho, futuro))
+    return web.json_response({"id": id_trabalho, "status": trabalho["status"], "url": f"/relatorios/{id_trabalho}"}, status=202)
+
+
+async def _acompanhar(trabalho, futuro):
+    try:
+        path_docx, path_pdf, erro_conversao, metricas = await futuro
+        incorporar_observacoes(metricas)
+        trabalho.update(status="concluido", arquivo=path_pdf or path_docx, formato="pdf" if path_pdf else "docx", aviso=erro_conversao)
+    except Exception as e:
+        incorporar_observacoes(getattr(e, "metricas", None))
+        trabalho.update(status="erro", erro=str(e))
+    trabalho["concluido_em"] = time.time()
+
+
+def _limpar_trabalhos(app):
+    agora = time.time()
+    for id_trabalho, trabalho in list(app["trabalhos"].items()):
+        if agora - trabalho.get("concluido_em", agora) > VALIDADE_TRABALHOS:
+            del app["trabalhos"][id_trabalho]
+    limpar_relatorios_antigos(PASTA_RELATORIOS_API, VALIDADE_TRABALHOS)
+
+
+def _trabalho_do_usuario(request):
+    trabalho = request.app["trabalhos"].get(request.match_info["id"])
+    if trabalho is None or trabalho["usuario"] != request["usuario"]:
+        raise web.HTTPNotFound(text="Trabalho não encontrado.")
+    return trabalho
+
+
+async def situacao_relatorio(request):
+    trabalho = _trabalho_do_usuario(request)
+    return web.json_response({k: v for k, v in trabalho.items() if k != "arquivo"})
+
+
+async def baixar_relatorio(request):
+    trabalho = _trabalho_do_usuario(request)
+    if trabalho["status"] != "concluido":
+        return _erro(409, f"O relatório ainda não está pronto (situação: {trabalho['status']}).")
+    return web.FileResponse(trabalho["arquivo"], headers={"Content-Disposition": f'attachment; filename="{os.path.basename(trabalho["arquivo"])}"'})
+
+
+async def saude(request):
+    return web.json_response({"status": "ok", "trabalhos": len(request.app["trabalhos"])})
+
+
+async def metricas(request):
+    if request.remote not in ENDERECOS_LOCAIS:
+        return _erro(403, "Métricas disponíveis só na máquina local.")
+    return web.Response(body=texto_metricas().encode("utf-8"), headers={"Content-Type": TIPO_CONTEUDO_METRICAS})
+
+
+def criar_app(config, matriz_completa, processos=None):
+    app = web.Application(middlewares=[autenticacao])
+    app["tokens"] = {str(t): u for t, u in ((config.get("api") or {}).get("tokens") or {}).items()}
+    app["usuarios"] = config.get("credentials", {}).get("usernames", {})
+    app["matriz"] = matriz_completa
+    app["trabalhos"] = {}
+
+    async def iniciar_pool(app):
+        app["pool"] = criar_pool_relatorios(processos, initializer=configurar_logs)
+        yield
+        app["pool"].shutdown(wait=False, cancel_futures=True)
+
+    app.cleanup_ctx.append(iniciar_pool)
+    base = "/avaliacoes/{segmento}/{municipio}"
+    app.add_routes([
+        web.get("/saude", saude),
+        web.get("/metrics", metricas),
+        web.get(base, obter_avaliacao),
+        web.put(base, substituir_avaliacao),
+        web.patch(base, alterar_avaliacao),
+        web.get(base + "/resultado", obter_resultado),
+        web.post(base + "/relatorios", enfileirar_relatorio),
+        web.get("/relatorios/{id}", situacao_relatorio),
+        web.get("/relatorios/{id}/arquivo", baixar_relatorio),
+    ])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP de avaliações, pontuação e relatórios.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8600)
+    parser.add_argument("--processos", type=int, default=None, help="Processos para gerar relatórios (padrão: nº de CPUs).")
+    parser.add_argument("--config", default=ARQUIVO_CONFIG)
+    parser.add_argument("--criterios", default=ARQUIVO_CRITERIOS)
+    args = parser.parse_args()
+    configurar_logs()
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.load(f, Loader=SafeLoader)
+    tokens = (config.get("api") or {}).get("tokens") or {}
+    if not tokens:
+        parser.error(f"Nenhum token configurado em '{args.config}' (seção api.tokens).")
+    if TOKEN_DE_EXEMPLO in map(str, tokens):
+        parser.error(f"Troque o token de exemplo '{TOKEN_DE_EXEMPLO}' em '{args.config}' antes de iniciar a API.")
+    try:
+        modelos_vigentes()
+    except ErroModelo as e:
+        parser.error(str(e))
+    web.run_app(criar_app(config, carregar_criterios(args.criterios), args.processos), host=args.host, port=args.porta)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# --- auditoria.py ---
+"""Consulta o log de auditoria das respostas (data/auditoria), gravado a cada salvamento por nucleo.salvar_avaliacao.
+
+Cada linha do histórico mostra quando, quem, em qual avaliação e versão, e o valor antigo e o novo
+da resposta. Os filtros por município e segmento usam o índice de cada arquivo fechado do log,
+então só os lotes das avaliações pedidas são decodificados.
+
+Uso:
+    python auditoria.py historico --municipio Balsas --topico 3.2 --subcriterio Atualidade
+    python auditoria.py historico --municipio Balsas --segmento Prefeitura --usuario gabriel
+    python auditoria.py indexar        # refaz os índices dos arquivos fechados do log
+"""
+import argparse
+import json
+from datetime import datetime
+
+from municipios import UF_PADRAO, codigo_municipio, codigo_por_nome_compacto, municipio_por_codigo
+from nucleo import (
+    ARQUIVO_CRITERIOS, PASTA_AUDITORIA, arquivos_auditoria, carregar_criterios, chave_resposta,
+    indexar_por_topico, indexar_arquivo_auditoria, interpretar_nome_arquivo, iterar_itens, ler_auditoria, segmentos,
+)
+
+TAMANHO_MAXIMO_VALOR = 60
+
+
+def _codigo(municipio):
+    """Código IBGE do município no nome do arquivo (os arquivos antigos usam o nome sem espaços)."""
+    return municipio if municipio.isdigit() else codigo_por_nome_compacto(municipio) or municipio
+
+def descricoes_das_chaves(matriz_completa):
+    """Chave de resposta -> descrição curta ("3.2 Atualidade", "3.2 Atualidade (obs.)", "3.2 (links)")."""
+    descricoes = {}
+    for segmento in segmentos(matriz_completa):
+        for secao, item in iterar_itens(matriz_completa[segmento]):
+            descricoes[chave_resposta(secao, item['criterio'], "links")] = f"{item['topico']} (links)"
+            for sub in item["subcriterios"]:
+                descricoes[chave_resposta(secao, item['criterio'], sub)] = f"{item['topico']} {sub}"
+                descricoes[chave_resposta(secao, item['criterio'], f"{sub}_obs")] = f"{item['topico']} {sub} (obs.)"
+    return descricoes
+
+def chaves_do_topico(matriz_completa, topico, subcriterio=None, segmento=None):
+    """Chaves de resposta do tópico (todas, ou só as do subcritério), em um ou em todos os segmentos."""
+    chaves = set()
+    for nome in [segmento] if segmento else segmentos(matriz_completa):
+        encontrado = indexar_por_topico(matriz_completa.get(nome, {})).get(str(topico).strip())
+        if encontrado is None: continue
+        secao, item = encontrado
+        if subcriterio is None: chaves.add(chave_resposta(secao, item['criterio'], "links"))
+        for sub in item["subcriterios"]:
+            if subcriterio is None or sub.lower() == subcriterio.lower():
+                chaves.update((chave_resposta(secao, item['criterio'], sub), chave_resposta(secao, item['criterio'], f"{sub}_obs")))
+    return chaves
+
+def historico(pasta=PASTA_AUDITORIA, codigo=None, segmento=None, usuario=None, chaves=None):
+    """Alterações do log, da mais antiga à mais recente, como dicionários (data, usuario, avaliacao,
+    segmento, codigo, avaliador, versao, chave, antigo, novo). `usuario` é quem salvou; `chaves` restringe às respostas."""
+    def aceitar(avaliacao):
+        partes = interpretar_nome_arquivo(avaliacao)
+        return partes is not None and (segmento is None or partes[0] == segmento.replace(' ', '')) \
+            and (codigo is None or _codigo(partes[1]) == codigo)
+    for lote in ler_auditoria(pasta, aceitar if codigo or segmento else None):
+        if usuario is not None and lote["usuario"] != usuario: continue
+        segmento_lote, municipio, avaliador = interpretar_nome_arquivo(lote["avaliacao"]) or ("", "", "")
+        for chave, antigo, novo in lote["alteracoes"]:
+            if chaves is None or chave in chaves:
+                yield {"data": lote["data"], "usuario": lote["usuario"], "avaliacao": lote["avaliacao"], "segmento": segmento_lote,
+                       "codigo": _codigo(municipio), "avaliador": avaliador, "versao": lote["versao"], "chave": chave, "antigo": antigo, "novo": novo}
+
+def _formatar_valor(valor):
+    if valor is None: return "—"
+    texto = valor if isinstance(valor, str) else json.dumps(valor, ensure_ascii=False)
+    texto = texto.replace("\n", " ") or '""'
+    return texto if len(texto) <= TAMANHO_MAXIMO_VALOR else texto[:TAMANHO_MAXIMO_VALOR - 1] + "…"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Histórico das alterações nas respostas das avaliações.")
+    parser.add_argument("--pasta", default=PASTA_AUDITORIA)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    consultar = comandos.add_parser("historico", help="Lista as alterações, com filtros.")
+    consultar.add_argument("--municipio")
+    consultar.add_argument("--uf", default=UF_PADRAO)
+    consultar.add_argument("--segmento")
+    consultar.add_argument("--usuario", help="Quem salvou a alteração.")
+    consultar.add_argument("--topico", help="Número do tópico, ex.: 3.2")
+    consultar.add_argument("--subcriterio", help="Ex.: Atualidade (exige --topico)")
+    consultar.add_argument("--criterios", default=ARQUIVO_CRITERIOS)
+    comandos.add_parser("indexar", help="Refaz os índices dos arquivos fechados do log.")
+    args = parser.parse_args()
+
+    if args.comando == "indexar":
+        fechados = arquivos_auditoria(args.pasta)[:-1]
+        for caminho in fechados:
+            indexar_arquivo_auditoria(caminho)
+        print(f"{len(fechados)} arquivo(s) indexado(s).")
+        return
+
+    if args.subcriterio and not args.topico:
+        parser.error("--subcriterio exige --topico.")
+    matriz_completa = carregar_criterios(args.criterios)
+    chaves = chaves_do_topico(matriz_completa, args.topico, args.subcriterio, args.segmento) if args.topico else None
+    if chaves == set():
+        parser.error(f"tópico {args.topico} {args.subcriterio or ''} não encontrado nos critérios.")
+    codigo = (codigo_municipio(args.municipio, args.uf) or args.municipio.replace(' ', '')) if args.municipio else None
+    descricoes = descricoes_das_chaves(matriz_completa)
+    total = 0
+    for alteracao in historico(args.pasta, codigo, args.segmento, args.usuario, chaves):
+        registro = municipio_por_codigo(alteracao["codigo"])
+        entidade = f"{alteracao['segmento']} {registro['nome'] if registro else alteracao['codigo']}"
+        if alteracao["avaliador"]: entidade += f" ({alteracao['avaliador']})"
+        print(f"{datetime.fromtimestamp(alteracao['data']):%Y-%m-%d %H:%M:%S}  {alteracao['usuario'] or '-':12} v{alteracao['versao']:<4} "
+              f"{entidade}  {descricoes.get(alteracao['chave'], alteracao['chave'])}: "
+              f"{_formatar_valor(alteracao['antigo'])} -> {_formatar_valor(alteracao['novo'])}")
+        total += 1
+    print(f"{total} alteração(ões).")
+
+
+if __name__ == "__main__":
+    main()
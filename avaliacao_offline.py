@@ -0,0 +1,61 @@
+# --- avaliacao_offline.py ---
+"""Avaliador offline: edita um pacote de avaliação (ver pacotes.py) com a mesma tela de itens do app,
+sem servidor, sem login e sem acesso a data/. As respostas são gravadas de volta no próprio pacote,
+que depois é importado no app (barra lateral, "Pacote offline") ou com `python pacotes.py importar`.
+
+Uso:
+    streamlit run avaliacao_offline.py -- pacote_Prefeitura_2101400_gabriel.json
+"""
+import copy
+import os
+import sys
+from datetime import datetime
+
+import streamlit as st
+
+from interface_avaliacao import renderizar_secoes
+from pacotes import ErroPacote, carregar_pacote, gravar_pacote
+from pontuacao import calcular_indice_e_selo
+
+st.set_page_config(layout="wide", page_title="Avaliação offline")
+st.title("📄 Avaliação offline")
+
+caminho_pacote = sys.argv[1] if len(sys.argv) > 1 else st.text_input("Arquivo do pacote", placeholder="pacote_....json")
+if not caminho_pacote:
+    st.info("Informe o arquivo do pacote exportado pelo app.")
+    st.stop()
+
+if st.session_state.get('caminho_pacote') != caminho_pacote:
+    try:
+        pacote = carregar_pacote(caminho_pacote)
+    except (ErroPacote, OSError) as e:
+        st.error(f"Não foi possível abrir o pacote: {e}")
+        st.stop()
+    st.session_state.pacote = pacote
+    st.session_state.respostas = copy.deepcopy(pacote["respostas"])
+    st.session_state.caminho_pacote = caminho_pacote
+
+pacote = st.session_state.pacote
+entidade, matriz_perguntas = pacote["entidade"], pacote["criterios"]["matriz"]
+
+def salvar_no_pacote():
+    pacote["respostas"] = copy.deepcopy(st.session_state.respostas)
+    pacote["editado_em"] = datetime.now().isoformat(timespec="seconds")
+    gravar_pacote(pacote, caminho_pacote)
+
+st.header(f"Avaliação: {entidade['municipio']} - {entidade['segmento']}")
+st.caption(f"Pacote {os.path.basename(caminho_pacote)} · exportado em {pacote['exportado_em']} (versão {pacote['base']['versao']} do servidor)"
+           + (f" · editado em {pacote['editado_em']}" if pacote["editado_em"] else ""))
+resultados = calcular_indice_e_selo(st.session_state.respostas, matriz_perguntas)
+st.info(f"**Índice Geral de Transparência:** {resultados['indice']:.2f}% | **Selo Atricon:** {resultados['selo']}")
+
+renderizar_secoes(matriz_perguntas)
+
+st.sidebar.header("Ações")
+if st.sidebar.button("💾 Salvar no pacote"):
+    try:
+        salvar_no_pacote()
+        st.sidebar.success("Respostas gravadas no pacote.")
+    except OSError as e:
+        st.sidebar.error(f"Erro ao gravar o pacote: {e}")
+st.sidebar.caption("Leve o arquivo do pacote de volta e importe-o no app para mesclar com a versão do servidor.")
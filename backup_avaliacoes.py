@@ -0,0 +1,304 @@
+# --- backup_avaliacoes.py ---
+"""Backups incrementais da pasta data/ em um repositório endereçado por conteúdo.
+
+Estrutura do repositório (padrão: backups/dados):
+
+    objetos/ab/abcdef....gz      conteúdo de cada arquivo, comprimido, nomeado pelo sha256 do original
+    snapshots/<id>.json          manifesto de um snapshot: caminho relativo -> hash, tamanho e mtime
+
+- Um arquivo só é gravado no repositório se o seu conteúdo ainda não estiver lá: snapshots seguidos
+  compartilham os objetos dos arquivos que não mudaram. Arquivos com o mesmo tamanho e mtime do
+  snapshot anterior nem são relidos.
+- Retenção: mantém o snapshot mais recente de cada uma das últimas --horas horas, --dias dias e
+  --semanas semanas; os demais manifestos são apagados e os objetos sem referência, removidos.
+- A restauração (de um arquivo ou do snapshot inteiro) descomprime os objetos em paralelo e grava
+  cada arquivo de forma atômica, respeitando a trava usada pelo app. Arquivos criados depois do
+  snapshot não são apagados; o índice das avaliações é reconstruído no fim.
+- O log de auditoria (data/auditoria, só cresce) e o índice das avaliações ficam de fora: a auditoria
+  mudaria em todo snapshot e não pode voltar no tempo (os ids de termos já usados pelos processos
+  deixariam de valer); o índice é refeito a partir dos arquivos.
+
+O app dispara um snapshot em segundo plano depois de salvar (agendar_backup), no máximo um a cada
+INTERVALO_MINIMO segundos; salvamentos dentro desse intervalo ganham um snapshot no fim dele. Também pode ser agendado (cron / Agendador de Tarefas):
+
+    python backup_avaliacoes.py criar --podar
+    python backup_avaliacoes.py listar
+    python backup_avaliacoes.py restaurar 20261019T120000_000000Z --arquivo avaliacoes/avaliacao_Prefeitura_Balsas.json
+    python backup_avaliacoes.py restaurar 20261019T120000_000000Z --destino /tmp/restauracao
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from nucleo import (
+    ARQUIVO_INDICE, ARQUIVO_INDICE_DESATUALIZADO, PASTA_AUDITORIA, PASTA_AVALIACOES, TravaIndisponivel,
+    reconstruir_indice, trava_arquivo,
+)
+
+PASTA_ORIGEM = "data"
+PASTA_BACKUPS = os.path.join("backups", "dados")
+INTERVALO_MINIMO = 15 * 60  # segundos entre snapshots disparados pelo app
+RETENCAO_PADRAO = {"horas": 24, "dias": 7, "semanas": 8}
+IGNORAR_SUFIXOS = (".lock", ".tmp")
+IGNORAR_NOMES = (ARQUIVO_INDICE, ARQUIVO_INDICE_DESATUALIZADO)
+IGNORAR_PASTAS = (os.path.relpath(PASTA_AUDITORIA, PASTA_ORIGEM).replace(os.sep, "/"),)  # relativas à origem
+FORMATO_ID = "%Y%m%dT%H%M%S_%fZ"
+
+ESPERA_NOVA_TENTATIVA = 60  # segundos: o snapshot do fim do intervalo encontrou outro em andamento
+
+_backup_em_andamento = threading.Lock()
+_agendamento = threading.Lock()
+_ultimo_disparo = 0.0
+_backup_pendente = None  # threading.Timer do snapshot do fim do intervalo
+
+
+def _caminho_objeto(repositorio, hash_arquivo):
+    return os.path.join(repositorio, "objetos", hash_arquivo[:2], f"{hash_arquivo}.gz")
+
+def _gravar_atomico(caminho, conteudo):
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    caminho_tmp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(caminho_tmp, 'wb') as f:
+        f.write(conteudo)
+    os.replace(caminho_tmp, caminho)
+
+def _data_do_snapshot(id_snapshot):
+    return datetime.strptime(id_snapshot, FORMATO_ID).replace(tzinfo=timezone.utc)
+
+
+# --- SNAPSHOTS ---
+def listar_snapshots(repositorio=PASTA_BACKUPS):
+    """Ids dos snapshots, do mais antigo ao mais recente."""
+    pasta = os.path.join(repositorio, "snapshots")
+    if not os.path.isdir(pasta): return []
+    return sorted(nome[:-len(".json")] for nome in os.listdir(pasta) if nome.endswith(".json"))
+
+def carregar_manifesto(id_snapshot, repositorio=PASTA_BACKUPS):
+    with open(os.path.join(repositorio, "snapshots", f"{id_snapshot}.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _ignorado(relativo):
+    """Travas, temporários, índice das avaliações e o log de auditoria ficam fora dos snapshots e das restaurações."""
+    nome = relativo.rsplit("/", 1)[-1]
+    return nome.endswith(IGNORAR_SUFIXOS) or nome in IGNORAR_NOMES or any(relativo.startswith(f"{pasta}/") for pasta in IGNORAR_PASTAS)
+
+def _arquivos_da_origem(origem, repositorio):
+    """Caminhos relativos dos arquivos a copiar (sem os ignorados e sem o próprio repositório)."""
+    repositorio = os.path.abspath(repositorio)
+    for raiz, pastas, arquivos in os.walk(origem):
+        pastas[:] = sorted(p for p in pastas if os.path.abspath(os.path.join(raiz, p)) != repositorio)
+        for nome in sorted(arquivos):
+            caminho = os.path.join(raiz, nome)
+            relativo = os.path.relpath(caminho, origem).replace(os.sep, "/")
+            if not _ignorado(relativo):
+                yield relativo, caminho
+
+def criar_snapshot(origem=PASTA_ORIGEM, repositorio=PASTA_BACKUPS, motivo="", forcar=False):
+    """Copia para o repositório os arquivos novos ou alterados e grava o manifesto.
+
+    Devolve (id do snapshot, arquivos gravados no repositório); o id é None se nada mudou desde o
+    último snapshot e `forcar` não foi pedido.
+    """
+    with trava_arquivo(os.path.join(repositorio, "snapshots")) as renovar:
+        ids = listar_snapshots(repositorio)
+        anterior = carregar_manifesto(ids[-1], repositorio)["arquivos"] if ids else {}
+        arquivos, novos = {}, 0
+        for relativo, caminho in _arquivos_da_origem(origem, repositorio):
+            renovar()
+            try:
+                estado = os.stat(caminho)
+                registro_anterior = anterior.get(relativo)
+                if registro_anterior and (registro_anterior["tamanho"], registro_anterior["mtime_ns"]) == (estado.st_size, estado.st_mtime_ns):
+                    arquivos[relativo] = registro_anterior
+                    continue
+                with open(caminho, 'rb') as f:
+                    conteudo = f.read()
+            except FileNotFoundError:
+                continue  # apagado durante o backup
+            hash_arquivo = hashlib.sha256(conteudo).hexdigest()
+            caminho_objeto = _caminho_objeto(repositorio, hash_arquivo)
+            if not os.path.exists(caminho_objeto):
+                _gravar_atomico(caminho_objeto, gzip.compress(conteudo, mtime=0))
+                novos += 1
+            arquivos[relativo] = {"hash": hash_arquivo, "tamanho": estado.st_size, "mtime_ns": estado.st_mtime_ns}
+
+        # Só o conteúdo conta: um arquivo regravado igual (mtime novo) não gera snapshot.
+        if not forcar and ids and {r: a["hash"] for r, a in arquivos.items()} == {r: a["hash"] for r, a in anterior.items()}:
+            return None, 0
+        id_snapshot = datetime.now(timezone.utc).strftime(FORMATO_ID)
+        manifesto = {"id": id_snapshot, "criado_em": datetime.now().isoformat(timespec="seconds"),
+                     "origem": os.path.abspath(origem), "motivo": motivo, "arquivos": arquivos}
+        _gravar_atomico(os.path.join(repositorio, "snapshots", f"{id_snapshot}.json"),
+                        json.dumps(manifesto, ensure_ascii=False, indent=1).encode('utf-8'))
+        return id_snapshot, novos
+
+
+# --- RETENÇÃO ---
+def snapshots_a_manter(ids, horas=24, dias=7, semanas=8):
+    """O mais recente de cada hora, dia e semana dentro dos limites, mais o último snapshot."""
+    manter = set(ids[-1:])
+    periodos = ((horas, lambda d: d.strftime("%Y%m%d%H")), (dias, lambda d: d.strftime("%Y%m%d")),
+                (semanas, lambda d: d.isocalendar()[:2]))
+    for limite, periodo in periodos:
+        vistos = set()
+        for id_snapshot in reversed(ids):
+            chave = periodo(_data_do_snapshot(id_snapshot))
+            if chave in vistos: continue
+            if len(vistos) >= limite: break
+            vistos.add(chave); manter.add(id_snapshot)
+    return manter
+
+def podar(repositorio=PASTA_BACKUPS, horas=24, dias=7, semanas=8):
+    """Aplica a retenção e remove os objetos que nenhum snapshot restante usa. Devolve (snapshots, objetos) removidos."""
+    with trava_arquivo(os.path.join(repositorio, "snapshots")) as renovar:
+        ids = listar_snapshots(repositorio)
+        manter = snapshots_a_manter(ids, horas, dias, semanas)
+        for id_snapshot in ids:
+            if id_snapshot not in manter:
+                os.remove(os.path.join(repositorio, "snapshots", f"{id_snapshot}.json"))
+        em_uso = {registro["hash"] for id_snapshot in manter
+                  for registro in carregar_manifesto(id_snapshot, repositorio)["arquivos"].values()}
+        objetos_removidos = 0
+        for raiz, _, nomes in os.walk(os.path.join(repositorio, "objetos")):
+            for nome in nomes:
+                renovar()
+                if nome.endswith(".gz") and nome[:-len(".gz")] not in em_uso:
+                    os.remove(os.path.join(raiz, nome)); objetos_removidos += 1
+        return len(ids) - len(manter), objetos_removidos
+
+
+# --- RESTAURAÇÃO ---
+def ler_objeto(hash_arquivo, repositorio=PASTA_BACKUPS):
+    """Conteúdo original de um objeto, conferindo o hash."""
+    with open(_caminho_objeto(repositorio, hash_arquivo), 'rb') as f:
+        conteudo = gzip.decompress(f.read())
+    if hashlib.sha256(conteudo).hexdigest() != hash_arquivo:
+        raise ValueError(f"Objeto corrompido no repositório: {hash_arquivo}")
+    return conteudo
+
+def restaurar(id_snapshot, destino=PASTA_ORIGEM, repositorio=PASTA_BACKUPS, arquivos=None):
+    """Restaura o snapshot inteiro (ou só os caminhos relativos em `arquivos`) para a pasta destino e reconstrói
+    o índice das avaliações de lá. Devolve os caminhos gravados. Auditoria e índice de snapshots antigos não voltam."""
+    registros = {relativo: registro for relativo, registro in carregar_manifesto(id_snapshot, repositorio)["arquivos"].items()
+                 if not _ignorado(relativo)}
+    if arquivos is not None:
+        faltando = [a for a in arquivos if a not in registros]
+        if faltando:
+            raise KeyError(f"Arquivo(s) fora do snapshot {id_snapshot}: {', '.join(faltando)}")
+        registros = {a: registros[a] for a in arquivos}
+
+    def restaurar_um(item):
+        relativo, registro = item
+        caminho = os.path.join(destino, *relativo.split("/"))
+        conteudo = ler_objeto(registro["hash"], repositorio)
+        with trava_arquivo(caminho):
+            _gravar_atomico(caminho, conteudo)
+        return caminho
+
+    # A descompressão (zlib) libera o GIL: threads bastam para paralelizar.
+    with ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) + 4)) as executor:
+        gravados = list(executor.map(restaurar_um, sorted(registros.items())))
+    pasta_avaliacoes = os.path.join(destino, os.path.relpath(PASTA_AVALIACOES, PASTA_ORIGEM))
+    if gravados and os.path.isdir(pasta_avaliacoes):
+        reconstruir_indice(pasta_avaliacoes)
+    return gravados
+
+
+# --- DISPARO PELO APP ---
+def _disparar(origem, repositorio):
+    """Inicia um snapshot em uma thread de fundo. Devolve False se já houver um em andamento neste processo."""
+    global _ultimo_disparo
+    if not _backup_em_andamento.acquire(blocking=False): return False
+    _ultimo_disparo = time.monotonic()
+
+    def executar():
+        try:
+            criar_snapshot(origem, repositorio, motivo="salvamento no app")
+        except (TravaIndisponivel, OSError):
+            pass  # o próximo disparo tenta de novo
+        finally:
+            _backup_em_andamento.release()
+
+    threading.Thread(target=executar, name="backup_avaliacoes", daemon=True).start()
+    return True
+
+def _programar(espera, origem, repositorio):
+    global _backup_pendente
+    _backup_pendente = threading.Timer(espera, _disparar_pendente, (origem, repositorio))
+    _backup_pendente.daemon = True
+    _backup_pendente.start()
+
+def _disparar_pendente(origem, repositorio):
+    global _backup_pendente
+    with _agendamento:
+        _backup_pendente = None
+        if not _disparar(origem, repositorio):
+            _programar(ESPERA_NOVA_TENTATIVA, origem, repositorio)
+
+def agendar_backup(origem=PASTA_ORIGEM, repositorio=PASTA_BACKUPS, intervalo_minimo=INTERVALO_MINIMO):
+    """Dispara um snapshot em uma thread de fundo, sem bloquear quem chamou.
+
+    Se o último disparo foi há menos de intervalo_minimo segundos, programa um snapshot para o fim
+    do intervalo (um só, por mais salvamentos que aconteçam), para que os últimos salvamentos não
+    fiquem sem backup. Devolve True se o snapshot começou agora.
+    """
+    with _agendamento:
+        espera = _ultimo_disparo + intervalo_minimo - time.monotonic() if _ultimo_disparo else 0
+        if espera > 0 or _backup_em_andamento.locked():
+            if _backup_pendente is None: _programar(max(espera, 0) or ESPERA_NOVA_TENTATIVA, origem, repositorio)
+            return False
+        return _disparar(origem, repositorio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backups incrementais (endereçados por conteúdo) da pasta data/.")
+    parser.add_argument("--repositorio", default=PASTA_BACKUPS)
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_criar = sub.add_parser("criar", help="Cria um snapshot com os arquivos novos ou alterados.")
+    p_criar.add_argument("--origem", default=PASTA_ORIGEM)
+    p_criar.add_argument("--motivo", default="manual")
+    p_criar.add_argument("--forcar", action="store_true", help="Cria o snapshot mesmo sem mudanças.")
+    p_criar.add_argument("--podar", action="store_true", help="Aplica a retenção padrão depois de criar.")
+
+    sub.add_parser("listar", help="Lista os snapshots.")
+
+    p_restaurar = sub.add_parser("restaurar", help="Restaura um snapshot inteiro ou arquivos dele.")
+    p_restaurar.add_argument("snapshot", help="Id do snapshot ou 'ultimo'.")
+    p_restaurar.add_argument("--arquivo", action="append", help="Caminho relativo a data/ (pode repetir).")
+    p_restaurar.add_argument("--destino", default=PASTA_ORIGEM)
+
+    p_podar = sub.add_parser("podar", help="Aplica a retenção por horas/dias/semanas.")
+    for nome, valor in RETENCAO_PADRAO.items():
+        p_podar.add_argument(f"--{nome}", type=int, default=valor)
+    args = parser.parse_args()
+
+    if args.comando == "criar":
+        id_snapshot, novos = criar_snapshot(args.origem, args.repositorio, args.motivo, args.forcar)
+        print(f"Snapshot {id_snapshot}: {novos} arquivo(s) novo(s) no repositório." if id_snapshot else "Nada mudou desde o último snapshot.")
+        if args.podar:
+            snapshots, objetos = podar(args.repositorio, **RETENCAO_PADRAO)
+            print(f"Retenção: {snapshots} snapshot(s) e {objetos} objeto(s) removido(s).")
+    elif args.comando == "listar":
+        for id_snapshot in listar_snapshots(args.repositorio):
+            manifesto = carregar_manifesto(id_snapshot, args.repositorio)
+            tamanho = sum(r["tamanho"] for r in manifesto["arquivos"].values())
+            print(f"{id_snapshot}  {manifesto['criado_em']}  {len(manifesto['arquivos'])} arquivo(s), {tamanho / 1024:.0f} KB  {manifesto['motivo']}")
+    elif args.comando == "restaurar":
+        ids = listar_snapshots(args.repositorio)
+        id_snapshot = ids[-1] if args.snapshot == "ultimo" and ids else args.snapshot
+        gravados = restaurar(id_snapshot, args.destino, args.repositorio, args.arquivo)
+        print(f"{len(gravados)} arquivo(s) restaurado(s) do snapshot {id_snapshot} em '{args.destino}'.")
+    elif args.comando == "podar":
+        snapshots, objetos = podar(args.repositorio, args.horas, args.dias, args.semanas)
+        print(f"{snapshots} snapshot(s) e {objetos} objeto(s) removido(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# --- coletanea_relatorios.py ---
+"""Coletânea dos relatórios de várias entidades (ex.: um consórcio de municípios, no fechamento do ciclo):
+um ZIP com um arquivo por entidade ou um único PDF com sumário e página de classificação.
+
+Os relatórios vêm do pool de relatorios_em_lote.gerar_em_lote e entram na coletânea à medida que ficam
+prontos, sem acumular documentos em memória: no ZIP, cada arquivo é gravado e apagado em seguida; no PDF
+único, os PDFs esperam no disco até o fim e só então são unidos (PyPDF2), depois da abertura (sumário com a
+página inicial de cada relatório e classificação por índice), montada no Word e convertida como os relatórios.
+Cada relatório ganha um marcador no PDF. Os relatórios que não puderam ser convertidos para PDF entram no
+ZIP como .docx e, no PDF único, ficam de fora e aparecem na classificação como "não incluído".
+
+Uso:
+    python coletanea_relatorios.py --municipio Balsas --municipio Araioses --saida consorcio.zip
+    python coletanea_relatorios.py --pasta data/consolidadas --formato pdf --titulo "Consórcio X" --saida consorcio.pdf
+"""
+import argparse
+import csv
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+
+import docx
+import yaml
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt
+from docx2pdf import convert
+from yaml.loader import SafeLoader
+
+from municipios import normalizar_nome
+from nucleo import ARQUIVO_CRITERIOS, PASTA_AVALIACOES, carregar_criterios, listar_arquivos_avaliacao, resolver_entidade
+from relatorios_em_lote import ARQUIVO_CONFIG, gerar_em_lote, tarefas_da_pasta
+
+try:
+    from PyPDF2 import PdfReader, PdfWriter
+except ImportError:  # PyPDF2 só é necessário para o PDF único
+    PdfReader = PdfWriter = None
+
+FORMATOS = {"zip": "ZIP com um relatório por entidade", "pdf": "PDF único com sumário e classificação"}
+TITULO_PADRAO = "Relatórios de Transparência"
+TENTATIVAS_ABERTURA = 3  # a abertura é refeita se o número de páginas dela mudar a numeração do sumário
+
+class ErroColetanea(Exception):
+    """A coletânea não pôde ser montada (formato sem suporte, nenhum relatório gerado...)."""
+
+
+def rotulo_entidade(resultado):
+    rotulo = f"{resultado['segmento']} de {resultado['municipio']}"
+    return rotulo + (f" ({resultado['avaliador']})" if resultado["avaliador"] else "")
+
+def _nome_no_zip(resultado, usados):
+    extensao = os.path.splitext(resultado["arquivo"])[1]
+    base = rotulo_entidade(resultado).replace("/", "-")
+    nome, n = f"{base}{extensao}", 1
+    while nome in usados:
+        n += 1; nome = f"{base} {n}{extensao}"
+    usados.add(nome)
+    return nome
+
+def classificacao(resultados):
+    """Resultados do mais bem avaliado para o menos (as falhas no fim), com a posição em "posicao"."""
+    ordenados = sorted(resultados, key=lambda r: (r["indice"] == "", -(r["indice"] or 0), normalizar_nome(rotulo_entidade(r))))
+    return [dict(r, posicao=n) for n, r in enumerate(ordenados, 1)]
+
+def _csv_classificacao(resultados):
+    saida = io.StringIO()
+    escritor = csv.writer(saida, delimiter=";")
+    escritor.writerow(["posicao", "entidade", "indice", "selo", "arquivo", "situacao"])
+    for r in classificacao(resultados):
+        situacao = r["falha"] or (f"sem PDF: {r['aviso']}" if r["aviso"] else "ok")
+        escritor.writerow([r["posicao"], rotulo_entidade(r), r["indice"], r["selo"], os.path.basename(r["arquivo"]), situacao])
+    return "\ufeff" + saida.getvalue()  # BOM: o Excel abre o CSV com os acentos certos
+
+
+# --- ABERTURA DO PDF ÚNICO ---
+def _documento_abertura(titulo, sumario, resultados, paginas_abertura):
+    doc = docx.Document()
+    p_titulo = doc.add_paragraph(); p_titulo.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run_titulo = p_titulo.add_run(titulo); run_titulo.font.size = Pt(22); run_titulo.bold = True
+    doc.add_paragraph(f"{len(sumario)} relatório(s) · gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}").alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    p_sumario = doc.add_paragraph(); run_sumario = p_sumario.add_run("Sumário"); run_sumario.font.size = Pt(16); run_sumario.bold = True
+    pagina = paginas_abertura + 1
+    for resultado, paginas in sumario:
+        doc.add_paragraph(f"{rotulo_entidade(resultado)} — página {pagina}")
+        pagina += paginas
+
+    doc.add_page_break()
+    p_ranking = doc.add_paragraph(); run_ranking = p_ranking.add_run("Classificação"); run_ranking.font.size = Pt(16); run_ranking.bold = True
+    incluidos = {resultado["caminho"] for resultado, _ in sumario}
+    tabela = doc.add_table(rows=1, cols=4)
+    for celula, texto in zip(tabela.rows[0].cells, ("#", "Entidade", "Índice", "Selo")):
+        celula.text = texto; celula.paragraphs[0].runs[0].bold = True
+    for r in classificacao(resultados):
+        indice = f"{r['indice']:.2f}%" if r["indice"] != "" else "—"
+        entidade = rotulo_entidade(r) + ("" if r["caminho"] in incluidos else " (não incluído)")
+        for celula, texto in zip(tabela.add_row().cells, (str(r["posicao"]), entidade, indice, r["selo"])):
+            celula.text = texto
+    return doc
+
+def _abertura_em_pdf(titulo, sumario, resultados, pasta):
+    """Gera a abertura em PDF; refaz enquanto o número de páginas dela mudar a numeração do sumário."""
+    caminho_docx, caminho_pdf = os.path.join(pasta, "abertura.docx"), os.path.join(pasta, "abertura.pdf")
+    paginas_abertura = 2
+    for _ in range(TENTATIVAS_ABERTURA):
+        _documento_abertura(titulo, sumario, resultados, paginas_abertura).save(caminho_docx)
+        convert(caminho_docx, caminho_pdf)
+        paginas = len(PdfReader(caminho_pdf).pages)
+        if paginas == paginas_abertura: break
+        paginas_abertura = paginas
+    return caminho_pdf
+
+def _unir_pdf(resultados, caminho_saida, titulo, pasta):
+    com_pdf = sorted((r for r in resultados if r["arquivo"].lower().endswith(".pdf")), key=lambda r: normalizar_nome(rotulo_entidade(r)))
+    if not com_pdf:
+        raise ErroColetanea("Nenhum relatório pôde ser convertido para PDF; gere a coletânea em ZIP (com os arquivos .docx).")
+    sumario = [(r, len(PdfReader(r["arquivo"]).pages)) for r in com_pdf]
+    abertura = _abertura_em_pdf(titulo, sumario, resultados, pasta)
+    escritor = PdfWriter()
+    escritor.append(abertura, outline_item=titulo)
+    for r in com_pdf:
+        escritor.append(r["arquivo"], outline_item=rotulo_entidade(r), import_outline=False)
+    escritor.write(caminho_saida)
+
+
+# --- COLETÂNEA ---
+def gerar_coletanea(tarefas, caminho_saida, formato="zip", titulo=TITULO_PADRAO, arquivo_criterios=ARQUIVO_CRITERIOS, processos=None, progresso=None):
+    """Gera os relatórios das tarefas (como as de relatorios_em_lote.tarefas_da_pasta) e grava a coletânea em
+    caminho_saida. progresso(n, resultado) é chamado a cada relatório pronto. Devolve os resultados, em ordem de
+    classificação (levanta ErroColetanea)."""
+    if formato not in FORMATOS:
+        raise ErroColetanea(f"Formato desconhecido: {formato} (use {' ou '.join(FORMATOS)}).")
+    if formato == "pdf" and PdfWriter is None:
+        raise ErroColetanea("O PDF único exige o pacote PyPDF2 (pip install PyPDF2).")
+    pasta = tempfile.mkdtemp(prefix="coletanea_", dir=os.path.dirname(os.path.abspath(caminho_saida)))
+    caminho_tmp = os.path.join(pasta, "coletanea.tmp")
+    # Uma subpasta por relatório: dois avaliadores da mesma entidade gerariam o mesmo nome de arquivo.
+    tarefas = (dict(tarefa, pasta_saida=os.path.join(pasta, str(n))) for n, tarefa in enumerate(tarefas))
+    resultados = []
+    try:
+        arquivo_zip = zipfile.ZipFile(caminho_tmp, "w", zipfile.ZIP_DEFLATED) if formato == "zip" else None
+        try:
+            usados = set()
+            for resultado in gerar_em_lote(tarefas, arquivo_criterios, processos):
+                if arquivo_zip is not None and resultado["arquivo"]:
+                    nome = _nome_no_zip(resultado, usados)
+                    arquivo_zip.write(resultado["arquivo"], nome)
+                    os.remove(resultado["arquivo"])
+                    resultado["arquivo"] = nome
+                resultados.append(resultado)
+                if progresso: progresso(len(resultados), resultado)
+            if not resultados:
+                raise ErroColetanea("Nenhuma avaliação selecionada.")
+            if arquivo_zip is not None:
+                arquivo_zip.writestr("classificacao.csv", _csv_classificacao(resultados))
+        finally:
+            if arquivo_zip is not None: arquivo_zip.close()
+        if formato == "pdf":
+            _unir_pdf(resultados, caminho_tmp, titulo, pasta)
+        os.replace(caminho_tmp, caminho_saida)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    return classificacao(resultados)
+
+def selecionar_avaliacoes(matriz_completa, pastas=(PASTA_AVALIACOES,), municipios=None, segmentos_escolhidos=None):
+    """Caminhos das avaliações das pastas, filtrados por município (nome ou código IBGE) e por segmento."""
+    procurados = {normalizar_nome(m) for m in municipios} if municipios else None
+    caminhos = []
+    for pasta in pastas:
+        for caminho, segmento_arquivo, municipio_arquivo, _ in listar_arquivos_avaliacao(pasta):
+            segmento, municipio = resolver_entidade(matriz_completa, segmento_arquivo, municipio_arquivo)
+            if segmentos_escolhidos and segmento not in segmentos_escolhidos: continue
+            if procurados and not procurados & {normalizar_nome(municipio), municipio_arquivo}: continue
+            caminhos.append(caminho)
+    return caminhos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coletânea dos relatórios de várias entidades (ZIP ou PDF único).")
+    parser.add_argument("--pasta", action="append", help="Pasta das avaliações (pode repetir; padrão: data/avaliacoes).")
+    parser.add_argument("--municipio", action="append", help="Município (nome ou código IBGE; pode repetir; padrão: todos).")
+    parser.add_argument("--segmento", action="append", help="Órgão/Poder (pode repetir; padrão: todos).")
+    parser.add_argument("--formato", default="zip", choices=list(FORMATOS))
+    parser.add_argument("--titulo", default=TITULO_PADRAO, help="Título da abertura do PDF único.")
+    parser.add_argument("--saida", required=True)
+    parser.add_argument("--usuario", default="", help="Usuário de config.yaml cujo modelo é usado nas avaliações sem avaliador.")
+    parser.add_argument("--tipo", default="Apenas Não Conformidades", choices=("Apenas Não Conformidades", "Relatório Completo"))
+    parser.add_argument("--plano", action="store_true", help="Inclui o plano de melhoria nos relatórios.")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--criterios", default=ARQUIVO_CRITERIOS)
+    parser.add_argument("--config", default=ARQUIVO_CONFIG)
+    args = parser.parse_args()
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.load(f, Loader=SafeLoader)
+    matriz_completa = carregar_criterios(args.criterios)
+    pastas = args.pasta or [PASTA_AVALIACOES]
+    caminhos = selecionar_avaliacoes(matriz_completa, pastas, args.municipio, args.segmento)
+    tarefas = (tarefa for pasta in pastas for tarefa in tarefas_da_pasta(
+        matriz_completa, config, pasta, usuario_padrao=args.usuario, selecao=caminhos, tipo_relatorio=args.tipo, incluir_plano_melhoria=args.plano))
+    try:
+        resultados = gerar_coletanea(tarefas, args.saida, args.formato, args.titulo, args.criterios, args.processos,
+                                     progresso=lambda n, r: print(f"[{n}/{len(caminhos)}] {rotulo_entidade(r)}: {r['falha'] or r['aviso'] or 'ok'}"))
+    except ErroColetanea as e:
+        parser.exit(1, f"{e}\n")
+    falhas = sum(1 for r in resultados if r["falha"])
+    print(f"Coletânea gravada em '{args.saida}': {len(resultados)} relatório(s), {falhas} falha(s).")
+
+
+if __name__ == "__main__":
+    main()
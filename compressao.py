@@ -0,0 +1,175 @@
+# --- compressao.py ---
+"""Codec opcional dos arquivos de avaliação: JSON puro, zlib ou zstd com dicionário compartilhado.
+
+As chaves das respostas repetem o texto das seções e dos critérios; um dicionário montado com esse
+vocabulário (ver nucleo.COMPRESSAO_AVALIACOES) faz até arquivos pequenos comprimirem bem. O formato é
+reconhecido pelos bytes iniciais, então a extensão continua .json e os dois formatos convivem:
+
+    b"AXV1" | codec (b"z" zlib, b"s" zstd) | id do dicionário (16 bytes) | tamanho da meta (4 bytes)
+    | meta em JSON, sem compressão | respostas em JSON compacto, comprimidas
+
+A meta fica fora da parte comprimida: índice e varreduras leem só o cabeçalho (carregar_meta), sem
+descomprimir nada. Ler as respostas descomprime o arquivo inteiro, de uma vez, como a leitura de um
+JSON. Arquivos gzip também são lidos. zstd depende do pacote opcional `zstandard`; sem ele, só zlib
+está disponível.
+
+Os dicionários ficam em uma subpasta _dicionarios da pasta das avaliações (ou da pasta do próprio
+arquivo, se ele estiver fora dela), nomeados pelo id. Na leitura, a subpasta é procurada a partir da
+pasta do arquivo, subindo até a raiz: a leitura não depende do diretório atual, e uma cópia ou
+restauração da pasta das avaliações leva os dicionários junto.
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import struct
+import zlib
+from functools import lru_cache
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGICO = b"AXV1"
+MAGICO_GZIP = b"\x1f\x8b"
+CODIGOS = {"zlib": b"z", "zstd": b"s"}
+PASTA_DICIONARIOS = "_dicionarios"
+TAMANHO_MAXIMO_DICIONARIO = 32 * 1024  # janela do zlib: o que passar disso seria ignorado
+TAMANHO_BLOCO = 64 * 1024
+_CABECALHO = struct.Struct(">4sc16sI")
+_DICIONARIOS = {}  # id -> conteúdo dos dicionários já lidos ou registrados
+
+
+class ErroCompressao(Exception):
+    """Arquivo comprimido ilegível: codec indisponível ou dicionário ausente."""
+
+
+# --- DICIONÁRIOS ---
+def montar_dicionario(chaves_status):
+    """Dicionário a partir das chaves de status: cada chave aparece como nas respostas gravadas, com
+    o status e a observação vazia. O fim do dicionário é o mais aproveitado, então vai do mais raro ao mais comum."""
+    trechos, vistos = [], set()
+    for chave in chaves_status:
+        if chave in vistos: continue
+        vistos.add(chave)
+        trechos.append(f'"{chave}":"Não Atende","{chave}_obs":"",')
+    trechos.append('"_links":[],"_obs":"","Disponibilidade":"Atende","Atualidade":"Atende",')
+    dicionario = "".join(trechos).encode('utf-8')
+    return dicionario[-TAMANHO_MAXIMO_DICIONARIO:]
+
+def id_dicionario(dicionario):
+    return hashlib.sha256(dicionario).hexdigest()[:16]
+
+def registrar_dicionario(dicionario, pasta_raiz):
+    """Grava o dicionário em <pasta_raiz>/_dicionarios (se ainda não existir) e devolve o seu id. Arquivos
+    antigos continuam legíveis depois que os critérios mudam, porque cada dicionário fica guardado pelo id."""
+    identificador = id_dicionario(dicionario)
+    _DICIONARIOS[identificador] = dicionario
+    pasta = os.path.join(pasta_raiz, PASTA_DICIONARIOS)
+    caminho = os.path.join(pasta, f"{identificador}.bin")
+    if not os.path.exists(caminho):
+        os.makedirs(pasta, exist_ok=True)
+        caminho_tmp = f"{caminho}.{os.getpid()}.tmp"
+        with open(caminho_tmp, 'wb') as f:
+            f.write(dicionario)
+        os.replace(caminho_tmp, caminho)
+    return identificador
+
+def carregar_dicionario(identificador, pasta_arquivo="."):
+    """Dicionário pelo id, procurado em _dicionarios a partir de `pasta_arquivo`, subindo até a raiz.
+    O id é o hash do conteúdo, então o que já foi lido fica em memória pelo id."""
+    if identificador in _DICIONARIOS: return _DICIONARIOS[identificador]
+    pasta = os.path.abspath(pasta_arquivo)
+    while True:
+        caminho = os.path.join(pasta, PASTA_DICIONARIOS, f"{identificador}.bin")
+        if os.path.exists(caminho):
+            with open(caminho, 'rb') as f:
+                dicionario = f.read()
+            if id_dicionario(dicionario) == identificador:
+                _DICIONARIOS[identificador] = dicionario
+                return dicionario
+        if os.path.dirname(pasta) == pasta:
+            raise ErroCompressao(f"Dicionário de compressão '{identificador}' não encontrado em nenhuma pasta "
+                                 f"'{PASTA_DICIONARIOS}' acima de '{pasta_arquivo}'.")
+        pasta = os.path.dirname(pasta)
+
+def codecs_disponiveis():
+    return ["zlib"] + (["zstd"] if zstandard else [])
+
+
+# --- CODIFICAÇÃO ---
+def codificar(dados, codec, dicionario, meta_chave="_meta"):
+    """Serializa `dados` (respostas + meta) no formato comprimido."""
+    if codec == "zstd" and zstandard is None:
+        raise ErroCompressao("O codec zstd precisa do pacote 'zstandard' (pip install zstandard).")
+    meta = json.dumps(dados.get(meta_chave) or {}, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+    corpo = json.dumps({k: v for k, v in dados.items() if k != meta_chave}, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+    if codec == "zstd":
+        comprimido = zstandard.ZstdCompressor(level=10, dict_data=_dicionario_zstd(dicionario)).compress(corpo)
+    else:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS, zdict=dicionario)
+        comprimido = compressor.compress(corpo) + compressor.flush()
+    return _CABECALHO.pack(MAGICO, CODIGOS[codec], id_dicionario(dicionario).encode('ascii'), len(meta)) + meta + comprimido
+
+@lru_cache(maxsize=16)
+def _dicionario_zstd(dicionario):
+    return zstandard.ZstdCompressionDict(dicionario, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+
+def _descompressor(codigo, identificador, pasta_arquivo):
+    dicionario = carregar_dicionario(identificador, pasta_arquivo)
+    if codigo == CODIGOS["zstd"]:
+        if zstandard is None:
+            raise ErroCompressao("Arquivo comprimido com zstd: instale o pacote 'zstandard' para lê-lo.")
+        return zstandard.ZstdDecompressor(dict_data=_dicionario_zstd(dicionario)).decompressobj()
+    return zlib.decompressobj(zlib.MAX_WBITS, zdict=dicionario)
+
+
+# --- LEITURA ---
+def _ler_cabecalho(f):
+    """Devolve (codec, id do dicionário, meta) de um arquivo comprimido, ou None se não for desse formato."""
+    bruto = f.read(_CABECALHO.size)
+    if len(bruto) < _CABECALHO.size or not bruto.startswith(MAGICO):
+        f.seek(0)
+        return None
+    _, codigo, identificador, tamanho_meta = _CABECALHO.unpack(bruto)
+    return codigo, identificador.decode('ascii'), json.loads(f.read(tamanho_meta).decode('utf-8'))
+
+def comprimido(caminho_arquivo):
+    with open(caminho_arquivo, 'rb') as f:
+        return f.read(len(MAGICO)) == MAGICO
+
+def _ler(f, meta_chave, pasta_arquivo):
+    cabecalho = _ler_cabecalho(f)
+    if cabecalho is None:
+        if f.read(len(MAGICO_GZIP)) == MAGICO_GZIP:
+            f.seek(0)
+            with gzip.open(f, 'rt', encoding='utf-8') as g:
+                return json.load(g)
+        f.seek(0)
+        return json.loads(f.read().decode('utf-8-sig'))
+    codigo, identificador, meta = cabecalho
+    descompressor, partes = _descompressor(codigo, identificador, pasta_arquivo), []
+    for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b""):
+        partes.append(descompressor.decompress(bloco))
+    if hasattr(descompressor, "flush"): partes.append(descompressor.flush())
+    dados = json.loads(b"".join(partes).decode('utf-8'))
+    if meta: dados[meta_chave] = meta
+    return dados
+
+def carregar(caminho_arquivo, meta_chave="_meta"):
+    """Lê um arquivo de avaliação em qualquer formato, devolvendo o dicionário completo (respostas + meta)."""
+    with open(caminho_arquivo, 'rb') as f:
+        return _ler(f, meta_chave, os.path.dirname(caminho_arquivo) or ".")
+
+def decodificar(conteudo, meta_chave="_meta", pasta_arquivo="."):
+    """Como carregar, mas a partir dos bytes já lidos (`pasta_arquivo` é de onde vieram)."""
+    return _ler(io.BytesIO(conteudo), meta_chave, pasta_arquivo)
+
+def carregar_meta(caminho_arquivo, meta_chave="_meta"):
+    """Só a meta. Em arquivos comprimidos, lê apenas o cabeçalho, sem descomprimir as respostas."""
+    with open(caminho_arquivo, 'rb') as f:
+        cabecalho = _ler_cabecalho(f)
+    if cabecalho is not None: return cabecalho[2]
+    return carregar(caminho_arquivo).get(meta_chave) or {}
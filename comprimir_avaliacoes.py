@@ -0,0 +1,99 @@
+# --- comprimir_avaliacoes.py ---
+"""Converte os arquivos de avaliação entre JSON e o formato comprimido, e compara os codecs.
+
+O formato usado nos novos salvamentos é escolhido em nucleo.COMPRESSAO_AVALIACOES; a leitura
+reconhece qualquer formato, então a conversão pode ser feita aos poucos, com o app no ar
+(cada arquivo é regravado sob a mesma trava dos salvamentos, sem mudar a versão).
+
+Uso:
+    python comprimir_avaliacoes.py converter --codec zlib
+    python comprimir_avaliacoes.py converter --codec json      # volta para JSON indentado
+    python comprimir_avaliacoes.py comparar                     # tamanho e velocidade de cada codec
+"""
+import argparse
+import gzip
+import json
+import time
+
+import compressao
+from nucleo import (
+    CHAVE_META, PASTA_AVALIACOES, TravaIndisponivel, converter_avaliacao, dicionario_compressao,
+    listar_arquivos_avaliacao,
+)
+
+REPETICOES_COMPARACAO = 20
+
+
+def converter_pasta(codec, pasta=PASTA_AVALIACOES):
+    """Regrava todos os arquivos no formato `codec`. Devolve (tamanho antes, tamanho depois, falhas)."""
+    total_antes, total_depois, falhas = 0, 0, []
+    for caminho, *_ in listar_arquivos_avaliacao(pasta):
+        try:
+            antes, depois = converter_avaliacao(caminho, codec)
+        except (TravaIndisponivel, OSError, ValueError, compressao.ErroCompressao) as e:
+            falhas.append((caminho, str(e))); continue
+        total_antes += antes; total_depois += depois
+    return total_antes, total_depois, falhas
+
+
+def _formatos(dicionario):
+    """Nome -> (codificar, decodificar) dos formatos comparados."""
+    compacto = lambda d: json.dumps(d, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+    formatos = {
+        "json indentado": (lambda d: json.dumps(d, ensure_ascii=False, indent=4).encode('utf-8'), lambda b: json.loads(b)),
+        "json compacto": (compacto, lambda b: json.loads(b)),
+        "gzip": (lambda d: gzip.compress(compacto(d), 9), lambda b: json.loads(gzip.decompress(b))),
+    }
+    for codec in compressao.codecs_disponiveis():
+        formatos[f"{codec} + dicionário"] = (lambda d, c=codec: compressao.codificar(d, c, dicionario, CHAVE_META), None)
+    return formatos
+
+def comparar(pasta=PASTA_AVALIACOES, repeticoes=REPETICOES_COMPARACAO):
+    """Tamanho total e velocidade de codificação/decodificação (MB/s sobre o JSON indentado) de cada formato."""
+    arquivos = [compressao.carregar(caminho, CHAVE_META) for caminho, *_ in listar_arquivos_avaliacao(pasta)]
+    dicionario = dicionario_compressao()
+    compressao.registrar_dicionario(dicionario, pasta)
+    megabytes = sum(len(json.dumps(d, ensure_ascii=False, indent=4).encode('utf-8')) for d in arquivos) / 1e6
+    resultados = []
+    for nome, (codificar, decodificar) in _formatos(dicionario).items():
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            codificados = [codificar(d) for d in arquivos]
+        tempo_codificacao = (time.perf_counter() - inicio) / repeticoes
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            for bruto in codificados:
+                decodificar(bruto) if decodificar else compressao.decodificar(bruto, CHAVE_META, pasta)
+        tempo_decodificacao = (time.perf_counter() - inicio) / repeticoes
+        resultados.append((nome, sum(len(b) for b in codificados), megabytes / max(tempo_codificacao, 1e-9),
+                           megabytes / max(tempo_decodificacao, 1e-9)))
+    return len(arquivos), resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compressão dos arquivos de avaliação.")
+    parser.add_argument("--pasta", default=PASTA_AVALIACOES)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    converter = comandos.add_parser("converter", help="Regrava os arquivos no formato indicado.")
+    converter.add_argument("--codec", required=True, choices=["json", "zlib", "zstd"])
+    comandos.add_parser("comparar", help="Compara tamanho e velocidade dos formatos com os arquivos da pasta.")
+    args = parser.parse_args()
+
+    if args.comando == "converter":
+        if args.codec == "zstd" and "zstd" not in compressao.codecs_disponiveis():
+            parser.error("o codec zstd precisa do pacote 'zstandard' (pip install zstandard).")
+        antes, depois, falhas = converter_pasta(args.codec, args.pasta)
+        print(f"{antes / 1024:.1f} KB -> {depois / 1024:.1f} KB.")
+        for caminho, erro in falhas:
+            print(f"  Não convertido: {caminho} ({erro})")
+    else:
+        quantidade, resultados = comparar(args.pasta)
+        base = resultados[0][1] or 1
+        print(f"{quantidade} arquivo(s).")
+        print(f"{'formato':22} {'tamanho':>12} {'razão':>7} {'codifica':>12} {'decodifica':>12}")
+        for nome, tamanho, codificacao, decodificacao in resultados:
+            print(f"{nome:22} {tamanho / 1024:>9.1f} KB {base / max(tamanho, 1):>6.1f}x {codificacao:>7.1f} MB/s {decodificacao:>7.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# --- consolidar_avaliacoes.py ---
+"""Consolida avaliações da mesma entidade feitas por avaliadores diferentes.
+
+Os arquivos avaliacao_<Segmento>_<Município>[_<usuario>].json de uma pasta são agrupados por entidade;
+as respostas são alinhadas critério a critério e cada divergência vira uma linha do relatório de conflitos.
+
+Políticas de resolução de status:
+    nao_atende  - basta um avaliador marcar "Não Atende" (padrão, a mais conservadora);
+    revisor     - vale a resposta do --revisor; os demais só completam o que ele não respondeu;
+    maioria     - vence o status mais frequente; empate resulta em "Não Atende".
+Os links são sempre unidos e as observações de quem votou no status vencedor são mantidas.
+
+Uso:
+    python consolidar_avaliacoes.py                       # toda a pasta data/avaliacoes
+    python consolidar_avaliacoes.py --politica revisor --revisor gabriel --relatorio conflitos.csv
+"""
+import argparse
+import csv
+import os
+from collections import defaultdict
+
+from nucleo import (
+    ARQUIVO_CRITERIOS, PASTA_AVALIACOES, carregar_avaliacao, carregar_criterios, chave_resposta,
+    iterar_itens, listar_arquivos_avaliacao, nome_arquivo_avaliacao, resolver_entidade, salvar_avaliacao,
+)
+
+PASTA_CONSOLIDADAS = "data/consolidadas"
+USUARIO_CONSOLIDADO = "consolidado"
+POLITICAS = {
+    "nao_atende": "\"Não Atende\" prevalece",
+    "revisor": "Revisor prevalece",
+    "maioria": "Maioria dos avaliadores",
+}
+SEM_USUARIO = "(sem usuário)"
+
+
+def rotulo_usuario(usuario):
+    return usuario or SEM_USUARIO
+
+
+def agrupar_por_entidade(pasta=PASTA_AVALIACOES, matriz_completa=None):
+    """Agrupa os arquivos da pasta em {(segmento, municipio): {usuario: caminho}}."""
+    grupos = defaultdict(dict)
+    for caminho, segmento, municipio, usuario in listar_arquivos_avaliacao(pasta):
+        if usuario == USUARIO_CONSOLIDADO: continue
+        if matriz_completa: segmento, municipio = resolver_entidade(matriz_completa, segmento, municipio)
+        grupos[(segmento, municipio)][rotulo_usuario(usuario)] = caminho
+    return dict(grupos)
+
+
+def _resolver_status(votos, politica, revisor):
+    """votos: {usuario: status}, só de quem respondeu. Devolve o status escolhido pela política
+    ("Atende", como na pontuação, se ninguém respondeu)."""
+    if politica == "revisor" and revisor in votos:
+        return votos[revisor]
+    contagem = defaultdict(int)
+    for status in votos.values(): contagem[status] += 1
+    if politica == "maioria" and contagem["Atende"] != contagem["Não Atende"]:
+        return max(contagem, key=contagem.get)
+    return "Não Atende" if contagem["Não Atende"] else "Atende"
+
+
+def consolidar(avaliacoes, matriz_perguntas, politica="nao_atende", revisor=None, escolhas=None):
+    """Consolida {usuario: respostas} de uma entidade.
+
+    `escolhas` ({chave: valor}) sobrepõe a política para conflitos resolvidos manualmente.
+    Devolve (respostas_consolidadas, conflitos), onde cada conflito é um dicionário com
+    chave, secao, topico, criterio, subcriterio, tipo ('status', 'observacao' ou 'disponibilidade'), valores e escolhido.
+    Os de tipo 'disponibilidade' são escolhas manuais trocadas por "Não Atende" porque a Disponibilidade
+    consolidada ficou em "Não Atende" (valores = {"escolha": valor escolhido}). Links e observações vazios não são gravados.
+    """
+    escolhas = escolhas or {}
+    consolidada, conflitos = {}, []
+
+    for secao, item in iterar_itens(matriz_perguntas):
+        criterio = item['criterio']
+
+        chave_links = chave_resposta(secao, criterio, "links")
+        links = []
+        for respostas in avaliacoes.values():
+            for link in respostas.get(chave_links, []):
+                if link not in links: links.append(link)
+        if links: consolidada[chave_links] = links
+
+        for sub in item["subcriterios"]:
+            chave = chave_resposta(secao, criterio, sub)
+            votos = {u: r[chave] for u, r in avaliacoes.items() if chave in r}
+            escolhido = escolhas.get(chave) or _resolver_status(votos, politica, revisor)
+            consolidada[chave] = escolhido
+            base_conflito = {"chave": chave, "secao": secao, "topico": item['topico'], "criterio": criterio, "subcriterio": sub}
+            if len(set(votos.values())) > 1:
+                conflitos.append(dict(base_conflito, tipo="status", valores=votos, escolhido=escolhido))
+
+            # Observações só fazem sentido para "Não Atende"; mantém as de quem votou no status escolhido.
+            chave_obs = f"{chave}_obs"
+            observacoes = {u: r.get(chave_obs, "").strip() for u, r in avaliacoes.items() if votos.get(u) == escolhido and r.get(chave_obs, "").strip()}
+            if chave_obs in escolhas:
+                obs_final = escolhas[chave_obs]
+            elif politica == "revisor" and revisor in observacoes:
+                obs_final = observacoes[revisor]
+            else:
+                obs_final = " | ".join(dict.fromkeys(observacoes.values()))
+            if len(set(observacoes.values())) > 1:
+                conflitos.append(dict(base_conflito, chave=chave_obs, tipo="observacao", valores=observacoes, escolhido=obs_final))
+            if obs_final:
+                consolidada[chave_obs] = obs_final
+
+        # Mantém a regra da interface: sem Disponibilidade, nenhum outro subcritério pode ser atendido.
+        if consolidada.get(chave_resposta(secao, criterio, "Disponibilidade")) == "Não Atende":
+            for sub in item["subcriterios"]:
+                chave = chave_resposta(secao, criterio, sub)
+                if consolidada[chave] == "Não Atende": continue
+                if escolhas.get(chave):
+                    conflitos.append({"chave": chave, "secao": secao, "topico": item['topico'], "criterio": criterio, "subcriterio": sub,
+                                      "tipo": "disponibilidade", "valores": {"escolha": escolhas[chave]}, "escolhido": "Não Atende"})
+                consolidada[chave] = "Não Atende"
+
+    return consolidada, conflitos
+
+
+def consolidar_pasta(matriz_completa, pasta=PASTA_AVALIACOES, pasta_saida=PASTA_CONSOLIDADAS, politica="nao_atende", revisor=None, minimo_avaliadores=2):
+    """Consolida, em uma única passada, todas as entidades com pelo menos `minimo_avaliadores` arquivos.
+    Devolve {(segmento, municipio): (caminho_gravado, conflitos)}."""
+    resultado = {}
+    for (segmento, municipio), arquivos in sorted(agrupar_por_entidade(pasta, matriz_completa).items()):
+        if len(arquivos) < minimo_avaliadores or segmento not in matriz_completa: continue
+        avaliacoes = {usuario: carregar_avaliacao(caminho) for usuario, caminho in arquivos.items()}
+        consolidada, conflitos = consolidar(avaliacoes, matriz_completa[segmento], politica, revisor)
+        destino = os.path.join(pasta_saida, nome_arquivo_avaliacao(segmento, municipio, USUARIO_CONSOLIDADO))
+        salvar_avaliacao(destino, consolidada, usuario=USUARIO_CONSOLIDADO)
+        resultado[(segmento, municipio)] = (destino, conflitos)
+    return resultado
+
+
+def salvar_relatorio_conflitos(resultado, caminho):
+    with open(caminho, 'w', encoding='utf-8-sig', newline='') as f:
+        escritor = csv.writer(f, delimiter=";")
+        escritor.writerow(["segmento", "municipio", "secao", "topico", "subcriterio", "tipo", "valores", "escolhido"])
+        for (segmento, municipio), (_, conflitos) in resultado.items():
+            for c in conflitos:
+                valores = " / ".join(f"{u}: {v}" for u, v in c["valores"].items())
+                escritor.writerow([segmento, municipio, c["secao"], c["topico"], c["subcriterio"], c["tipo"], valores, c["escolhido"]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolida avaliações da mesma entidade feitas por vários avaliadores.")
+    parser.add_argument("--pasta", default=PASTA_AVALIACOES)
+    parser.add_argument("--saida", default=PASTA_CONSOLIDADAS)
+    parser.add_argument("--criterios", default=ARQUIVO_CRITERIOS)
+    parser.add_argument("--politica", choices=sorted(POLITICAS), default="nao_atende")
+    parser.add_argument("--revisor", help="Usuário cuja resposta prevalece com --politica revisor.")
+    parser.add_argument("--relatorio", default="relatorio_conflitos.csv")
+    args = parser.parse_args()
+    if args.politica == "revisor" and not args.revisor:
+        parser.error("--politica revisor exige --revisor.")
+
+    resultado = consolidar_pasta(carregar_criterios(args.criterios), args.pasta, args.saida, args.politica, args.revisor)
+    salvar_relatorio_conflitos(resultado, args.relatorio)
+    for (segmento, municipio), (destino, conflitos) in resultado.items():
+        print(f"{segmento} de {municipio}: {len(conflitos)} conflito(s) -> {destino}")
+    print(f"{len(resultado)} entidade(s) consolidada(s). Conflitos em: {args.relatorio}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# --- conteudo_relatorio.py ---
+"""Conteúdo do relatório (página de rosto e não conformidades por seção), sem formatação e sem dependência do Word.
+
+É o que o relatório .docx imprime (relatorio.py), usado também pela prévia em HTML (previa_relatorio.py)
+e pelo portal estático (portal_estatico.py). Um item entra se algum subcritério estiver como "Não Atende";
+com a Disponibilidade em "Não Atende", só ela é listada; os links do item e as observações dos
+subcritérios listados formam as "Evidências e Comentários".
+"""
+from nucleo import CHAVE_MUNICIPIOS, chave_resposta
+from pontuacao import calcular_indice_e_selo, calcular_pontuacao_secao
+
+TEXTO_SEM_NAO_CONFORMIDADES = "Nenhuma não conformidade foi encontrada nesta avaliação. Todos os critérios foram atendidos."
+
+
+# --- PÁGINA DE ROSTO ---
+# Campos que os modelos .docx podem usar (em modelos_relatorio.json: texto no .docx -> nome do campo).
+CAMPOS_DISPONIVEIS = ("segmento", "municipio", "entidade", "data", "exercicio", "usuario", "indice", "selo")
+CAMPOS_PADRAO = {"SEGMENTO": "segmento", "NOME DO CLIENTE": "municipio", "Data": "data"}
+
+def valores_dos_campos(capa, segmento, municipio, nome_usuario, agora):
+    """Valor de cada campo de CAMPOS_DISPONIVEIS, a partir dos textos de capa_gerada."""
+    return {"segmento": segmento, "municipio": municipio, "entidade": capa["entidade"], "data": agora.strftime("%d/%m/%Y"),
+            "exercicio": str(agora.year), "usuario": nome_usuario, "indice": capa["indice"], "selo": capa["selo"]}
+
+def preencher_campos_do_modelo(texto, valores, campos=CAMPOS_PADRAO):
+    """Troca os campos declarados pelo modelo .docx (na ordem da declaração) pelos valores do relatório."""
+    for marcador, campo in campos.items():
+        if marcador in texto: texto = texto.replace(marcador, valores[campo])
+    return texto
+
+def capa_gerada(respostas, municipio, segmento, matriz_perguntas, nome_usuario, agora, regras=None):
+    """Textos da página de rosto que o relatório monta (no modelo padrão) com o índice e o selo."""
+    resultados = calcular_indice_e_selo(respostas, matriz_perguntas, regras)
+    return {
+        "titulo": "PROGRAMA NACIONAL DE TRANSPARÊNCIA PÚBLICA", "subtitulo": "Relatório de Transparência",
+        "entidade": f"{segmento} de {municipio}", "indice": f"{resultados['indice']:.2f}%", "selo": f"{resultados['selo']}",
+        "introducao": f"Com base na Lei 12.527/2011 (Lei de Acesso à Informação), o nosso controle de qualidade fez uma avaliação geral da {segmento} de {municipio}, na qual, apresentou as seguintes informações:",
+        "linhas": [f"Exercício: {agora.year}", f"Avaliação feita por: {nome_usuario}", f"Data de Geração: {agora.strftime('%d/%m/%Y %H:%M:%S')}"],
+    }
+
+def introducao_plano(plano):
+    return (f"Índice atual: {plano['indice']:.2f}% ({plano['selo']}). Abaixo, o menor conjunto de itens a corrigir para alcançar cada selo, "
+            "considerando que todos os itens essenciais precisam ser atendidos.")
+
+
+# --- PONTUAÇÃO E NÃO CONFORMIDADES ---
+def pontuacoes_por_secao(respostas, matriz_perguntas, regras=None):
+    """[(seção, pontuação)] de todas as seções, na ordem da matriz (entrada dos gráficos de graficos.py)."""
+    return [(secao, calcular_pontuacao_secao(respostas, perguntas, secao, regras))
+            for secao, perguntas in matriz_perguntas.items() if secao != CHAVE_MUNICIPIOS]
+
+def normalizar_link(link_url):
+    return link_url if link_url.startswith("http://") or link_url.startswith("https://") else "http://" + link_url
+
+def item_nao_conforme(respostas, secao, item):
+    """Subcritérios listados no relatório e as observações deles: (subcritérios, [(subcritério, observação)])."""
+    listados, observacoes = [], []
+    disponibilidade = respostas.get(chave_resposta(secao, item['criterio'], "Disponibilidade"), "Atende")
+    if disponibilidade == "Não Atende":
+        listados.append("Disponibilidade")
+        obs_disp = respostas.get(f"{chave_resposta(secao, item['criterio'], 'Disponibilidade')}_obs", "")
+        if obs_disp: observacoes.append(("Disponibilidade", obs_disp))
+    for subcriterio in item["subcriterios"]:
+        if subcriterio == "Disponibilidade": continue
+        chave = chave_resposta(secao, item['criterio'], subcriterio)
+        if respostas.get(chave, "Atende") == "Não Atende" and (disponibilidade == "Atende" or "Disponibilidade" not in item["subcriterios"]):
+            listados.append(subcriterio)
+            obs = respostas.get(f"{chave}_obs", "")
+            if obs: observacoes.append((subcriterio, obs))
+    return listados, observacoes
+
+def nao_conformidades(respostas, matriz_perguntas, regras=None):
+    """Seções com itens não conformes, na ordem da matriz: lista de {"secao", "pontuacao", "itens"}, cada item
+    com "topico", "criterio", "classificacao", "subcriterios" (os listados), "links" e "observacoes"."""
+    secoes = []
+    for secao, perguntas in matriz_perguntas.items():
+        if secao == CHAVE_MUNICIPIOS: continue
+        itens = []
+        for item in perguntas:
+            if not any(respostas.get(chave_resposta(secao, item['criterio'], sub)) == "Não Atende" for sub in item["subcriterios"]):
+                continue
+            listados, observacoes = item_nao_conforme(respostas, secao, item)
+            links = sorted(set(respostas.get(chave_resposta(secao, item['criterio'], "links"), [])))
+            itens.append({"topico": item['topico'], "criterio": item['criterio'], "classificacao": item.get('classificacao', ''),
+                          "subcriterios": listados, "links": [normalizar_link(link) for link in links], "observacoes": observacoes})
+        if itens:
+            secoes.append({"secao": secao, "pontuacao": calcular_pontuacao_secao(respostas, perguntas, secao, regras), "itens": itens})
+    return secoes
@@ -0,0 +1,192 @@
+# --- graficos.py ---
+"""Gráficos da avaliação: barras com a pontuação de cada seção e um medidor do índice com as faixas de selo.
+
+Saem em SVG (vetorial, para as páginas HTML: prévia, painel do app e portal) ou em PNG (para o relatório
+.docx), sem biblioteca de gráficos: o SVG é montado como texto e o PNG é desenhado com o Pillow, em poucos
+milissegundos. As imagens ficam em um cache em memória limitado em bytes (MEMORIA_MAXIMA_GRAFICOS), cuja
+chave é o hash dos valores (arredondados a duas casas), do estilo e do formato; relatórios e páginas do mesmo
+processo compartilham o cache, então pontuações repetidas não redesenham a imagem.
+
+Uso:
+    png = grafico_secoes(pontuacoes_por_secao(respostas, matriz_perguntas), "png")
+    svg = grafico_selo(resultados["indice"], resultados["selo"], "svg")
+"""
+import hashlib
+import html
+import io
+import json
+import math
+import threading
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+from pontuacao import regras_vigentes
+
+MEMORIA_MAXIMA_GRAFICOS = 16 * 1024 * 1024  # bytes (ou caracteres, no SVG) guardados no cache
+ESTILO_PADRAO = {
+    "fonte": "Calibri, Arial, sans-serif", "texto": "#222222", "grade": "#dddddd", "fundo": "#ffffff",
+    "cores_pontuacao": [[75, "#2e7d32"], [50, "#f9a825"], [0, "#c62828"]],  # (mínimo, cor), do maior mínimo ao menor
+    "cores_faixas": ["#cfd8dc", "#b0bec5", "#ffd54f", "#4fc3f7", "#81c784"],  # abaixo do menor selo, depois um por selo
+    "ponteiro": "#37474f", "escala_png": 2,
+    "fontes_png": ["calibri.ttf", "arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"],  # a primeira que o sistema tiver
+}
+LARGURA_SECOES, ALTURA_LINHA, LARGURA_ROTULO, MARGEM = 700, 26, 290, 12
+LARGURA_SELO, ALTURA_SELO, RAIO_SELO, ESPESSURA_SELO = 320, 200, 130, 30
+TAMANHO_MAXIMO_ROTULO = 34
+
+
+# --- CACHE ---
+_cache = OrderedDict()
+_trava = threading.Lock()
+_uso = {"tamanho": 0, "acertos": 0, "faltas": 0}
+
+def _memorizado(tipo, formato, dados, estilo, desenhar):
+    """Imagem do cache ou desenhada agora; as mais antigas saem quando o cache passa do limite."""
+    chave = hashlib.sha256(json.dumps([tipo, formato, dados, estilo], ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+    with _trava:
+        imagem = _cache.get(chave)
+        if imagem is not None:
+            _cache.move_to_end(chave)
+            _uso["acertos"] += 1
+            return imagem
+        _uso["faltas"] += 1
+    imagem = desenhar()
+    with _trava:
+        if chave not in _cache and len(imagem) <= MEMORIA_MAXIMA_GRAFICOS:
+            _cache[chave] = imagem
+            _uso["tamanho"] += len(imagem)
+            while _uso["tamanho"] > MEMORIA_MAXIMA_GRAFICOS:
+                _, antiga = _cache.popitem(last=False)
+                _uso["tamanho"] -= len(antiga)
+    return imagem
+
+def estatisticas_cache():
+    with _trava:
+        return {"imagens": len(_cache), **_uso}
+
+def limpar_cache():
+    with _trava:
+        _cache.clear()
+        _uso.update(tamanho=0, acertos=0, faltas=0)
+
+
+# --- DESENHO ---
+def _cor_da_pontuacao(pontuacao, estilo):
+    return next((cor for minimo, cor in estilo["cores_pontuacao"] if pontuacao >= minimo), estilo["cores_pontuacao"][-1][1])
+
+def _rotulo(texto):
+    return texto if len(texto) <= TAMANHO_MAXIMO_ROTULO else texto[:TAMANHO_MAXIMO_ROTULO - 1] + "…"
+
+@lru_cache(maxsize=32)
+def _fonte(tamanho, fontes):
+    """(fonte, tem acentos): a primeira fonte do sistema encontrada ou, sem nenhuma, a embutida no Pillow (só ASCII)."""
+    for nome in fontes:
+        try:
+            return ImageFont.truetype(nome, tamanho), True
+        except OSError:
+            continue
+    return ImageFont.load_default(size=tamanho), False
+
+def _escrever(desenho, posicao, texto, tamanho, estilo, anchor):
+    fonte, acentos = _fonte(tamanho * estilo["escala_png"], tuple(estilo["fontes_png"]))
+    # Sem fonte do sistema, os acentos viram letras simples; os emojis dos selos (💎, 🥇...) nunca são desenhados.
+    texto = unicodedata.normalize("NFC" if acentos else "NFKD", texto)
+    texto = "".join(c for c in texto if ord(c) <= 0xFFFF and unicodedata.category(c) != "So" and (acentos or c.isascii())).strip()
+    desenho.text(posicao, texto, font=fonte, fill=estilo["texto"], anchor=anchor)
+
+def _png(imagem):
+    saida = io.BytesIO()
+    imagem.save(saida, format="PNG")
+    return saida.getvalue()
+
+def _svg(largura, altura, estilo, corpo):
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {largura} {altura}" width="{largura}" height="{altura}" '
+            f'font-family="{html.escape(estilo["fonte"])}" font-size="13" fill="{estilo["texto"]}">'
+            f'<rect width="{largura}" height="{altura}" fill="{estilo["fundo"]}"/>{"".join(corpo)}</svg>')
+
+def _desenhar_secoes(pontuacoes, formato, estilo):
+    altura = 2 * MARGEM + ALTURA_LINHA * len(pontuacoes) + 16
+    inicio, fim = LARGURA_ROTULO, LARGURA_SECOES - 90
+    x_de = lambda valor: inicio + (fim - inicio) * valor / 100
+    if formato == "svg":
+        corpo = [f'<line x1="{x_de(v):.1f}" y1="{MARGEM}" x2="{x_de(v):.1f}" y2="{altura - MARGEM - 16}" stroke="{estilo["grade"]}"/>'
+                 f'<text x="{x_de(v):.1f}" y="{altura - MARGEM}" font-size="11" text-anchor="middle">{v}%</text>' for v in (0, 25, 50, 75, 100)]
+        for i, (secao, pontuacao) in enumerate(pontuacoes):
+            y = MARGEM + i * ALTURA_LINHA
+            corpo.append(f'<text x="{inicio - 8}" y="{y + 17}" text-anchor="end"><title>{html.escape(secao)}</title>{html.escape(_rotulo(secao))}</text>'
+                         f'<rect x="{inicio}" y="{y + 4}" width="{x_de(pontuacao) - inicio:.1f}" height="{ALTURA_LINHA - 8}" fill="{_cor_da_pontuacao(pontuacao, estilo)}"/>'
+                         f'<text x="{x_de(pontuacao) + 6:.1f}" y="{y + 17}">{pontuacao:.2f}%</text>')
+        return _svg(LARGURA_SECOES, altura, estilo, corpo)
+
+    e = estilo["escala_png"]
+    imagem = Image.new("RGB", (LARGURA_SECOES * e, altura * e), estilo["fundo"])
+    desenho = ImageDraw.Draw(imagem)
+    for v in (0, 25, 50, 75, 100):
+        desenho.line([(x_de(v) * e, MARGEM * e), (x_de(v) * e, (altura - MARGEM - 16) * e)], fill=estilo["grade"], width=e)
+        _escrever(desenho, (x_de(v) * e, (altura - MARGEM) * e), f"{v}%", 11, estilo, "ms")
+    for i, (secao, pontuacao) in enumerate(pontuacoes):
+        y = MARGEM + i * ALTURA_LINHA
+        _escrever(desenho, ((inicio - 8) * e, (y + 17) * e), _rotulo(secao), 13, estilo, "rs")
+        if pontuacao > 0:
+            desenho.rectangle([inicio * e, (y + 4) * e, x_de(pontuacao) * e, (y + ALTURA_LINHA - 4) * e], fill=_cor_da_pontuacao(pontuacao, estilo))
+        _escrever(desenho, ((x_de(pontuacao) + 6) * e, (y + 17) * e), f"{pontuacao:.2f}%", 13, estilo, "ls")
+    return _png(imagem)
+
+def _faixas(minimos_selos, estilo):
+    """(início, fim, cor) de cada faixa do medidor: abaixo do menor selo e depois uma por selo."""
+    limites = [0] + sorted(minimos_selos) + [100]
+    cores = estilo["cores_faixas"]
+    return [(limites[i], limites[i + 1], cores[min(i, len(cores) - 1)]) for i in range(len(limites) - 1) if limites[i + 1] > limites[i]]
+
+def _ponto(valor, raio):
+    """Ponto do semicírculo do medidor: 0% à esquerda, 100% à direita, passando pelo topo."""
+    angulo = math.pi * (1 - valor / 100)
+    return LARGURA_SELO / 2 + raio * math.cos(angulo), ALTURA_SELO - 50 - raio * math.sin(angulo)
+
+def _desenhar_selo(indice, selo, minimos_selos, formato, estilo):
+    cx, cy = LARGURA_SELO / 2, ALTURA_SELO - 50
+    raio_interno = RAIO_SELO - ESPESSURA_SELO
+    px, py = _ponto(indice, RAIO_SELO - 4)
+    if formato == "svg":
+        corpo = []
+        for inicio, fim, cor in _faixas(minimos_selos, estilo):
+            (x0, y0), (x1, y1) = _ponto(inicio, RAIO_SELO), _ponto(fim, RAIO_SELO)
+            (x2, y2), (x3, y3) = _ponto(fim, raio_interno), _ponto(inicio, raio_interno)
+            corpo.append(f'<path d="M{x0:.1f},{y0:.1f} A{RAIO_SELO},{RAIO_SELO} 0 0 1 {x1:.1f},{y1:.1f} L{x2:.1f},{y2:.1f} '
+                         f'A{raio_interno},{raio_interno} 0 0 0 {x3:.1f},{y3:.1f} Z" fill="{cor}"/>')
+        corpo.append(f'<line x1="{cx}" y1="{cy}" x2="{px:.1f}" y2="{py:.1f}" stroke="{estilo["ponteiro"]}" stroke-width="4" stroke-linecap="round"/>'
+                     f'<circle cx="{cx}" cy="{cy}" r="7" fill="{estilo["ponteiro"]}"/>'
+                     f'<text x="{cx}" y="{cy + 28}" font-size="22" font-weight="bold" text-anchor="middle">{indice:.2f}%</text>'
+                     f'<text x="{cx}" y="{cy + 46}" font-size="14" text-anchor="middle">{html.escape(selo)}</text>')
+        return _svg(LARGURA_SELO, ALTURA_SELO, estilo, corpo)
+
+    e = estilo["escala_png"]
+    imagem = Image.new("RGB", (LARGURA_SELO * e, ALTURA_SELO * e), estilo["fundo"])
+    desenho = ImageDraw.Draw(imagem)
+    caixa = lambda raio: [(cx - raio) * e, (cy - raio) * e, (cx + raio) * e, (cy + raio) * e]
+    for inicio, fim, cor in _faixas(minimos_selos, estilo):
+        desenho.pieslice(caixa(RAIO_SELO), 180 + 1.8 * inicio, 180 + 1.8 * fim, fill=cor)
+    desenho.pieslice(caixa(raio_interno), 180, 360, fill=estilo["fundo"])
+    desenho.line([(cx * e, cy * e), (px * e, py * e)], fill=estilo["ponteiro"], width=4 * e)
+    desenho.ellipse(caixa(7), fill=estilo["ponteiro"])
+    _escrever(desenho, (cx * e, (cy + 28) * e), f"{indice:.2f}%", 22, estilo, "ms")
+    _escrever(desenho, (cx * e, (cy + 46) * e), selo, 14, estilo, "ms")
+    return _png(imagem)
+
+
+# --- API ---
+def grafico_secoes(pontuacoes, formato="svg", estilo=None):
+    """Barras horizontais com a pontuação (0 a 100) de cada seção. `pontuacoes`: [(seção, pontuação)]."""
+    estilo = {**ESTILO_PADRAO, **(estilo or {})}
+    dados = [[secao, round(pontuacao, 2)] for secao, pontuacao in pontuacoes]
+    return _memorizado("secoes", formato, dados, estilo, lambda: _desenhar_secoes(dados, formato, estilo))
+
+def grafico_selo(indice, selo, formato="svg", regras=None, estilo=None):
+    """Medidor do índice de transparência, com as faixas dos selos das regras de pontuação."""
+    estilo = {**ESTILO_PADRAO, **(estilo or {})}
+    minimos_selos = [minimo for minimo, _ in (regras or regras_vigentes())["selos"]]
+    dados = [round(indice, 2), selo, minimos_selos]
+    return _memorizado("selo", formato, dados, estilo, lambda: _desenhar_selo(dados[0], selo, minimos_selos, formato, estilo))
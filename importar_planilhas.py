@@ -0,0 +1,270 @@
+# --- importar_planilhas.py ---
+"""Importa em lote avaliações preenchidas em planilhas (.xlsx ou .csv).
+
+Layout esperado de cada planilha (uma avaliação por aba do .xlsx ou por arquivo .csv):
+
+    Segmento   | Prefeitura
+    Município  | Balsas
+    (linha em branco opcional)
+    topico | subcriterio     | status     | observacao        | links
+    1.1    | Disponibilidade | Atende     |                   | https://balsas.ma.gov.br
+    3.2    | Atualidade      | Não Atende | Última carga 2022 | https://a https://b
+
+- As linhas antes do cabeçalho são pares chave/valor: "Segmento" e "Município" são obrigatórios,
+  "Avaliador" é opcional (por padrão vale o --usuario da linha de comando).
+- "topico" é o número do item em criterios_por_topico.json (ex.: 3.2) e "subcriterio" um dos
+  subcritérios desse item. "status" aceita "Atende" ou "Não Atende" (sem diferenciar maiúsculas/acentos).
+  No .xlsx, formate a coluna "topico" como texto: digitado como número, 11.10 vira 11.1 (a linha é recusada
+  quando o número pode ser de dois tópicos).
+- "links" pode trazer vários endereços separados por espaço, ";" ou quebra de linha; eles valem para o item.
+- Se a Disponibilidade de um item for "Não Atende", os demais subcritérios seguem a mesma regra da interface.
+
+Uso:
+    python importar_planilhas.py planilhas/*.xlsx --usuario gabriel
+    python importar_planilhas.py planilhas/ --validar --relatorio erros.csv
+"""
+import argparse
+import csv
+import glob
+import os
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+from nucleo import (
+    ARQUIVO_CRITERIOS, CHAVE_MUNICIPIOS, PASTA_AVALIACOES, STATUS_VALIDOS, ConflitoDeVersao, TravaIndisponivel,
+    aplicar_cascata_disponibilidade, caminho_avaliacao, carregar_criterios, chave_resposta,
+    indexar_por_topico, salvar_avaliacao, segmentos,
+)
+
+COLUNAS = ("topico", "subcriterio", "status", "observacao", "links")
+EXTENSOES = (".xlsx", ".xlsm", ".csv")
+
+# Estado de cada processo do pool (preenchido por _inicializar_worker).
+_MATRIZ = None
+_INDICES = None
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e sem espaços extras, para comparar rótulos."""
+    texto = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join(texto.lower().split())
+
+
+def _inicializar_worker(matriz_completa):
+    global _MATRIZ, _INDICES
+    _MATRIZ = matriz_completa
+    _INDICES = {seg: indexar_por_topico(matriz_completa[seg]) for seg in segmentos(matriz_completa)}
+
+
+def _celula(valor, formato=None):
+    """Texto da célula. Um número não inteiro só vira texto se o formato fixar as casas decimais ("0.00");
+    sem isso ele continua float, porque o tópico 11.10 digitado como número chega como 11.1."""
+    if valor is None: return ""
+    if isinstance(valor, float):
+        if valor.is_integer(): return str(int(valor))
+        casas = re.fullmatch(r"0\.(0+)", str(formato or ""))
+        return f"{valor:.{len(casas.group(1))}f}" if casas else valor
+    return str(valor).strip()
+
+
+def _resolver_topico(topico, indice_topicos):
+    """Número do tópico como no modelo, ou None. Um float vale só se não puder ser confundido com outro
+    tópico (11.1 e 11.10); se puder, levanta ValueError."""
+    if not isinstance(topico, float): return topico if topico in indice_topicos else None
+    candidatos = [t for t in indice_topicos if re.fullmatch(r"\d+(\.\d+)?", t) and float(t) == topico]
+    if len(candidatos) > 1:
+        raise ValueError(f"Tópico {topico} digitado como número é ambíguo ({', '.join(candidatos)}); formate a coluna 'topico' como texto.")
+    return candidatos[0] if candidatos else None
+
+
+def ler_abas(caminho):
+    """Devolve [(nome_aba, linhas)] de um .xlsx ou .csv, com as células já convertidas em texto."""
+    if caminho.lower().endswith(".csv"):
+        with open(caminho, 'r', encoding='utf-8-sig', newline='') as f:
+            amostra = f.read(4096); f.seek(0)
+            # O Excel em português exporta CSV com ";"; usa o separador mais frequente na amostra.
+            delimitador = max(";,\t", key=amostra.count)
+            return [(os.path.basename(caminho), [[_celula(c) for c in linha] for linha in csv.reader(f, delimiter=delimitador)])]
+
+    try:
+        import openpyxl
+    except ImportError:
+        raise RuntimeError("Para ler planilhas .xlsx instale o pacote 'openpyxl'.")
+    livro = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        return [(aba.title, [[_celula(c.value, getattr(c, "number_format", None)) for c in linha] for linha in aba.iter_rows()])
+                for aba in livro.worksheets]
+    finally:
+        livro.close()
+
+
+def interpretar_aba(linhas, matriz_completa, indices, usuario_padrao):
+    """Converte as linhas de uma aba em (metadados, respostas, erros). Cada erro é (linha, mensagem)."""
+    erros, metadados = [], {}
+    inicio_dados = None
+    for n, linha in enumerate(linhas, start=1):
+        if not any(linha): continue
+        rotulo = normalizar(linha[0])
+        if rotulo == "topico":
+            cabecalho = [normalizar(c) for c in linha]
+            faltando = [c for c in COLUNAS[:3] if c not in cabecalho]
+            if faltando:
+                return None, None, [(n, f"Cabeçalho sem as colunas obrigatórias: {', '.join(faltando)}.")]
+            posicoes = {c: cabecalho.index(c) for c in COLUNAS if c in cabecalho}
+            inicio_dados = n
+            break
+        metadados[rotulo] = str(linha[1]) if len(linha) > 1 else ""
+    if inicio_dados is None:
+        return None, None, [(0, "Cabeçalho 'topico | subcriterio | status | observacao | links' não encontrado.")]
+
+    segmento = next((s for s in segmentos(matriz_completa) if normalizar(s) == normalizar(metadados.get("segmento"))), None)
+    municipio = next((m for m in matriz_completa.get(CHAVE_MUNICIPIOS, []) if normalizar(m) == normalizar(metadados.get("municipio"))), None)
+    if not segmento: erros.append((0, f"Segmento inválido: '{metadados.get('segmento', '')}'."))
+    if not municipio: erros.append((0, f"Município inválido: '{metadados.get('municipio', '')}'."))
+    if erros: return None, None, erros
+    meta = {"segmento": segmento, "municipio": municipio, "usuario": metadados.get("avaliador") or usuario_padrao}
+
+    indice_topicos = indices[segmento]
+    status_normalizados = {normalizar(s): s for s in STATUS_VALIDOS}
+    respostas, linha_por_chave, indisponiveis = {}, {}, []
+
+    def valor(linha, coluna):
+        pos = posicoes.get(coluna)
+        celula = linha[pos] if pos is not None and pos < len(linha) else ""
+        return celula if coluna == "topico" else str(celula)
+
+    for n, linha in enumerate(linhas[inicio_dados:], start=inicio_dados + 1):
+        if not any(linha): continue
+        try:
+            topico = _resolver_topico(valor(linha, "topico"), indice_topicos)
+        except ValueError as e:
+            erros.append((n, str(e))); continue
+        if topico is None:
+            erros.append((n, f"Tópico '{valor(linha, 'topico')}' não existe no segmento {segmento}.")); continue
+        secao, item = indice_topicos[topico]
+        sub = next((s for s in item["subcriterios"] if normalizar(s) == normalizar(valor(linha, "subcriterio"))), None)
+        if sub is None:
+            erros.append((n, f"Subcritério '{valor(linha, 'subcriterio')}' não se aplica ao tópico {topico} ({', '.join(item['subcriterios'])}).")); continue
+        status = status_normalizados.get(normalizar(valor(linha, "status")))
+        if status is None:
+            erros.append((n, f"Status '{valor(linha, 'status')}' inválido; use 'Atende' ou 'Não Atende'.")); continue
+
+        chave = chave_resposta(secao, item['criterio'], sub)
+        if chave in linha_por_chave:
+            erros.append((n, f"Subcritério repetido (já informado na linha {linha_por_chave[chave]}); esta linha prevalece."))
+        linha_por_chave[chave] = n
+        respostas[chave] = status
+        observacao = valor(linha, "observacao")
+        if observacao: respostas[f"{chave}_obs"] = observacao
+
+        links = [link for link in re.split(r"[\s;]+", valor(linha, "links")) if link]
+        if links:
+            lista_links = respostas.setdefault(chave_resposta(secao, item['criterio'], "links"), [])
+            lista_links.extend(link for link in dict.fromkeys(links) if link not in lista_links)
+
+        if sub == "Disponibilidade" and status == "Não Atende":
+            indisponiveis.append((secao, item))
+
+    # Mesma regra do callback on_disponibilidade_change da interface.
+    for secao, item in indisponiveis:
+        obs_disp = respostas.get(f"{chave_resposta(secao, item['criterio'], 'Disponibilidade')}_obs")
+        for sub in item["subcriterios"]:
+            chave = chave_resposta(secao, item['criterio'], sub)
+            if sub != "Disponibilidade" and respostas.get(chave) == "Atende":
+                erros.append((linha_por_chave[chave], f"'{sub}' marcado como Atende, mas a Disponibilidade do tópico {item['topico']} é Não Atende; considerado Não Atende."))
+        aplicar_cascata_disponibilidade(respostas, secao, item['criterio'], item["subcriterios"], "Não Atende")
+        if obs_disp: respostas[f"{chave_resposta(secao, item['criterio'], 'Disponibilidade')}_obs"] = obs_disp
+
+    return meta, respostas, erros
+
+
+def importar_arquivo(caminho, usuario_padrao, pasta_saida, validar_apenas=False, sobrescrever=False):
+    """Processa um arquivo de planilha. Devolve (arquivos_gravados, erros) com erros como dicionários."""
+    gravados, erros = [], []
+
+    def registrar(aba, linha, mensagem):
+        erros.append({"arquivo": caminho, "aba": aba, "linha": linha, "erro": mensagem})
+
+    try:
+        abas = ler_abas(caminho)
+    except Exception as e:
+        registrar("", 0, f"Não foi possível ler a planilha: {e}")
+        return gravados, erros
+
+    for nome_aba, linhas in abas:
+        meta, respostas, erros_aba = interpretar_aba(linhas, _MATRIZ, _INDICES, usuario_padrao)
+        for linha, mensagem in sorted(erros_aba, key=lambda e: e[0]): registrar(nome_aba, linha, mensagem)
+        if respostas is None or validar_apenas: continue
+
+        destino = caminho_avaliacao(meta["segmento"], meta["municipio"], meta["usuario"], pasta=pasta_saida)
+        # Sem --sobrescrever, o salvamento só acontece se o arquivo ainda não existir (versão 0), conferido sob
+        # a trava: duas abas (ou planilhas) para a mesma avaliação não se sobrescrevem.
+        try:
+            salvar_avaliacao(destino, respostas, None if sobrescrever else {"versao": 0, "hash": None}, usuario=meta["usuario"])
+        except ConflitoDeVersao:
+            registrar(nome_aba, 0, f"'{destino}' já existe; use --sobrescrever para substituí-lo.")
+            continue
+        except (TravaIndisponivel, OSError) as e:
+            registrar(nome_aba, 0, f"Não foi possível gravar '{destino}': {e}")
+            continue
+        gravados.append(destino)
+    return gravados, erros
+
+
+def _importar_arquivo_args(args):
+    return importar_arquivo(*args)
+
+
+def listar_planilhas(entradas):
+    """Expande diretórios e padrões glob em uma lista ordenada de planilhas."""
+    caminhos = set()
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for raiz, _, arquivos in os.walk(entrada):
+                caminhos.update(os.path.join(raiz, a) for a in arquivos if a.lower().endswith(EXTENSOES) and not a.startswith("~$"))
+        else:
+            caminhos.update(c for c in glob.glob(entrada) if c.lower().endswith(EXTENSOES))
+    return sorted(caminhos)
+
+
+def importar_lote(caminhos, matriz_completa, usuario_padrao, pasta_saida=PASTA_AVALIACOES, validar_apenas=False, sobrescrever=False, processos=None):
+    """Importa várias planilhas em paralelo. Devolve (arquivos_gravados, erros)."""
+    gravados, erros = [], []
+    tarefas = [(c, usuario_padrao, pasta_saida, validar_apenas, sobrescrever) for c in caminhos]
+    with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_worker, initargs=(matriz_completa,)) as executor:
+        for gravados_arquivo, erros_arquivo in executor.map(_importar_arquivo_args, tarefas, chunksize=max(1, len(tarefas) // 64)):
+            gravados.extend(gravados_arquivo); erros.extend(erros_arquivo)
+    return gravados, erros
+
+
+def salvar_relatorio_erros(erros, caminho):
+    with open(caminho, 'w', encoding='utf-8-sig', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=["arquivo", "aba", "linha", "erro"], delimiter=";")
+        escritor.writeheader(); escritor.writerows(erros)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa avaliações de planilhas para data/avaliacoes.")
+    parser.add_argument("entradas", nargs="+", help="Arquivos .xlsx/.csv, padrões glob ou diretórios.")
+    parser.add_argument("--usuario", default="", help="Avaliador usado no nome do arquivo quando a planilha não informa.")
+    parser.add_argument("--criterios", default=ARQUIVO_CRITERIOS)
+    parser.add_argument("--saida", default=PASTA_AVALIACOES, help="Pasta de destino das avaliações.")
+    parser.add_argument("--relatorio", default="relatorio_importacao.csv", help="CSV com os erros por linha.")
+    parser.add_argument("--validar", action="store_true", help="Apenas valida, sem gravar avaliações.")
+    parser.add_argument("--sobrescrever", action="store_true", help="Substitui avaliações já existentes.")
+    parser.add_argument("--processos", type=int, default=None)
+    args = parser.parse_args()
+
+    caminhos = listar_planilhas(args.entradas)
+    if not caminhos:
+        parser.error("Nenhuma planilha encontrada.")
+    gravados, erros = importar_lote(caminhos, carregar_criterios(args.criterios), args.usuario, args.saida,
+                                    args.validar, args.sobrescrever, args.processos)
+    salvar_relatorio_erros(erros, args.relatorio)
+    print(f"{len(caminhos)} planilha(s) lida(s), {len(gravados)} avaliação(ões) gravada(s), {len(erros)} erro(s).")
+    if erros: print(f"Detalhes dos erros em: {args.relatorio}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# --- indice_avaliacoes.py ---
+"""Organiza as avaliações em subpastas por entidade e mantém o índice da pasta (data/avaliacoes/_indice.json).
+
+Layout: data/avaliacoes/<Segmento>/<UF>/<código IBGE>/avaliacao_<Segmento>_<código>_<usuario>.json.
+O app e a API já gravam nesse layout e atualizam o índice a cada salvamento; este script serve para
+reorganizar os arquivos do layout plano anterior e para refazer o índice se ele se perder.
+
+Uso:
+    python indice_avaliacoes.py organizar          # com o app parado: move os arquivos planos para as subpastas
+    python indice_avaliacoes.py reconstruir
+    python indice_avaliacoes.py listar --usuario gabriel
+    python indice_avaliacoes.py listar --municipio "Balsas" --segmento Prefeitura
+"""
+import argparse
+import os
+from datetime import datetime
+
+from municipios import UF_PADRAO, codigo_municipio, codigo_por_nome_compacto, municipio_por_codigo
+from nucleo import (
+    PASTA_AVALIACOES, consultar_indice, interpretar_nome_arquivo, reconstruir_indice, trava_arquivo,
+)
+
+
+def organizar(pasta=PASTA_AVALIACOES, uf=UF_PADRAO):
+    """Move os arquivos soltos na raiz da pasta para <Segmento>/<UF>/<código>. Devolve (movidos, pendentes)."""
+    movidos, pendentes = 0, []
+    for nome in sorted(os.listdir(pasta)) if os.path.isdir(pasta) else []:
+        origem = os.path.join(pasta, nome)
+        partes = interpretar_nome_arquivo(nome)
+        if partes is None or not os.path.isfile(origem): continue
+        segmento, municipio, usuario = partes
+        registro = municipio_por_codigo(municipio) if municipio.isdigit() else None
+        codigo = municipio if registro else codigo_por_nome_compacto(municipio, uf) or municipio
+        uf_entidade = registro["uf"] if registro else uf
+        destino = os.path.join(pasta, segmento, uf_entidade, codigo,
+                               f"avaliacao_{segmento}_{codigo}{'_' + usuario if usuario else ''}.json")
+        if os.path.exists(destino):
+            pendentes.append(nome); continue
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with trava_arquivo(origem):
+            os.replace(origem, destino)
+        movidos += 1
+    return movidos, pendentes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Layout em subpastas e índice das avaliações.")
+    parser.add_argument("--pasta", default=PASTA_AVALIACOES)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    organizar_cmd = comandos.add_parser("organizar", help="Move os arquivos do layout plano para as subpastas e refaz o índice.")
+    organizar_cmd.add_argument("--uf", default=UF_PADRAO, help="UF dos arquivos antigos, nomeados pelo município.")
+    comandos.add_parser("reconstruir", help="Refaz o índice varrendo a pasta.")
+    listar = comandos.add_parser("listar", help="Consulta o índice.")
+    listar.add_argument("--usuario")
+    listar.add_argument("--segmento")
+    listar.add_argument("--municipio")
+    listar.add_argument("--uf", default=UF_PADRAO)
+    args = parser.parse_args()
+
+    if args.comando == "organizar":
+        movidos, pendentes = organizar(args.pasta, args.uf)
+        print(f"{movidos} arquivo(s) movido(s) para as subpastas.")
+        for nome in pendentes:
+            print(f"  Não movido (destino já existe): {nome}")
+        print(f"Índice com {reconstruir_indice(args.pasta)} avaliação(ões).")
+    elif args.comando == "reconstruir":
+        print(f"Índice com {reconstruir_indice(args.pasta)} avaliação(ões).")
+    else:
+        codigo = (codigo_municipio(args.municipio, args.uf) or args.municipio.replace(' ', '')) if args.municipio else None
+        for entrada in consultar_indice(args.pasta, args.usuario, args.segmento, codigo):
+            print(f"{datetime.fromtimestamp(entrada['mtime']):%Y-%m-%d %H:%M}  {entrada['segmento']:12} {entrada['municipio']:30} {entrada['usuario'] or '-':12} "
+                  f"{entrada['indice'] if entrada['indice'] is not None else '-':>6}  {entrada['selo']}")
+
+
+if __name__ == "__main__":
+    main()
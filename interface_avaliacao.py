@@ -0,0 +1,177 @@
+# --- interface_avaliacao.py ---
+"""Partes da tela de avaliação compartilhadas entre o app (sistema_final.py) e o avaliador offline
+(avaliacao_offline.py): as seções com os itens, no modo detalhado ou em grade, e os callbacks dos widgets.
+
+As funções trabalham sobre st.session_state.respostas; quem as chama carrega e grava as respostas.
+"""
+import streamlit as st
+import pandas as pd
+
+from nucleo import STATUS_VALIDOS, aplicar_cascata_disponibilidade, aplicar_edicao_em_grade, chave_resposta, subcriterio_da_observacao
+from pontuacao import calcular_pontuacao_secao
+
+
+# Callback para quando a opção de Disponibilidade muda
+def on_disponibilidade_change(secao, criterio, subcriterios):
+    chave_disponibilidade = f"{secao}_{criterio}_Disponibilidade"
+    novo_status_disponibilidade = st.session_state[chave_disponibilidade]
+    aplicar_cascata_disponibilidade(st.session_state.respostas, secao, criterio, subcriterios, novo_status_disponibilidade)
+    # st.rerun() # Removido, pois já foi explicado que não é necessário aqui.
+
+def handle_section_button_click(clicked_section_key):
+    # Este callback é acionado quando um dos botões de seção é clicado.
+    if st.session_state.open_expander_key == clicked_section_key:
+        st.session_state.open_expander_key = None # Se clicou no mesmo, fecha.
+    else:
+        st.session_state.open_expander_key = clicked_section_key # Abre o novo.
+    st.rerun() # Essencial para que a interface se redesenhe
+
+def renderizar_secao_em_grade(secao, perguntas):
+    """Modo grade: a seção inteira em uma única tabela editável, aplicada de uma vez ao clicar em "Aplicar"."""
+    respostas = st.session_state.respostas
+    colunas_sub = list(dict.fromkeys(sub for item in perguntas for sub in item["subcriterios"]))
+    linhas = []
+    for item in perguntas:
+        linha = {"topico": item['topico'], "criterio": item['criterio']}
+        for sub in colunas_sub:
+            linha[sub] = respostas.get(chave_resposta(secao, item['criterio'], sub), "Atende") if sub in item["subcriterios"] else None
+        sub_obs = subcriterio_da_observacao(respostas, secao, item)
+        linha["observacao"] = respostas.get(f"{chave_resposta(secao, item['criterio'], sub_obs)}_obs", "") if sub_obs else ""
+        linhas.append(linha)
+
+    configuracao_colunas = {
+        "topico": st.column_config.TextColumn("Tópico", width="small"),
+        "criterio": st.column_config.TextColumn("Critério", width="large"),
+        "observacao": st.column_config.TextColumn("Observação", width="medium"),
+    }
+    for sub in colunas_sub:
+        configuracao_colunas[sub] = st.column_config.SelectboxColumn(sub, options=STATUS_VALIDOS)
+
+    # A versão na chave descarta as edições pendentes da tabela depois de aplicadas.
+    versao_grade = st.session_state.get('versao_grade', 0)
+    with st.form(key=f"form_grade_{secao}_{versao_grade}", border=False):
+        editado = st.data_editor(pd.DataFrame(linhas), key=f"grade_{secao}_{versao_grade}", hide_index=True, use_container_width=True,
+                                 num_rows="fixed", disabled=["topico", "criterio"], column_config=configuracao_colunas)
+        st.caption("Células vazias: subcritério não se aplica ao item. Com a Disponibilidade em \"Não Atende\", os demais "
+                   "subcritérios acompanham. A observação vale para o primeiro subcritério em \"Não Atende\"; links e as "
+                   "demais observações ficam no modo detalhado.")
+        aplicar = st.form_submit_button("✔️ Aplicar alterações da seção", use_container_width=True)
+
+    if aplicar:
+        alteradas = aplicar_edicao_em_grade(respostas, secao, perguntas, editado.to_dict("records"))
+        concluir_alteracao_em_lote(alteradas, f"{len(alteradas)} resposta(s) alterada(s) em {secao}.")
+
+def concluir_alteracao_em_lote(alteradas, mensagem):
+    """Depois de alterar várias respostas de uma vez: descarta o estado dos widgets afetados e redesenha uma única vez."""
+    for chave in alteradas:
+        if chave in st.session_state: del st.session_state[chave] # Os widgets do modo detalhado mostram o novo valor.
+    st.session_state.versao_grade = st.session_state.get('versao_grade', 0) + 1 # Descarta edições pendentes da grade.
+    st.session_state.aviso_lote = mensagem
+    st.rerun()
+
+def renderizar_secoes(matriz_perguntas_segmento):
+    """Botões das seções (com a pontuação de cada uma) e os itens da seção aberta."""
+    if 'open_expander_key' not in st.session_state:
+        st.session_state.open_expander_key = None
+    modo_grade = st.toggle("▦ Modo grade: editar cada seção em uma única tabela", key="modo_grade")
+
+    for secao, perguntas in matriz_perguntas_segmento.items():
+        if secao == "Municipios_MA": continue
+
+        section_button_key = f"btn_section_{secao}"
+        score_secao_atendimento = calcular_pontuacao_secao(st.session_state.respostas, perguntas, secao)
+
+        # Botão para o tópico com porcentagem e on_click para gerenciar o acordeão
+        if st.button(f"**{secao}** - {score_secao_atendimento:.2f}%", key=section_button_key, use_container_width=True, on_click=handle_section_button_click, args=(section_button_key,)):
+            pass # O clique é gerenciado pelo on_click
+
+        # Exibe o conteúdo do tópico APENAS SE A CHAVE DO BOTÃO ESTIVER NO open_expander_key
+        if st.session_state.open_expander_key == section_button_key and modo_grade:
+            with st.container(border=True):
+                renderizar_secao_em_grade(secao, perguntas)
+
+        elif st.session_state.open_expander_key == section_button_key:
+            # Usamos st.container para agrupar o conteúdo que seria do expander
+            with st.container(border=True):
+                st.markdown("---") # Linha separadora visualmente
+
+                for item in perguntas:
+                    st.markdown(f"#### {item['topico']} - {item['criterio']}"); st.markdown("---")
+
+                    col_link_ui, _ = st.columns([1, 1])
+                    with col_link_ui:
+                        st.subheader("Links de Evidência")
+                        chave_links = f"{secao}_{item['criterio']}_links"
+                        if chave_links not in st.session_state.respostas:
+                            st.session_state.respostas[chave_links] = []
+
+                        for i, link in enumerate(st.session_state.respostas[chave_links]):
+                            link_cols = st.columns([10, 1])
+                            link_cols[0].info(link)
+                            if link_cols[1].button("X", key=f"rem_{chave_links}_{i}"): 
+                                st.session_state.respostas[chave_links].pop(i)
+                                st.rerun()
+
+                    link_cols = st.columns([10, 1])
+                    novo_link_key = f"add_{chave_links}"
+                    novo_link = link_cols[0].text_input("Adicionar novo link", value="", key=novo_link_key, label_visibility="collapsed")
+                    if link_cols[1].button("➕", key=f"btn_{chave_links}"):
+                        if novo_link and novo_link not in st.session_state.respostas[chave_links]:
+                            st.session_state.respostas[chave_links].append(novo_link)
+                            st.rerun()
+
+
+                    # AQUI: A seção "Critérios de Avaliação" deve ser renderizada para CADA ITEM.
+                    st.markdown("---"); st.subheader("Critérios de Avaliação")
+                    subcriterios = item["subcriterios"]
+
+                    # --- Renderização de Disponibilidade ---
+                    chave_disponibilidade_resposta = f"{secao}_{item['criterio']}_Disponibilidade"
+                    current_disponibilidade_status = st.session_state.respostas.get(chave_disponibilidade_resposta, "Atende")
+
+                    cols_disp = st.columns([1, 2])
+                    with cols_disp[0]:
+                        st.radio("Disponibilidade", ("Atende", "Não Atende"), 
+                                 index=1 if current_disponibilidade_status == "Não Atende" else 0, 
+                                 key=chave_disponibilidade_resposta, 
+                                 horizontal=True, 
+                                 on_change=on_disponibilidade_change, 
+                                 kwargs=dict(secao=secao, criterio=item['criterio'], subcriterios=subcriterios))
+
+                    if current_disponibilidade_status == "Não Atende":
+                        with cols_disp[1]:
+                            chave_obs_disp = f"{chave_disponibilidade_resposta}_obs"
+                            obs_disp = st.text_area("Observação:", value=st.session_state.respostas.get(chave_obs_disp, ""), key=chave_obs_disp)
+                            st.session_state.respostas[chave_obs_disp] = obs_disp
+
+                    # --- Renderização de Outros Subcritérios ---
+                    # Estes aparecem sempre na UI, independentemente do status de Disponibilidade.
+                    for subcriterio in subcriterios:
+                        if subcriterio == "Disponibilidade":
+                            continue # Já tratamos acima
+
+                        cols_sub = st.columns([1, 2])
+                        chave_resposta_sub = f"{secao}_{item['criterio']}_{subcriterio}"
+
+                        with cols_sub[0]:
+                            resposta_atual_sub = st.session_state.respostas.get(chave_resposta_sub, "Atende")
+
+                            # AQUI: A desabilitação é controlada pelo status de Disponibilidade
+                            disabled_by_disponibilidade = (current_disponibilidade_status == "Não Atende")
+
+                            display_index = 1 if resposta_atual_sub == "Não Atende" else 0
+
+                            st.radio(subcriterio, ("Atende", "Não Atende"), 
+                                     index=display_index, 
+                                     key=chave_resposta_sub, 
+                                     horizontal=True, 
+                                     disabled=disabled_by_disponibilidade) # Aplica o disabled aqui
+
+                        # EXIBIR CAMPO DE OBSERVAÇÃO PARA OUTROS CRITÉRIOS SE "NÃO ATENDE"
+                        if st.session_state.respostas.get(chave_resposta_sub) == "Não Atende":
+                            with cols_sub[1]:
+                                chave_obs_sub = f"{chave_resposta_sub}_obs"
+                                obs_sub = st.text_area("Observação:", value=st.session_state.respostas.get(chave_obs_sub, ""), key=chave_obs_sub, disabled=disabled_by_disponibilidade) # Aplica o disabled aqui também
+                                st.session_state.respostas[chave_obs_sub] = obs_sub
+
+                    st.markdown("---") # Mantém esse separador após o item completo
@@ -0,0 +1,295 @@
+# --- migrar_criterios.py ---
+"""Migra as avaliações salvas quando o arquivo de critérios muda (texto corrigido, pergunta reescrita, seção renomeada).
+
+As chaves das respostas contêm o texto da seção e do critério. Sem migração, uma resposta de um
+critério reescrito fica órfã e o item passa a contar como "Atende", inflando o índice.
+
+1. Os itens das duas versões são pareados, nesta ordem: pelo "id" estável do item, pelo texto
+   exato (seção + critério), pelo texto do critério em outra seção e, por fim, por similaridade
+   de texto (difflib) acima de --limiar. Os subcritérios de cada par são pareados do mesmo jeito,
+   primeiro pelo id estável ("ids_subcriterios" do item) e depois pelo nome.
+2. O pareamento vira um mapa chave antiga -> chave nova (status, observações e links); itens e
+   subcritérios sem par são removidos.
+3. As avaliações são reescritas em paralelo, com a mesma trava e controle de versão do app. O
+   padrão é só simular (dry-run): nada é gravado sem --aplicar, e antes de aplicar é feito um
+   snapshot de data/ (backup_avaliacoes.py).
+
+Os relatórios trazem as diferenças entre as versões (--diferencas) e, por avaliação, as chaves
+renomeadas/removidas, as que continuariam órfãs e o índice antes e depois (--relatorio).
+
+Uso:
+    git show HEAD~1:criterios_por_topico.json > criterios_anterior.json
+    python migrar_criterios.py criterios_anterior.json
+    python migrar_criterios.py criterios_anterior.json criterios_por_topico.json --aplicar
+    python migrar_criterios.py --atribuir-ids criterios_novos.json
+"""
+import argparse
+import csv
+import difflib
+import json
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+import compressao
+
+from nucleo import (
+    ARQUIVO_CRITERIOS, PASTA_AVALIACOES, ConflitoDeVersao, TravaIndisponivel, carregar_avaliacao_com_meta,
+    carregar_criterios, chave_resposta, iterar_itens, listar_arquivos_avaliacao, resolver_entidade,
+    salvar_avaliacao, segmentos, tipos_de_chave, validar_criterios, versao_criterios,
+)
+from pontuacao import calcular_indice_e_selo
+
+LIMIAR_SIMILARIDADE = 0.8
+USUARIO_MIGRACAO = "migracao"
+
+# Estado de cada processo do pool (preenchido por _inicializar_worker).
+_ANTIGO = _NOVO = _MAPAS = None
+_APLICAR = False
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join("".join(c if c.isalnum() else " " for c in texto.lower()).split())
+
+def similaridade(texto_a, texto_b):
+    return difflib.SequenceMatcher(None, _normalizar(texto_a), _normalizar(texto_b)).ratio()
+
+
+# --- DIFERENÇA ENTRE VERSÕES ---
+def _parear(antigos, novos, rotulo, limiar, bonus=None):
+    """Pareia duas listas: primeiro por rótulo exato, depois por similaridade (gulosa, do par mais parecido ao menos)."""
+    pares, novos_livres = [], list(novos)
+    antigos_livres = []
+    for antigo in antigos:
+        igual = next((n for n in novos_livres if rotulo(n) == rotulo(antigo)), None)
+        if igual is None:
+            antigos_livres.append(antigo)
+        else:
+            pares.append((antigo, igual, 1.0)); novos_livres.remove(igual)
+    candidatos = sorted(((similaridade(rotulo(a), rotulo(n)) + (bonus(a, n) if bonus else 0), i, j)
+                         for i, a in enumerate(antigos_livres) for j, n in enumerate(novos_livres)), reverse=True)
+    usados_a, usados_n = set(), set()
+    for pontuacao, i, j in candidatos:
+        if pontuacao < limiar: break
+        if i in usados_a or j in usados_n: continue
+        usados_a.add(i); usados_n.add(j)
+        pares.append((antigos_livres[i], novos_livres[j], min(pontuacao, 1.0)))
+    return (pares, [a for i, a in enumerate(antigos_livres) if i not in usados_a],
+            [n for j, n in enumerate(novos_livres) if j not in usados_n])
+
+def _parear_itens(itens_antigos, itens_novos, limiar):
+    """Pareia (secao, item) de duas versões de um segmento. Devolve (pares com método e similaridade, removidos, novos)."""
+    por_id = {item.get("id"): (secao, item) for secao, item in itens_novos if item.get("id")}
+    pares, restantes_antigos = [], []
+    for secao, item in itens_antigos:
+        correspondente = por_id.pop(item.get("id"), None) if item.get("id") else None
+        if correspondente:
+            pares.append(((secao, item), correspondente, "id", similaridade(item["criterio"], correspondente[1]["criterio"])))
+        else:
+            restantes_antigos.append((secao, item))
+    ja_pareados = {id(n[1]) for _, n, _, _ in pares}
+    restantes_novos = [(s, i) for s, i in itens_novos if id(i) not in ja_pareados]
+
+    exatos, restantes_antigos, restantes_novos = _parear(restantes_antigos, restantes_novos, lambda si: (si[0], si[1]["criterio"]), 1.01)
+    pares += [(a, n, "texto", 1.0) for a, n, _ in exatos]
+    mesma_pergunta, restantes_antigos, restantes_novos = _parear(restantes_antigos, restantes_novos, lambda si: _normalizar(si[1]["criterio"]), 1.01)
+    pares += [(a, n, "texto", 1.0) for a, n, _ in mesma_pergunta]
+    # Mesmo tópico na mesma seção é um bom indício de que é a mesma pergunta reescrita.
+    bonus = lambda a, n: 0.1 if (a[0], a[1].get("topico")) == (n[0], n[1].get("topico")) else 0
+    parecidos, removidos, novos = _parear(restantes_antigos, restantes_novos, lambda si: si[1]["criterio"], limiar, bonus)
+    pares += [(a, n, "similaridade", s) for a, n, s in parecidos]
+    return pares, removidos, novos
+
+def _parear_subcriterios(item_antigo, item_novo, limiar):
+    """Pareia os subcritérios de dois itens: pelo id estável e, nos que sobrarem, pelo nome."""
+    ids_novos = {id_sub: sub for sub, id_sub in (item_novo.get("ids_subcriterios") or {}).items()}
+    pares, antigos_livres = [], []
+    for sub in item_antigo["subcriterios"]:
+        correspondente = ids_novos.pop((item_antigo.get("ids_subcriterios") or {}).get(sub), None)
+        if correspondente is None: antigos_livres.append(sub)
+        else: pares.append((sub, correspondente, 1.0))
+    pareados = {novo for _, novo, _ in pares}
+    novos_livres = [sub for sub in item_novo["subcriterios"] if sub not in pareados]
+    por_nome, removidos, novos = _parear(antigos_livres, novos_livres, lambda s: s, limiar)
+    return pares + por_nome, removidos, novos
+
+def diferenca_criterios(antigo, novo, limiar=LIMIAR_SIMILARIDADE):
+    """Compara duas versões do arquivo de critérios. Devolve uma linha (dicionário) por item de cada segmento."""
+    linhas = []
+    for segmento in segmentos(novo):
+        if segmento not in antigo: continue
+        pares, removidos, novos = _parear_itens(list(iterar_itens(antigo[segmento])), list(iterar_itens(novo[segmento])), limiar)
+        for (secao_a, item_a), (secao_n, item_n), metodo, semelhanca in pares:
+            subs, subs_removidos, _ = _parear_subcriterios(item_a, item_n, limiar)
+            mapa_subs = {a: n for a, n, _ in subs}
+            mapa_subs.update({a: None for a in subs_removidos})
+            mesmo_texto = (secao_a, item_a["criterio"]) == (secao_n, item_n["criterio"])
+            linhas.append({"segmento": segmento, "situacao": "igual" if mesmo_texto and all(a == n for a, n in mapa_subs.items()) else "alterado",
+                           "metodo": metodo, "similaridade": round(semelhanca, 3), "id": item_n.get("id", ""),
+                           "secao_antiga": secao_a, "criterio_antigo": item_a["criterio"],
+                           "secao_nova": secao_n, "criterio_novo": item_n["criterio"], "subcriterios": mapa_subs})
+        for secao_a, item_a in removidos:
+            linhas.append({"segmento": segmento, "situacao": "removido", "metodo": "", "similaridade": "", "id": item_a.get("id", ""),
+                           "secao_antiga": secao_a, "criterio_antigo": item_a["criterio"], "secao_nova": "", "criterio_novo": "",
+                           "subcriterios": {sub: None for sub in item_a["subcriterios"]}})
+        for secao_n, item_n in novos:
+            linhas.append({"segmento": segmento, "situacao": "novo", "metodo": "", "similaridade": "", "id": item_n.get("id", ""),
+                           "secao_antiga": "", "criterio_antigo": "", "secao_nova": secao_n, "criterio_novo": item_n["criterio"],
+                           "subcriterios": {}})
+    return linhas
+
+def mapas_de_chaves(diferencas):
+    """{segmento: {chave antiga: chave nova ou None (removida)}}, só com as chaves que mudam."""
+    mapas = {}
+    for linha in diferencas:
+        if linha["situacao"] not in ("alterado", "removido"): continue
+        mapa = mapas.setdefault(linha["segmento"], {})
+        antigo, novo = (linha["secao_antiga"], linha["criterio_antigo"]), (linha["secao_nova"], linha["criterio_novo"])
+        removido = linha["situacao"] == "removido"
+        mapa[chave_resposta(*antigo, "links")] = None if removido else chave_resposta(*novo, "links")
+        for sub_antigo, sub_novo in linha["subcriterios"].items():
+            for sufixo in ("", "_obs"):
+                mapa[chave_resposta(*antigo, sub_antigo) + sufixo] = chave_resposta(*novo, sub_novo) + sufixo if sub_novo else None
+    for mapa in mapas.values():  # chaves que não mudam de nome não precisam constar no mapa
+        for chave in [c for c, n in mapa.items() if c == n]: del mapa[chave]
+    return mapas
+
+def migrar_respostas(respostas, mapa):
+    """Aplica o mapa de chaves. Devolve (novas respostas, quantidade renomeada, quantidade removida)."""
+    novas = {chave: valor for chave, valor in respostas.items() if chave not in mapa}
+    renomeadas = removidas = 0
+    for chave, valor in respostas.items():
+        if chave not in mapa: continue
+        if mapa[chave] is None:
+            removidas += 1
+        else:
+            novas[mapa[chave]] = valor; renomeadas += 1
+    return novas, renomeadas, removidas
+
+
+# --- REESCRITA EM PARALELO ---
+def _inicializar_worker(antigo, novo, mapas, aplicar):
+    global _ANTIGO, _NOVO, _MAPAS, _APLICAR
+    _ANTIGO, _NOVO, _MAPAS, _APLICAR = antigo, novo, mapas, aplicar
+
+def migrar_arquivo(caminho, segmento):
+    """Migra uma avaliação (gravando só com _APLICAR). Devolve a linha do relatório."""
+    linha = {"arquivo": caminho, "segmento": segmento, "renomeadas": 0, "removidas": 0, "orfas": 0,
+             "indice_antes": "", "indice_depois": "", "situacao": ""}
+    try:
+        respostas, meta = carregar_avaliacao_com_meta(caminho)
+        novas, linha["renomeadas"], linha["removidas"] = migrar_respostas(respostas, _MAPAS.get(segmento, {}))
+        tipos = tipos_de_chave(_NOVO[segmento])
+        linha["orfas"] = sum(1 for chave in novas if chave not in tipos)
+        if segmento in _ANTIGO:
+            linha["indice_antes"] = round(calcular_indice_e_selo(respostas, _ANTIGO[segmento])["indice"], 2)
+        resultado = calcular_indice_e_selo(novas, _NOVO[segmento])
+        linha["indice_depois"] = round(resultado["indice"], 2)
+        if not (linha["renomeadas"] or linha["removidas"]):
+            linha["situacao"] = "sem mudanças"
+        elif not _APLICAR:
+            linha["situacao"] = "simulado"
+        else:
+            salvar_avaliacao(caminho, novas, meta, USUARIO_MIGRACAO,
+                             {"regras": resultado["regras"], "indice": linha["indice_depois"], "selo": resultado["selo"],
+                              "criterios": versao_criterios(_NOVO)})
+            linha["situacao"] = "migrado"
+    except (ConflitoDeVersao, TravaIndisponivel) as e:
+        linha["situacao"] = f"erro: {e}"
+    except (OSError, ValueError, compressao.ErroCompressao) as e:  # arquivo ilegível: só ele fica de fora
+        linha["situacao"] = f"ilegível: {type(e).__name__}: {e}"
+    return linha
+
+def _migrar_arquivo_args(args):
+    return migrar_arquivo(*args)
+
+def migrar_pasta(antigo, novo, mapas, pasta=PASTA_AVALIACOES, aplicar=False, processos=None):
+    """Migra (ou simula) todas as avaliações da pasta em paralelo. Devolve as linhas do relatório."""
+    tarefas = []
+    for caminho, segmento, municipio, _ in listar_arquivos_avaliacao(pasta):
+        segmento, _ = resolver_entidade(novo, segmento, municipio)
+        if segmento in segmentos(novo): tarefas.append((caminho, segmento))
+    with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_worker, initargs=(antigo, novo, mapas, aplicar)) as executor:
+        return list(executor.map(_migrar_arquivo_args, tarefas, chunksize=max(1, len(tarefas) // 64)))
+
+
+# --- IDS ESTÁVEIS ---
+def atribuir_ids(matriz_completa):
+    """Dá um "id" aos itens que ainda não têm ("<3 letras do segmento>-<tópico>") e aos seus subcritérios
+    ("<id do item>/<n>"). Devolve quantos itens ou subcritérios receberam."""
+    atribuidos = 0
+    for segmento in segmentos(matriz_completa):
+        sigla = _normalizar(segmento).replace(" ", "")[:3].upper()
+        usados = {item["id"] for _, item in iterar_itens(matriz_completa[segmento]) if item.get("id")}
+        for _, item in iterar_itens(matriz_completa[segmento]):
+            if not item.get("id"):
+                candidato, n = f"{sigla}-{item['topico']}", 2
+                while candidato in usados:
+                    candidato, n = f"{sigla}-{item['topico']}-{n}", n + 1
+                item["id"] = candidato; usados.add(candidato); atribuidos += 1
+            ids_subcriterios = item.setdefault("ids_subcriterios", {})
+            n = len(ids_subcriterios) + 1
+            for sub in item["subcriterios"]:
+                if sub in ids_subcriterios: continue
+                while f"{item['id']}/{n}" in ids_subcriterios.values(): n += 1
+                ids_subcriterios[sub] = f"{item['id']}/{n}"; atribuidos += 1
+    return atribuidos
+
+
+def _salvar_csv(linhas, caminho, campos):
+    with open(caminho, 'w', encoding='utf-8-sig', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=campos, delimiter=";", extrasaction="ignore")
+        escritor.writeheader(); escritor.writerows(linhas)
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra as avaliações salvas para uma nova versão do arquivo de critérios.")
+    parser.add_argument("antigo", nargs="?", help="Versão anterior do arquivo de critérios.")
+    parser.add_argument("novo", nargs="?", default=ARQUIVO_CRITERIOS, help="Nova versão (padrão: a vigente).")
+    parser.add_argument("--aplicar", action="store_true", help="Grava as avaliações migradas (sem isso, só simula).")
+    parser.add_argument("--limiar", type=float, default=LIMIAR_SIMILARIDADE, help="Similaridade mínima para parear textos diferentes.")
+    parser.add_argument("--pasta", default=PASTA_AVALIACOES)
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--diferencas", default="diferencas_criterios.csv")
+    parser.add_argument("--relatorio", default="migracao_criterios.csv")
+    parser.add_argument("--sem-backup", action="store_true", help="Não cria o snapshot de data/ antes de aplicar.")
+    parser.add_argument("--atribuir-ids", metavar="ARQUIVO", help="Só atribui ids aos itens sem id do arquivo de critérios informado.")
+    args = parser.parse_args()
+
+    if args.atribuir_ids:
+        matriz = carregar_criterios(args.atribuir_ids)
+        atribuidos = atribuir_ids(matriz)
+        with open(args.atribuir_ids, 'w', encoding='utf-8') as f:
+            json.dump(matriz, f, ensure_ascii=False, indent=4)
+        print(f"{atribuidos} item(ns) ou subcritério(s) receberam id em '{args.atribuir_ids}'.")
+        return
+    if not args.antigo:
+        parser.error("Informe a versão anterior do arquivo de critérios.")
+
+    antigo, novo = carregar_criterios(args.antigo), carregar_criterios(args.novo)
+    erros = validar_criterios(novo)
+    if erros:
+        parser.error("A nova versão dos critérios tem problemas:\n  " + "\n  ".join(erros[:20]))
+
+    diferencas = diferenca_criterios(antigo, novo, args.limiar)
+    for linha in diferencas:
+        linha["subcriterios_mapeados"] = "; ".join(f"{a} -> {n or '(removido)'}" for a, n in linha["subcriterios"].items() if a != n)
+    _salvar_csv(diferencas, args.diferencas, ["segmento", "situacao", "metodo", "similaridade", "id", "secao_antiga", "criterio_antigo",
+                                               "secao_nova", "criterio_novo", "subcriterios_mapeados"])
+    contagem = {}
+    for linha in diferencas: contagem[linha["situacao"]] = contagem.get(linha["situacao"], 0) + 1
+    print(f"Critérios {versao_criterios(antigo) or '(sem versão)'} -> {versao_criterios(novo) or '(sem versão)'}: "
+          + ", ".join(f"{n} {situacao}" for situacao, n in sorted(contagem.items())) + f". Detalhes em: {args.diferencas}")
+
+    if args.aplicar and not args.sem_backup:
+        from backup_avaliacoes import criar_snapshot
+        id_snapshot, _ = criar_snapshot(motivo=f"antes da migração para os critérios {versao_criterios(novo)}", forcar=True)
+        print(f"Snapshot de segurança: {id_snapshot}")
+    linhas = migrar_pasta(antigo, novo, mapas_de_chaves(diferencas), args.pasta, args.aplicar, args.processos)
+    _salvar_csv(linhas, args.relatorio, ["arquivo", "segmento", "situacao", "renomeadas", "removidas", "orfas", "indice_antes", "indice_depois"])
+    afetadas = [l for l in linhas if l["situacao"] not in ("sem mudanças",)]
+    print(f"{len(linhas)} avaliação(ões) lida(s), {len(afetadas)} com mudanças"
+          + ("" if args.aplicar else " (simulação: use --aplicar para gravar)") + f". Detalhes em: {args.relatorio}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# --- modelos_relatorio.py ---
+"""Registro dos modelos de relatório (modelos_relatorio.json), compilados uma vez em esqueletos prontos para preencher.
+
+Cada modelo declara:
+    "arquivo"   o .docx base (estilos, margens, cabeçalho, rodapé, fundo);
+    "capa"      "gerada" (título, índice e selo montados pelo sistema) ou "modelo" (só os parágrafos do .docx);
+    "campos"    texto a trocar nos parágrafos do .docx -> campo (conteudo_relatorio.CAMPOS_DISPONIVEIS);
+    "timbrado"  imagem opcional posta no cabeçalho de todas as páginas ("largura_timbrado_cm" opcional).
+O modelo de um relatório vem, nesta ordem, de "clientes" (pela entidade, "<segmento> de <município>", ou só
+pelo município), do "template" do usuário em config.yaml e de "padrao". Um timbrado novo de cliente é uma
+imagem e uma entrada no registro, sem mudar código:
+
+    "modelos":  {"cliente_x": {"arquivo": "modelo_padrao.docx", "capa": "gerada", "campos": {}, "timbrado": "timbrados/x.png"}}
+    "clientes": {"Prefeitura de Bom Jardim": "cliente_x"}
+
+Na carga, cada modelo é validado (arquivos, capa, campos) e compilado: o esqueleto já traz o timbrado, a página
+de rosto com a formatação e o título do detalhamento, serializado em bytes, com a posição de cada texto a
+preencher. Cada relatório só abre o esqueleto e troca esses textos. O registro é recompilado se ele ou algum
+arquivo que ele cita mudar.
+
+Uso:
+    python modelos_relatorio.py                  # valida o registro e os modelos dos usuários de config.yaml
+    modelo = modelo_do_relatorio(usuario_config, segmento, municipio)
+    doc = preencher_esqueleto(modelo, valores_dos_campos(capa, ...), capa)
+"""
+import argparse
+import io
+import json
+import os
+import threading
+
+import docx
+import yaml
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Cm, Pt
+from yaml.loader import SafeLoader
+
+from conteudo_relatorio import CAMPOS_DISPONIVEIS, CAMPOS_PADRAO, preencher_campos_do_modelo
+
+ARQUIVO_MODELOS = "modelos_relatorio.json"
+ARQUIVO_CONFIG = "config.yaml"
+CAPAS = ("gerada", "modelo")
+
+_trava = threading.Lock()
+_vigentes = {}
+
+class ErroModelo(Exception):
+    """O registro de modelos é inválido, ou o modelo pedido não existe ou não pôde ser aberto."""
+
+
+# --- COMPILAÇÃO ---
+def _marcar(doc, marcas, *formatos):
+    """Registra os textos do último parágrafo (um formato por run) a preencher com os valores de capa_gerada."""
+    indice = len(doc.paragraphs) - 1
+    marcas += [(indice, run, formato) for run, formato in enumerate(formatos)]
+
+def _adicionar_capa_gerada(doc, marcas):
+    doc.add_paragraph()
+    p_title = doc.add_paragraph()
+    p_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run_title = p_title.add_run("{titulo}")
+    run_title.font.size = Pt(22); run_title.bold = True
+    _marcar(doc, marcas, "{titulo}")
+
+    p_subtitulo = doc.add_paragraph(); p_subtitulo.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p_subtitulo.add_run("{subtitulo}\n").bold = True
+    p_subtitulo.add_run("{entidade}").bold = True
+    _marcar(doc, marcas, "{subtitulo}\n", "{entidade}")
+
+    doc.add_paragraph()
+    p_score = doc.add_paragraph("{indice}"); p_score.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p_score.runs[0].font.size = Pt(48); p_score.runs[0].bold = True
+    _marcar(doc, marcas, "{indice}")
+    p_selo = doc.add_paragraph("{selo}"); p_selo.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p_selo.runs[0].font.size = Pt(24); p_selo.runs[0].bold = True
+    _marcar(doc, marcas, "{selo}")
+    doc.add_paragraph()
+
+    doc.add_paragraph("{introducao}")
+    _marcar(doc, marcas, "{introducao}")
+    doc.add_paragraph()
+
+    for i in range(3):  # exercício, avaliador e data de geração
+        doc.add_paragraph(f"{{linhas[{i}]}}")
+        _marcar(doc, marcas, f"{{linhas[{i}]}}")
+        doc.add_paragraph()
+
+def _aplicar_timbrado(doc, caminho, largura_cm):
+    for secao in doc.sections:
+        cabecalho = secao.header
+        cabecalho.is_linked_to_previous = False
+        paragrafo = cabecalho.paragraphs[0] if cabecalho.paragraphs else cabecalho.add_paragraph()
+        paragrafo.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        largura = Cm(largura_cm) if largura_cm else secao.page_width - secao.left_margin - secao.right_margin
+        paragrafo.add_run().add_picture(caminho, width=largura)
+
+def compilar_modelo(nome, definicao, pasta=""):
+    """Valida a definição de um modelo e monta o esqueleto do relatório (levanta ErroModelo)."""
+    capa = definicao.get("capa", "modelo")
+    if capa not in CAPAS:
+        raise ErroModelo(f"Modelo '{nome}': capa '{capa}' inválida (use {' ou '.join(CAPAS)}).")
+    campos = definicao.get("campos", CAMPOS_PADRAO)
+    desconhecidos = sorted(set(campos.values()) - set(CAMPOS_DISPONIVEIS))
+    if desconhecidos:
+        raise ErroModelo(f"Modelo '{nome}': campos desconhecidos {', '.join(desconhecidos)} (disponíveis: {', '.join(CAMPOS_DISPONIVEIS)}).")
+    if "arquivo" not in definicao:
+        raise ErroModelo(f"Modelo '{nome}' sem o campo 'arquivo'.")
+    arquivo = os.path.join(pasta, definicao["arquivo"])
+    timbrado = os.path.join(pasta, definicao["timbrado"]) if definicao.get("timbrado") else None
+    for caminho in filter(None, (arquivo, timbrado)):
+        if not os.path.exists(caminho):
+            raise ErroModelo(f"ERRO: Arquivo '{caminho}' do modelo '{nome}' não foi encontrado. Certifique-se de que ele está na mesma pasta do script.")
+    try:
+        doc = docx.Document(arquivo)
+    except Exception as e:
+        raise ErroModelo(f"Erro ao carregar o modelo de relatório '{arquivo}': {e}")
+    if timbrado:
+        try:
+            _aplicar_timbrado(doc, timbrado, definicao.get("largura_timbrado_cm"))
+        except Exception as e:
+            raise ErroModelo(f"Modelo '{nome}': timbrado '{timbrado}' inválido: {e or type(e).__name__}")
+
+    paragrafos = tuple(paragraph.text for paragraph in doc.paragraphs)
+    marcas = [(indice, None, texto) for indice, texto in enumerate(paragrafos) if any(marcador in texto for marcador in campos)]
+    if capa == "gerada":
+        _adicionar_capa_gerada(doc, marcas)
+    doc.add_page_break()
+    p_detalhe = doc.add_paragraph()
+    run_detalhe = p_detalhe.add_run("Detalhamento da Avaliação")
+    run_detalhe.font.size = Pt(18); run_detalhe.bold = True
+    doc.add_paragraph()
+
+    esqueleto = io.BytesIO()
+    doc.save(esqueleto)
+    return {"nome": nome, "descricao": definicao.get("descricao", ""), "capa": capa, "campos": dict(campos),
+            "arquivo": arquivo, "timbrado": timbrado, "paragrafos": paragrafos, "marcas": tuple(marcas),
+            "esqueleto": esqueleto.getvalue()}
+
+def _chave_cliente(texto):
+    return " ".join(str(texto).casefold().split())
+
+def compilar_registro(definicao, pasta=""):
+    """Valida o registro e compila todos os modelos dele (levanta ErroModelo)."""
+    modelos = definicao.get("modelos") or {}
+    if not modelos:
+        raise ErroModelo("Registro de modelos sem nenhum modelo em 'modelos'.")
+    padrao = definicao.get("padrao", "padrao")
+    clientes = {_chave_cliente(cliente): nome for cliente, nome in (definicao.get("clientes") or {}).items()}
+    for nome in [padrao, *clientes.values()]:
+        if nome not in modelos:
+            raise ErroModelo(f"Registro de modelos: '{nome}' não está em 'modelos'.")
+    compilados = {nome: compilar_modelo(nome, definicao_modelo, pasta) for nome, definicao_modelo in modelos.items()}
+    arquivos = sorted({caminho for modelo in compilados.values() for caminho in (modelo["arquivo"], modelo["timbrado"]) if caminho})
+    return {"padrao": padrao, "modelos": compilados, "clientes": clientes, "arquivos": arquivos}
+
+def _assinatura(arquivos):
+    return tuple(os.stat(caminho).st_mtime_ns if os.path.exists(caminho) else None for caminho in arquivos)
+
+def carregar_registro(caminho_arquivo=ARQUIVO_MODELOS):
+    """Lê e compila um registro de modelos."""
+    try:
+        with open(caminho_arquivo, 'r', encoding='utf-8') as f:
+            definicao = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ErroModelo(f"Erro ao ler o registro de modelos '{caminho_arquivo}': {e}")
+    registro = compilar_registro(definicao, os.path.dirname(caminho_arquivo))
+    registro["arquivos"] = [caminho_arquivo] + registro["arquivos"]
+    registro["assinatura"] = _assinatura(registro["arquivos"])
+    return registro
+
+def modelos_vigentes(caminho_arquivo=ARQUIVO_MODELOS):
+    """Registro em uso, compilado uma vez por processo e de novo só se o registro ou um dos arquivos mudar."""
+    with _trava:
+        registro = _vigentes.get(caminho_arquivo)
+        if registro is None or _assinatura(registro["arquivos"]) != registro["assinatura"]:
+            registro = _vigentes[caminho_arquivo] = carregar_registro(caminho_arquivo)
+        return registro
+
+
+# --- SELEÇÃO E PREENCHIMENTO ---
+def modelo_do_relatorio(usuario_config, segmento, municipio, caminho_arquivo=ARQUIVO_MODELOS):
+    """Modelo compilado do relatório da entidade: o do cliente, o do usuário ou o padrão do registro."""
+    registro = modelos_vigentes(caminho_arquivo)
+    nome = (registro["clientes"].get(_chave_cliente(f"{segmento} de {municipio}"))
+            or registro["clientes"].get(_chave_cliente(municipio))
+            or usuario_config.get('template') or registro["padrao"])
+    if nome not in registro["modelos"]:
+        raise ErroModelo(f"ERRO: O modelo de relatório '{nome}' não está em '{caminho_arquivo}'.")
+    return registro["modelos"][nome]
+
+def preencher_esqueleto(modelo, valores, capa):
+    """Documento Word do esqueleto do modelo com os campos e a página de rosto preenchidos, pronto para o detalhamento."""
+    doc = docx.Document(io.BytesIO(modelo["esqueleto"]))
+    paragrafos = doc.paragraphs
+    for indice, run, texto in modelo["marcas"]:
+        if run is None:
+            preenchido = preencher_campos_do_modelo(texto, valores, modelo["campos"])
+            if preenchido != texto:
+                paragrafos[indice].text = preenchido
+        else:
+            paragrafos[indice].runs[run].text = texto.format(**capa)
+    return doc
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida e compila os modelos de relatório.")
+    parser.add_argument("--modelos", default=ARQUIVO_MODELOS)
+    parser.add_argument("--config", default=ARQUIVO_CONFIG, help="Confere também o 'template' de cada usuário.")
+    args = parser.parse_args()
+    try:
+        registro = carregar_registro(args.modelos)
+    except ErroModelo as e:
+        parser.exit(1, f"{e}\n")
+    for nome, modelo in registro["modelos"].items():
+        encontrados = [marcador for marcador in modelo["campos"] if any(marcador in texto for texto in modelo["paragrafos"])]
+        print(f"{nome}{' (padrão)' if nome == registro['padrao'] else ''}: {modelo['arquivo']}, capa {modelo['capa']}, "
+              f"timbrado {modelo['timbrado'] or '-'}, campos no .docx: {', '.join(encontrados) or 'nenhum'} "
+              f"({len(modelo['esqueleto']) / 1024:.0f} KB)")
+    for cliente, nome in registro["clientes"].items():
+        print(f"cliente '{cliente}' -> {nome}")
+    usuarios = {}
+    if os.path.exists(args.config):
+        with open(args.config, 'r', encoding='utf-8') as f:
+            usuarios = (yaml.load(f, Loader=SafeLoader) or {}).get("credentials", {}).get("usernames", {}) or {}
+    sem_modelo = [f"{usuario} ({config['template']})" for usuario, config in usuarios.items()
+                  if (config or {}).get("template") and config["template"] not in registro["modelos"]]
+    if sem_modelo:
+        parser.exit(1, f"Usuários com um modelo fora do registro: {', '.join(sem_modelo)}.\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# --- municipios.py ---
+"""Catálogo de municípios (código IBGE, UF e nome) com busca sem acentos.
+
+O catálogo fica em municipios_ibge.csv (codigo_ibge;uf;nome), separado do arquivo de critérios.
+É lido uma vez por processo (o cache é renovado se o arquivo mudar) e indexado por código, por UF e
+por nome normalizado, para a busca por prefixo de qualquer palavra do nome, com aproximação (difflib)
+como alternativa para erros de digitação. As entidades estaduais usam o código IBGE da UF (2 dígitos).
+
+Uso:
+    python municipios.py buscar "sao luis"
+    python municipios.py buscar "imperatiz" --uf MA
+    python municipios.py importar PI CE           # baixa da API de localidades do IBGE e acrescenta ao catálogo
+    python municipios.py renomear data/avaliacoes  # com o app parado: arquivos antigos (nome do município) -> código IBGE
+"""
+import argparse
+import bisect
+import csv
+import difflib
+import json
+import os
+import unicodedata
+import urllib.request
+from functools import lru_cache
+
+ARQUIVO_MUNICIPIOS = "municipios_ibge.csv"
+UF_PADRAO = "MA"
+URL_IBGE_MUNICIPIOS = "https://servicodados.ibge.gov.br/api/v1/localidades/estados/{uf}/municipios"
+
+# Sigla -> (código IBGE, nome) das unidades da federação.
+UFS = {
+    "RO": ("11", "Rondônia"), "AC": ("12", "Acre"), "AM": ("13", "Amazonas"), "RR": ("14", "Roraima"),
+    "PA": ("15", "Pará"), "AP": ("16", "Amapá"), "TO": ("17", "Tocantins"), "MA": ("21", "Maranhão"),
+    "PI": ("22", "Piauí"), "CE": ("23", "Ceará"), "RN": ("24", "Rio Grande do Norte"), "PB": ("25", "Paraíba"),
+    "PE": ("26", "Pernambuco"), "AL": ("27", "Alagoas"), "SE": ("28", "Sergipe"), "BA": ("29", "Bahia"),
+    "MG": ("31", "Minas Gerais"), "ES": ("32", "Espírito Santo"), "RJ": ("33", "Rio de Janeiro"), "SP": ("35", "São Paulo"),
+    "PR": ("41", "Paraná"), "SC": ("42", "Santa Catarina"), "RS": ("43", "Rio Grande do Sul"),
+    "MS": ("50", "Mato Grosso do Sul"), "MT": ("51", "Mato Grosso"), "GO": ("52", "Goiás"), "DF": ("53", "Distrito Federal"),
+}
+
+
+def normalizar_nome(texto):
+    """Minúsculas, sem acentos, com hífens e apóstrofos trocados por espaço ("Pau D'Arco" -> "pau d arco")."""
+    texto = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join("".join(c if c.isalnum() else " " for c in texto).split())
+
+
+# --- CATÁLOGO ---
+def _assinatura(caminho_arquivo):
+    try:
+        estado = os.stat(caminho_arquivo)
+    except FileNotFoundError:
+        return None
+    return estado.st_mtime_ns, estado.st_size
+
+@lru_cache(maxsize=4)
+def _catalogo_da_versao(caminho_arquivo, assinatura):
+    registros = []
+    if assinatura is not None:
+        with open(caminho_arquivo, 'r', encoding='utf-8-sig', newline='') as f:
+            for linha in csv.DictReader(f, delimiter=";"):
+                registros.append({"codigo": linha["codigo_ibge"].strip(), "uf": linha["uf"].strip().upper(),
+                                  "nome": linha["nome"].strip(), "tipo": "municipio"})
+    for uf in sorted({r["uf"] for r in registros}):
+        codigo, nome = UFS[uf]
+        registros.append({"codigo": codigo, "uf": uf, "nome": f"Estado do {nome}" if uf != "DF" else nome, "tipo": "estado"})
+
+    por_uf, palavras = {}, []
+    for registro in registros:
+        registro["normalizado"] = normalizar_nome(registro["nome"])
+        if registro["tipo"] == "municipio": por_uf.setdefault(registro["uf"], []).append(registro)
+        # Um prefixo pode casar com qualquer palavra do nome: "luis" encontra "São Luís".
+        palavras_nome = registro["normalizado"].split()
+        for i in range(len(palavras_nome)):
+            palavras.append((" ".join(palavras_nome[i:]), registro["codigo"]))
+    for lista in por_uf.values():
+        lista.sort(key=lambda r: r["normalizado"])
+    palavras.sort()
+    return {"por_codigo": {r["codigo"]: r for r in registros}, "por_uf": por_uf, "palavras": palavras,
+            "chaves": [p for p, _ in palavras],
+            "por_nome": {(r["uf"], r["normalizado"]): r for r in registros if r["tipo"] == "municipio"},
+            "por_nome_compacto": {(r["uf"], r["normalizado"].replace(" ", "")): r for r in registros if r["tipo"] == "municipio"}}
+
+def carregar_catalogo(caminho_arquivo=ARQUIVO_MUNICIPIOS):
+    """Catálogo indexado. Fica em cache até o arquivo mudar; não deve ser alterado por quem o recebe."""
+    return _catalogo_da_versao(caminho_arquivo, _assinatura(caminho_arquivo))
+
+def ufs_disponiveis(catalogo):
+    return sorted(catalogo["por_uf"])
+
+def municipios_da_uf(catalogo, uf=UF_PADRAO):
+    """Municípios da UF em ordem alfabética (sem acentos)."""
+    return catalogo["por_uf"].get(uf, [])
+
+def buscar_municipios(catalogo, consulta, uf=None, limite=10, incluir_estados=False):
+    """Busca sem acentos por prefixo de qualquer palavra do nome; se nada casar, por aproximação."""
+    termo = normalizar_nome(consulta)
+    if not termo: return []
+    aceitar = lambda r: (uf is None or r["uf"] == uf) and (incluir_estados or r["tipo"] == "municipio")
+    encontrados, vistos = [], set()
+    posicao = bisect.bisect_left(catalogo["chaves"], termo)
+    while posicao < len(catalogo["chaves"]) and catalogo["chaves"][posicao].startswith(termo):
+        registro = catalogo["por_codigo"][catalogo["palavras"][posicao][1]]
+        if registro["codigo"] not in vistos and aceitar(registro):
+            encontrados.append(registro); vistos.add(registro["codigo"])
+        posicao += 1
+    # Nomes que começam pelo termo vêm antes dos que só têm uma palavra começando por ele.
+    encontrados = sorted(encontrados, key=lambda r: (not r["normalizado"].startswith(termo), r["normalizado"], r["uf"]))[:limite]
+    if not encontrados:
+        candidatos = {r["normalizado"]: r for r in catalogo["por_codigo"].values() if aceitar(r)}
+        for nome in difflib.get_close_matches(termo, list(candidatos), n=limite, cutoff=0.75):
+            encontrados.append(candidatos[nome])
+    return encontrados
+
+def codigo_municipio(nome, uf=UF_PADRAO, catalogo=None):
+    """Código IBGE pelo nome do município (sem diferenciar acentos e maiúsculas), ou None."""
+    registro = (catalogo or carregar_catalogo())["por_nome"].get((uf, normalizar_nome(nome)))
+    return registro["codigo"] if registro else None
+
+def codigo_por_nome_compacto(nome_compacto, uf=UF_PADRAO, catalogo=None):
+    """Código IBGE a partir do nome sem espaços usado nos arquivos antigos ("SantaLuziadoParuá"), ou None."""
+    registro = (catalogo or carregar_catalogo())["por_nome_compacto"].get((uf, normalizar_nome(nome_compacto).replace(" ", "")))
+    return registro["codigo"] if registro else None
+
+def municipio_por_codigo(codigo, catalogo=None):
+    """Registro (codigo, uf, nome, tipo) pelo código IBGE, ou None."""
+    return (catalogo or carregar_catalogo())["por_codigo"].get(str(codigo))
+
+
+# --- MANUTENÇÃO ---
+def importar_ufs(ufs, caminho_arquivo=ARQUIVO_MUNICIPIOS):
+    """Acrescenta (ou atualiza) no catálogo os municípios das UFs, consultando a API de localidades do IBGE."""
+    registros = {}
+    if os.path.exists(caminho_arquivo):
+        with open(caminho_arquivo, 'r', encoding='utf-8-sig', newline='') as f:
+            registros = {linha["codigo_ibge"]: linha for linha in csv.DictReader(f, delimiter=";")}
+    for uf in ufs:
+        with urllib.request.urlopen(URL_IBGE_MUNICIPIOS.format(uf=UFS[uf][0]), timeout=30) as resposta:
+            for municipio in json.load(resposta):
+                registros[str(municipio["id"])] = {"codigo_ibge": str(municipio["id"]), "uf": uf, "nome": municipio["nome"]}
+    caminho_tmp = f"{caminho_arquivo}.{os.getpid()}.tmp"
+    with open(caminho_tmp, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=["codigo_ibge", "uf", "nome"], delimiter=";", lineterminator="\n")
+        escritor.writeheader(); escritor.writerows(sorted(registros.values(), key=lambda r: r["codigo_ibge"]))
+    os.replace(caminho_tmp, caminho_arquivo)
+    return len(registros)
+
+def renomear_arquivos_antigos(pasta, uf=UF_PADRAO):
+    """Renomeia 'avaliacao_<Segmento>_<NomeSemEspacos>[_usuario].json' para usar o código IBGE. Devolve (renomeados, pendentes)."""
+    renomeados, pendentes = 0, []
+    for nome in sorted(os.listdir(pasta)) if os.path.isdir(pasta) else []:
+        nome_nfc = unicodedata.normalize("NFC", nome)
+        if not (nome_nfc.startswith("avaliacao_") and nome_nfc.endswith(".json")): continue
+        partes = nome_nfc[len("avaliacao_"):-len(".json")].split("_", 2)
+        if len(partes) < 2 or partes[1].isdigit(): continue
+        codigo = codigo_por_nome_compacto(partes[1], uf)
+        novo = "_".join(["avaliacao", partes[0], codigo] + partes[2:]) + ".json" if codigo else None
+        if novo is None or os.path.exists(os.path.join(pasta, novo)):
+            pendentes.append(nome); continue
+        os.replace(os.path.join(pasta, nome), os.path.join(pasta, novo))
+        renomeados += 1
+    return renomeados, pendentes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catálogo de municípios com códigos IBGE.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    buscar = comandos.add_parser("buscar", help="Busca municípios pelo nome (sem diferenciar acentos).")
+    buscar.add_argument("consulta")
+    buscar.add_argument("--uf")
+    buscar.add_argument("--limite", type=int, default=10)
+    importar = comandos.add_parser("importar", help="Acrescenta ao catálogo os municípios das UFs (API do IBGE).")
+    importar.add_argument("ufs", nargs="+", choices=sorted(UFS))
+    renomear = comandos.add_parser("renomear", help="Renomeia arquivos de avaliação antigos para o código IBGE.")
+    renomear.add_argument("pasta")
+    renomear.add_argument("--uf", default=UF_PADRAO)
+    args = parser.parse_args()
+
+    if args.comando == "buscar":
+        for registro in buscar_municipios(carregar_catalogo(), args.consulta, args.uf, args.limite, incluir_estados=True):
+            print(f"{registro['codigo']}  {registro['uf']}  {registro['nome']}")
+    elif args.comando == "importar":
+        print(f"Catálogo com {importar_ufs(args.ufs)} município(s).")
+    else:
+        renomeados, pendentes = renomear_arquivos_antigos(args.pasta, args.uf)
+        print(f"{renomeados} arquivo(s) renomeado(s).")
+        for nome in pendentes:
+            print(f"  Não renomeado (município não encontrado ou destino já existe): {nome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,845 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import unicodedata
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import datetime
+
+import compressao
+from observabilidade import DURACAO_SALVAMENTO, SALVAMENTOS
+from municipios import UF_PADRAO, codigo_municipio, codigo_por_nome_compacto, municipio_por_codigo
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURAÇÕES ---
+PASTA_AVALIACOES = "data/avaliacoes"
+PASTA_RELATORIOS = "relatorios"
+PASTA_CICLOS = "data/ciclos"  # avaliações de ciclos anteriores, uma subpasta por ciclo (ex.: data/ciclos/2024)
+PASTA_AUDITORIA = "data/auditoria"  # log das alterações de cada resposta (ver AUDITORIA)
+ARQUIVO_CRITERIOS = "criterios_por_topico.json"
+CHAVE_MUNICIPIOS = "Municipios_MA"
+CHAVE_VERSAO_CRITERIOS = "_versao"  # versão do arquivo de critérios; chaves com "_" não são segmentos
+STATUS_VALIDOS = ("Atende", "Não Atende")
+CHAVE_META = "_meta"  # metadados de versão gravados junto com as respostas
+COMPRESSAO_AVALIACOES = None  # None grava JSON indentado; "zlib" ou "zstd" grava comprimido (ver compressao.py)
+
+# Funções sem dependência do Streamlit, compartilhadas entre o app e as ferramentas de linha de comando.
+
+def carregar_criterios(caminho_arquivo=ARQUIVO_CRITERIOS):
+    """Lê o arquivo de critérios sem cache e sem mensagens de interface."""
+    with open(caminho_arquivo, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def segmentos(matriz_completa):
+    """Lista os segmentos (Órgão/Poder) disponíveis na matriz."""
+    return [chave for chave in matriz_completa.keys() if chave != CHAVE_MUNICIPIOS and not chave.startswith("_")]
+
+def versao_criterios(matriz_completa):
+    """Versão declarada no arquivo de critérios ("" em arquivos antigos, sem versão)."""
+    return str(matriz_completa.get(CHAVE_VERSAO_CRITERIOS, ""))
+
+def validar_criterios(matriz_completa):
+    """Confere a estrutura do arquivo de critérios. Devolve a lista de erros (vazia se estiver tudo certo).
+
+    Cada item precisa de um "id" estável, único no segmento, e de "ids_subcriterios" (nome do
+    subcritério -> id estável): é por eles que as respostas são migradas quando o texto de um
+    critério ou o nome de um subcritério muda (ver migrar_criterios.py).
+    """
+    erros = []
+    for segmento in segmentos(matriz_completa):
+        ids, chaves = set(), set()
+        for secao, item in iterar_itens(matriz_completa[segmento]):
+            rotulo = f"{segmento} / {secao} / {item.get('topico', '?')}"
+            faltando = [c for c in ("id", "topico", "criterio", "subcriterios") if not item.get(c)]
+            if faltando:
+                erros.append(f"{rotulo}: faltam os campos {', '.join(faltando)}."); continue
+            if item["id"] in ids: erros.append(f"{rotulo}: id '{item['id']}' repetido no segmento.")
+            if (secao, item["criterio"]) in chaves: erros.append(f"{rotulo}: critério repetido na seção.")
+            if len(set(item["subcriterios"])) != len(item["subcriterios"]): erros.append(f"{rotulo}: subcritério repetido.")
+            ids_subcriterios = item.get("ids_subcriterios") or {}
+            if set(ids_subcriterios) != set(item["subcriterios"]):
+                erros.append(f"{rotulo}: 'ids_subcriterios' deve ter um id para cada subcritério.")
+            elif len(set(ids_subcriterios.values())) != len(ids_subcriterios): erros.append(f"{rotulo}: id de subcritério repetido.")
+            ids.add(item["id"]); chaves.add((secao, item["criterio"]))
+    return erros
+
+# --- REGISTRO DE CRITÉRIOS ---
+# A matriz carregada é compartilhada entre todas as sessões do app; as visões abaixo impedem que uma
+# sessão a altere por engano. Cópias (copy.deepcopy, pickle para outro processo) voltam a ser dict/list comuns.
+
+class ErroCriterios(Exception):
+    """O arquivo de critérios não passou na validação."""
+    def __init__(self, caminho_arquivo, erros):
+        super().__init__(f"'{caminho_arquivo}' tem {len(erros)} problema(s): " + " ".join(erros[:5]))
+        self.erros = erros
+
+def _somente_leitura(*args, **kwargs):
+    raise TypeError("A matriz de critérios é somente leitura; faça uma cópia (copy.deepcopy) para alterá-la.")
+
+class DictSomenteLeitura(dict):
+    __setitem__ = __delitem__ = __ior__ = update = pop = popitem = clear = setdefault = _somente_leitura
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+class ListaSomenteLeitura(list):
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = append = extend = insert = pop = remove = clear = sort = reverse = _somente_leitura
+    def __reduce__(self):
+        return list, (list(self),)
+
+def congelar(valor):
+    """Converte dicts e listas (recursivamente) em visões somente leitura."""
+    if isinstance(valor, dict): return DictSomenteLeitura({chave: congelar(v) for chave, v in valor.items()})
+    if isinstance(valor, list): return ListaSomenteLeitura(congelar(v) for v in valor)
+    return valor
+
+def assinatura_arquivo(caminho_arquivo):
+    """(mtime em ns, tamanho): muda sempre que o arquivo é regravado."""
+    estado = os.stat(caminho_arquivo)
+    return estado.st_mtime_ns, estado.st_size
+
+def carregar_criterios_validados(caminho_arquivo=ARQUIVO_CRITERIOS):
+    """Lê, valida e congela o arquivo de critérios. Levanta ErroCriterios se houver problemas de estrutura."""
+    with open(caminho_arquivo, 'rb') as f:
+        conteudo = f.read()
+    matriz_completa = json.loads(conteudo.decode('utf-8'))
+    erros = validar_criterios(matriz_completa)
+    if erros: raise ErroCriterios(caminho_arquivo, erros)
+    return congelar(dict(matriz_completa, _hash=hashlib.sha256(conteudo).hexdigest()))
+
+def chave_resposta(secao, criterio, subcriterio):
+    """Monta a chave usada no dicionário de respostas."""
+    return f"{secao}_{criterio}_{subcriterio}"
+
+def iterar_itens(matriz_perguntas):
+    """Percorre os itens de um segmento, devolvendo (secao, item)."""
+    for secao, perguntas in matriz_perguntas.items():
+        if secao == CHAVE_MUNICIPIOS: continue
+        for item in perguntas:
+            yield secao, item
+
+def indexar_por_topico(matriz_perguntas):
+    """Mapeia o número do tópico (ex.: '3.2') para (secao, item)."""
+    return {str(item['topico']).strip(): (secao, item) for secao, item in iterar_itens(matriz_perguntas)}
+
+def tipos_de_chave(matriz_perguntas):
+    """Mapeia cada chave válida do segmento para o tipo de valor esperado: 'status', 'obs' ou 'links'."""
+    tipos = {}
+    for secao, item in iterar_itens(matriz_perguntas):
+        tipos[chave_resposta(secao, item['criterio'], "links")] = "links"
+        for sub in item["subcriterios"]:
+            chave = chave_resposta(secao, item['criterio'], sub)
+            tipos[chave] = "status"
+            tipos[f"{chave}_obs"] = "obs"
+    return tipos
+
+def validar_respostas(respostas, matriz_perguntas):
+    """Confere chaves e valores contra o modelo de critérios. Devolve a lista de erros (vazia se estiver tudo certo)."""
+    tipos, erros = tipos_de_chave(matriz_perguntas), []
+    for chave, valor in respostas.items():
+        tipo = tipos.get(chave)
+        if chave == CHAVE_META: continue
+        if tipo is None:
+            erros.append(f"Chave desconhecida: '{chave}'.")
+        elif tipo == "status" and valor not in STATUS_VALIDOS:
+            erros.append(f"'{chave}': status deve ser 'Atende' ou 'Não Atende'.")
+        elif tipo == "obs" and not isinstance(valor, str):
+            erros.append(f"'{chave}': a observação deve ser um texto.")
+        elif tipo == "links" and not (isinstance(valor, list) and all(isinstance(link, str) for link in valor)):
+            erros.append(f"'{chave}': os links devem ser uma lista de textos.")
+    return erros
+
+def aplicar_cascata_disponibilidade(respostas, secao, criterio, subcriterios, novo_status):
+    """Aplica a regra de Disponibilidade: os demais subcritérios acompanham o novo status."""
+    respostas[chave_resposta(secao, criterio, "Disponibilidade")] = novo_status
+    for sub in subcriterios:
+        if sub != "Disponibilidade":
+            chave_subcriterio = chave_resposta(secao, criterio, sub)
+            respostas[chave_subcriterio] = "Não Atende" if novo_status == "Não Atende" else "Atende"
+            respostas[f"{chave_subcriterio}_obs"] = ""
+
+def _chaves_alteradas(antes, respostas):
+    return [chave for chave in set(antes) | set(respostas) if antes.get(chave) != respostas.get(chave)]
+
+def subcriterio_da_observacao(respostas, secao, item):
+    """Subcritério cuja observação a grade mostra: o primeiro em "Não Atende" (None se o item atende)."""
+    for sub in item["subcriterios"]:
+        if respostas.get(chave_resposta(secao, item['criterio'], sub)) == "Não Atende":
+            return sub
+    return None
+
+def aplicar_edicao_em_grade(respostas, secao, perguntas, linhas):
+    """Aplica de uma vez as linhas da grade de uma seção (uma por item, na ordem de perguntas).
+
+    Cada linha traz o status de cada subcritério e a "observacao". Valem as regras da tela detalhada:
+    a Disponibilidade muda em cascata e, com ela em "Não Atende", os demais subcritérios ficam travados.
+    Só as células diferentes do estado atual contam como editadas. Devolve as chaves alteradas.
+    """
+    antes = dict(respostas)
+    for item, linha in zip(perguntas, linhas):
+        criterio, subcriterios = item['criterio'], item["subcriterios"]
+        editados = {sub: linha.get(sub) for sub in subcriterios
+                    if linha.get(sub) in STATUS_VALIDOS and linha.get(sub) != antes.get(chave_resposta(secao, criterio, sub), "Atende")}
+        sub_obs = subcriterio_da_observacao(antes, secao, item)
+        obs_antes = antes.get(f"{chave_resposta(secao, criterio, sub_obs)}_obs", "") if sub_obs else ""
+        obs = linha.get("observacao") if isinstance(linha.get("observacao"), str) else ""
+
+        if "Disponibilidade" in editados:
+            aplicar_cascata_disponibilidade(respostas, secao, criterio, subcriterios, editados.pop("Disponibilidade"))
+        if respostas.get(chave_resposta(secao, criterio, "Disponibilidade")) != "Não Atende":
+            for sub, status in editados.items():
+                respostas[chave_resposta(secao, criterio, sub)] = status
+        sub_obs = subcriterio_da_observacao(respostas, secao, item)
+        if sub_obs and obs != obs_antes:
+            respostas[f"{chave_resposta(secao, criterio, sub_obs)}_obs"] = obs
+    return _chaves_alteradas(antes, respostas)
+
+def nome_arquivo_avaliacao(segmento, municipio, usuario=None, uf=UF_PADRAO):
+    """Nome do arquivo de avaliação no mesmo padrão usado pela interface.
+    O município entra pelo código IBGE; fora do catálogo, pelo nome sem espaços (padrão antigo)."""
+    sufixo = f"_{usuario}" if usuario else ""
+    return f"avaliacao_{segmento.replace(' ', '')}_{codigo_municipio(municipio, uf) or municipio.replace(' ', '')}{sufixo}.json"
+
+def pasta_da_entidade(segmento, municipio, uf=UF_PADRAO, pasta=PASTA_AVALIACOES):
+    """Subpasta da entidade: <pasta>/<Segmento>/<UF>/<código IBGE (ou nome sem espaços)>."""
+    return os.path.join(pasta, segmento.replace(' ', ''), uf, codigo_municipio(municipio, uf) or municipio.replace(' ', ''))
+
+def caminho_avaliacao(segmento, municipio, usuario=None, uf=UF_PADRAO, pasta=PASTA_AVALIACOES):
+    """Caminho do arquivo de avaliação na subpasta da entidade. Enquanto os arquivos do layout plano
+    anterior não forem reorganizados (python indice_avaliacoes.py organizar), eles continuam sendo usados."""
+    nome = nome_arquivo_avaliacao(segmento, municipio, usuario, uf)
+    caminho = os.path.join(pasta_da_entidade(segmento, municipio, uf, pasta), nome)
+    sufixo = f"_{usuario}" if usuario else ""
+    for antigo in (os.path.join(pasta, nome), os.path.join(pasta, f"avaliacao_{segmento.replace(' ', '')}_{municipio.replace(' ', '')}{sufixo}.json")):
+        if not os.path.exists(caminho) and os.path.exists(antigo): return antigo
+    return caminho
+
+def interpretar_nome_arquivo(nome_arquivo):
+    """Inverte nome_arquivo_avaliacao: devolve (segmento, municipio, usuario) sem espaços, ou None.
+    Arquivos antigos, sem o sufixo do usuário, voltam com usuario = ''."""
+    # O macOS devolve nomes de arquivo decompostos (NFD); normaliza para comparar com a matriz.
+    nome = unicodedata.normalize("NFC", os.path.basename(nome_arquivo))
+    if not (nome.startswith("avaliacao_") and nome.endswith(".json")): return None
+    partes = nome[len("avaliacao_"):-len(".json")].split("_", 2)
+    if len(partes) < 2: return None
+    return partes[0], partes[1], partes[2] if len(partes) == 3 else ""
+
+def listar_arquivos_avaliacao(pasta=PASTA_AVALIACOES):
+    """Lista (caminho, segmento, municipio, usuario) de todos os arquivos de avaliação da pasta e das subpastas."""
+    encontrados = []
+    for raiz, pastas, nomes in os.walk(pasta):
+        pastas.sort()
+        for nome in sorted(nomes):
+            partes = interpretar_nome_arquivo(nome)
+            if partes: encontrados.append((os.path.join(raiz, nome),) + partes)
+    return encontrados
+
+def resolver_entidade(matriz_completa, segmento_arquivo, municipio_arquivo):
+    """Recupera os nomes originais (com espaços) de segmento e município a partir do nome do arquivo."""
+    segmento = next((s for s in segmentos(matriz_completa) if s.replace(' ', '') == segmento_arquivo), segmento_arquivo)
+    registro = municipio_por_codigo(municipio_arquivo) if municipio_arquivo.isdigit() else None
+    if registro: return segmento, registro["nome"]
+    municipio = next((m for m in matriz_completa.get(CHAVE_MUNICIPIOS, []) if m.replace(' ', '') == municipio_arquivo), municipio_arquivo)
+    return segmento, municipio
+
+# --- AÇÕES EM LOTE ---
+# Alteram muitas respostas de uma vez (uma seção ou a avaliação inteira) e devolvem as chaves alteradas,
+# para que a interface atualize o estado em uma única passada.
+
+def marcar_todos(respostas, matriz_perguntas, status, secao=None):
+    """Marca todos os subcritérios (da seção ou do segmento inteiro) com o status, seguindo a cascata da Disponibilidade."""
+    antes = copy.deepcopy(respostas)
+    for secao_item, item in iterar_itens(matriz_perguntas):
+        if secao and secao_item != secao: continue
+        aplicar_cascata_disponibilidade(respostas, secao_item, item['criterio'], item["subcriterios"], status)
+    return _chaves_alteradas(antes, respostas)
+
+def mapear_itens_comuns(matriz_destino, matriz_origem):
+    """Relaciona os itens de matriz "COMUM" de dois segmentos pelo tópico: {(secao, criterio) destino: (secao, item) origem}."""
+    origem = {str(item['topico']).strip(): (secao, item) for secao, item in iterar_itens(matriz_origem)
+              if item.get("matriz") == "COMUM"}
+    mapa = {}
+    for secao, item in iterar_itens(matriz_destino):
+        correspondente = origem.get(str(item['topico']).strip())
+        if item.get("matriz") == "COMUM" and correspondente:
+            mapa[(secao, item['criterio'])] = correspondente
+    return mapa
+
+def copiar_respostas(respostas, origem, matriz_destino, matriz_origem=None, secao=None):
+    """Copia para `respostas` as respostas de outra avaliação (da seção ou do segmento inteiro).
+
+    Sem matriz_origem, a origem é do mesmo segmento (ex.: o ciclo anterior) e as chaves são copiadas
+    como estão. Com matriz_origem (outro segmento), só os itens "COMUM" são copiados, relacionados pelo tópico.
+    Chaves ausentes na origem ficam como estão no destino.
+    """
+    antes = copy.deepcopy(respostas)
+    mapa = mapear_itens_comuns(matriz_destino, matriz_origem) if matriz_origem is not None else None
+    for secao_item, item in iterar_itens(matriz_destino):
+        if secao and secao_item != secao: continue
+        if mapa is None:
+            secao_origem, criterio_origem = secao_item, item['criterio']
+        elif (secao_item, item['criterio']) in mapa:
+            secao_origem, item_origem = mapa[(secao_item, item['criterio'])]
+            criterio_origem = item_origem['criterio']
+        else:
+            continue
+        for sufixo in item["subcriterios"] + [f"{sub}_obs" for sub in item["subcriterios"]] + ["links"]:
+            chave_origem = chave_resposta(secao_origem, criterio_origem, sufixo)
+            if chave_origem in origem:
+                respostas[chave_resposta(secao_item, item['criterio'], sufixo)] = copy.deepcopy(origem[chave_origem])
+    return _chaves_alteradas(antes, respostas)
+
+def listar_ciclos_anteriores(matriz_completa, segmento, municipio, pasta=PASTA_CICLOS):
+    """Avaliações da entidade em ciclos anteriores: lista de (ciclo, usuario, caminho), do ciclo mais recente ao mais antigo.
+    Cada ciclo é consultado pelo seu índice (construído na primeira consulta), sem varrer as subpastas a cada chamada;
+    arquivos acrescentados depois a um ciclo entram com `python indice_avaliacoes.py reconstruir --pasta data/ciclos/<ciclo>`."""
+    if not os.path.isdir(pasta): return []
+    encontrados = []
+    for ciclo in sorted(os.listdir(pasta), reverse=True):
+        if not os.path.isdir(os.path.join(pasta, ciclo)): continue
+        for entrada in sorted(consultar_indice(os.path.join(pasta, ciclo), segmento=segmento), key=lambda e: e["caminho"]):
+            if resolver_entidade(matriz_completa, entrada["segmento"], entrada["codigo"]) == (segmento, municipio):
+                encontrados.append((ciclo, entrada["usuario"], entrada["caminho"]))
+    return encontrados
+
+# --- ARMAZENAMENTO COM CONTROLE DE CONCORRÊNCIA ---
+# Cada arquivo guarda, na chave CHAVE_META, um contador de versão e o hash do conteúdo.
+# Quem carregou a versão N só consegue gravar se o arquivo ainda estiver na versão N (compare-and-swap);
+# a leitura-comparação-gravação acontece sob uma trava consultiva (arquivo .lock criado com O_EXCL),
+# que funciona no Windows, no macOS e em volumes compartilhados entre várias réplicas do app.
+# A trava guarda um identificador único do dono: só ele a remove, e quem acha uma trava abandonada só
+# remove aquela que viu (mesmo identificador). As duas remoções passam por uma segunda trava curta
+# ('<caminho>.quebra.lock'), então a trava conferida não pode ser trocada até o os.remove. Seções longas
+# renovam a trava (a função devolvida pelo `with`) para não serem tomadas como abandonadas.
+TEMPO_MAXIMO_TRAVA = 10  # segundos esperando a trava
+TRAVA_ABANDONADA = 30    # segundos sem renovação após os quais uma trava é considerada órfã
+QUEBRA_ABANDONADA = 5    # segundos: a trava de remoção só dura uma leitura e um os.remove
+INTERVALO_RENOVACAO = 1  # segundos mínimos entre duas renovações da mesma trava
+
+class ConflitoDeVersao(Exception):
+    """O arquivo foi alterado por outra sessão depois de ter sido carregado."""
+    def __init__(self, caminho_arquivo, respostas_atuais, meta_atual):
+        super().__init__(f"'{caminho_arquivo}' foi alterado por {meta_atual.get('salvo_por') or 'outra sessão'} (versão {meta_atual.get('versao', 0)}).")
+        self.caminho_arquivo = caminho_arquivo
+        self.respostas_atuais = respostas_atuais
+        self.meta_atual = meta_atual
+
+class TravaIndisponivel(Exception):
+    """Não foi possível obter a trava do arquivo dentro do tempo limite."""
+
+def _dono_da_trava(caminho_trava):
+    try:
+        with open(caminho_trava, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+@contextmanager
+def _remocao_exclusiva(caminho_trava):
+    """Uma remoção de trava por vez (liberação pelo dono ou remoção de abandonada): como uma trava só é
+    recriada depois de removida, o dono conferido dentro deste bloco não muda até o os.remove."""
+    caminho_quebra = f"{caminho_trava[:-len('.lock')]}.quebra.lock"
+    limite = time.monotonic() + TEMPO_MAXIMO_TRAVA
+    while True:
+        try:
+            os.close(os.open(caminho_quebra, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(caminho_quebra) > QUEBRA_ABANDONADA:
+                    os.remove(caminho_quebra); continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > limite:
+                raise TravaIndisponivel(f"A trava '{caminho_trava}' não pôde ser liberada.")
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(caminho_quebra)
+        except FileNotFoundError:
+            pass
+
+def _remover_trava_abandonada(caminho_trava, dono):
+    """Remove a trava abandonada que foi vista, se ela ainda for a mesma (mesmo dono) e continuar sem renovação."""
+    with _remocao_exclusiva(caminho_trava):
+        try:
+            if _dono_da_trava(caminho_trava) == dono and time.time() - os.path.getmtime(caminho_trava) > TRAVA_ABANDONADA:
+                os.remove(caminho_trava)
+                logger.warning("trava_abandonada_removida", extra={"trava": caminho_trava, "dono": dono})
+        except FileNotFoundError:
+            pass
+
+@contextmanager
+def trava_arquivo(caminho_arquivo, tempo_maximo=TEMPO_MAXIMO_TRAVA):
+    """Trava consultiva baseada em um arquivo '<caminho>.lock' criado de forma exclusiva.
+
+    O `with` devolve uma função `renovar()` para seções longas: chamada a cada passo, mantém a trava
+    fresca (no máximo uma vez por INTERVALO_RENOVACAO) e levanta TravaIndisponivel se a trava foi perdida."""
+    caminho_trava = f"{caminho_arquivo}.lock"
+    pasta = os.path.dirname(caminho_trava)
+    if pasta: os.makedirs(pasta, exist_ok=True)
+    dono = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+    limite = time.monotonic() + tempo_maximo
+    while True:
+        try:
+            fd = os.open(caminho_trava, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                dono_atual = _dono_da_trava(caminho_trava)
+                if dono_atual is not None and time.time() - os.path.getmtime(caminho_trava) > TRAVA_ABANDONADA:
+                    _remover_trava_abandonada(caminho_trava, dono_atual); continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > limite:
+                raise TravaIndisponivel(f"O arquivo '{caminho_arquivo}' está sendo gravado por outra sessão.")
+            time.sleep(0.05)
+    ultima_renovacao = time.monotonic()
+
+    def renovar():
+        nonlocal ultima_renovacao
+        if time.monotonic() - ultima_renovacao < INTERVALO_RENOVACAO: return
+        if _dono_da_trava(caminho_trava) != dono:
+            raise TravaIndisponivel(f"A trava de '{caminho_arquivo}' foi perdida (considerada abandonada por outro processo).")
+        os.utime(caminho_trava)
+        ultima_renovacao = time.monotonic()
+
+    try:
+        try:
+            os.write(fd, dono.encode())
+        finally:
+            os.close(fd)
+        yield renovar
+    finally:
+        try:
+            with _remocao_exclusiva(caminho_trava):
+                if _dono_da_trava(caminho_trava) == dono:
+                    os.remove(caminho_trava)
+                else:
+                    logger.warning("trava_perdida", extra={"trava": caminho_trava, "dono": dono})
+        except TravaIndisponivel as e:
+            logger.warning("trava_nao_liberada", extra={"trava": caminho_trava, "erro": str(e)})
+
+def hash_respostas(respostas):
+    """Hash estável do conteúdo das respostas (sem os metadados)."""
+    conteudo = json.dumps({k: v for k, v in respostas.items() if k != CHAVE_META}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+def separar_meta(dados):
+    """Separa as respostas dos metadados. Arquivos antigos, sem metadados, são tratados como versão 0."""
+    respostas = {k: v for k, v in dados.items() if k != CHAVE_META}
+    meta = dict(dados.get(CHAVE_META) or {})
+    meta.setdefault("versao", 0)
+    meta["hash"] = hash_respostas(respostas)
+    return respostas, meta
+
+def carregar_avaliacao_com_meta(caminho_arquivo):
+    """Lê um arquivo de avaliação devolvendo (respostas, meta). Arquivo inexistente = ({}, versão 0)."""
+    if not os.path.exists(caminho_arquivo):
+        return {}, {"versao": 0, "hash": None}
+    return separar_meta(compressao.carregar(caminho_arquivo, CHAVE_META))
+
+def carregar_avaliacao(caminho_arquivo):
+    """Lê um arquivo de avaliação (apenas as respostas)."""
+    return separar_meta(compressao.carregar(caminho_arquivo, CHAVE_META))[0]
+
+@lru_cache(maxsize=4)
+def _dicionario_da_versao(caminho_criterios, assinatura):
+    matriz_completa = carregar_criterios(caminho_criterios)
+    chaves = [chave for segmento in segmentos(matriz_completa)
+              for chave, tipo in tipos_de_chave(matriz_completa[segmento]).items() if tipo == "status"]
+    return compressao.montar_dicionario(chaves)
+
+@lru_cache(maxsize=4)
+def _chaves_status_da_versao(caminho_criterios, assinatura):
+    """Segmento (sem espaços, como no nome do arquivo) -> chaves de status dos critérios."""
+    matriz_completa = carregar_criterios(caminho_criterios)
+    return {segmento.replace(' ', ''): frozenset(chave for chave, tipo in tipos_de_chave(matriz_completa[segmento]).items() if tipo == "status")
+            for segmento in segmentos(matriz_completa)}
+
+def status_avaliacao(caminho_arquivo, respostas, caminho_criterios=ARQUIVO_CRITERIOS):
+    """"concluída" se todos os subcritérios do segmento têm resposta, "em andamento" se não; "" se o segmento não for reconhecido."""
+    partes = interpretar_nome_arquivo(caminho_arquivo)
+    try:
+        chaves = _chaves_status_da_versao(caminho_criterios, assinatura_arquivo(caminho_criterios)).get(partes[0] if partes else None)
+    except (OSError, ValueError):
+        return ""
+    if not chaves: return ""
+    return "concluída" if all(respostas.get(chave) in STATUS_VALIDOS for chave in chaves) else "em andamento"
+
+def dicionario_compressao(caminho_criterios=ARQUIVO_CRITERIOS):
+    """Dicionário de compressão montado com o vocabulário dos critérios vigentes (refeito se o arquivo mudar)."""
+    return _dicionario_da_versao(caminho_criterios, assinatura_arquivo(caminho_criterios))
+
+def _gravar_avaliacao_atomica(caminho_arquivo, dados, codec=None):
+    """Grava no formato `codec` ou, sem ele, no configurado em COMPRESSAO_AVALIACOES (JSON indentado, se None)."""
+    codec = codec or COMPRESSAO_AVALIACOES
+    if codec in (None, "json"):
+        return _gravar_json_atomico(caminho_arquivo, dados)
+    dicionario = dicionario_compressao()
+    # Os dicionários ficam junto das avaliações, para que a leitura não dependa do diretório atual.
+    dentro = _relativo_ao_indice(caminho_arquivo, PASTA_AVALIACOES) is not None
+    compressao.registrar_dicionario(dicionario, PASTA_AVALIACOES if dentro else os.path.dirname(caminho_arquivo) or ".")
+    conteudo = compressao.codificar(dados, codec, dicionario, CHAVE_META)
+    pasta = os.path.dirname(caminho_arquivo)
+    if pasta: os.makedirs(pasta, exist_ok=True)
+    caminho_tmp = f"{caminho_arquivo}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(caminho_tmp, 'wb') as f:
+        f.write(conteudo)
+    os.replace(caminho_tmp, caminho_arquivo)
+
+def _gravar_json_atomico(caminho_arquivo, dados, indent=4):
+    pasta = os.path.dirname(caminho_arquivo)
+    if pasta: os.makedirs(pasta, exist_ok=True)
+    caminho_tmp = f"{caminho_arquivo}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(caminho_tmp, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=indent)
+    os.replace(caminho_tmp, caminho_arquivo)
+
+def salvar_avaliacao(caminho_arquivo, respostas, meta_esperada=None, usuario=None, meta_extra=None):
+    """Grava a avaliação de forma atômica, sob trava, incrementando a versão.
+
+    Se `meta_esperada` (a meta devolvida no carregamento ou no último salvamento) for informada,
+    a gravação só acontece se o arquivo ainda estiver naquela versão/hash; caso contrário levanta
+    ConflitoDeVersao com o conteúdo atual. `meta_extra` acrescenta informações à meta
+    (ex.: versão das regras de pontuação usadas). As chaves alteradas vão para o log de auditoria,
+    antes da gravação: se o log falhar, a avaliação não é gravada. Devolve a nova meta.
+    """
+    inicio = time.perf_counter()
+    try:
+        nova_meta = _salvar_sob_trava(caminho_arquivo, respostas, meta_esperada, usuario, meta_extra)
+    except ConflitoDeVersao:
+        SALVAMENTOS.inc(resultado="conflito")
+        logger.info("salvamento_em_conflito", extra={"caminho": caminho_arquivo, "usuario": usuario or ""})
+        raise
+    except TravaIndisponivel:
+        SALVAMENTOS.inc(resultado="trava")
+        logger.warning("salvamento_sem_trava", extra={"caminho": caminho_arquivo, "usuario": usuario or ""})
+        raise
+    except Exception:
+        SALVAMENTOS.inc(resultado="erro")
+        logger.exception("salvamento_com_erro", extra={"caminho": caminho_arquivo, "usuario": usuario or ""})
+        raise
+    duracao = time.perf_counter() - inicio
+    SALVAMENTOS.inc(resultado="ok")
+    DURACAO_SALVAMENTO.observar(duracao)
+    logger.info("avaliacao_salva", extra={"caminho": caminho_arquivo, "usuario": usuario or "", "versao": nova_meta["versao"],
+                                          "status": nova_meta["status"], "duracao_ms": round(duracao * 1000, 1)})
+    return nova_meta
+
+def _salvar_sob_trava(caminho_arquivo, respostas, meta_esperada, usuario, meta_extra):
+    with trava_arquivo(caminho_arquivo):
+        respostas_atuais, meta_atual = carregar_avaliacao_com_meta(caminho_arquivo)
+        if meta_esperada is not None and (meta_atual["versao"], meta_atual["hash"]) != (meta_esperada.get("versao", 0), meta_esperada.get("hash")):
+            raise ConflitoDeVersao(caminho_arquivo, respostas_atuais, meta_atual)
+        respostas = {k: v for k, v in respostas.items() if k != CHAVE_META}
+        nova_meta = {
+            "versao": meta_atual["versao"] + 1,
+            "hash": hash_respostas(respostas),
+            "salvo_por": usuario or "",
+            "salvo_em": datetime.now().isoformat(timespec="seconds"),
+            "status": status_avaliacao(caminho_arquivo, respostas),
+            **(meta_extra or {}),
+        }
+        registrar_auditoria(caminho_arquivo, respostas_atuais, respostas, usuario, nova_meta["versao"])
+        _gravar_avaliacao_atomica(caminho_arquivo, dict(respostas, **{CHAVE_META: nova_meta}))
+    atualizar_indice(caminho_arquivo, nova_meta)
+    return nova_meta
+
+def converter_avaliacao(caminho_arquivo, codec):
+    """Regrava o arquivo em outro formato ("json", "zlib" ou "zstd") sem alterar respostas nem versão.
+    Devolve (tamanho antes, tamanho depois)."""
+    with trava_arquivo(caminho_arquivo):
+        antes = os.path.getsize(caminho_arquivo)
+        _gravar_avaliacao_atomica(caminho_arquivo, compressao.carregar(caminho_arquivo, CHAVE_META), codec)
+        return antes, os.path.getsize(caminho_arquivo)
+
+# --- ÍNDICE DAS AVALIAÇÕES ---
+# PASTA_AVALIACOES/_indice.json mapeia cada arquivo (caminho relativo) para entidade, avaliador, situação,
+# índice, selo e data, para listar "minhas avaliações" ou "todas de um município" sem abrir os arquivos.
+# É atualizado a cada salvamento (sob trava) e pode ser refeito varrendo a pasta (reconstruir_indice).
+# Se a atualização falhar, o índice é marcado como desatualizado e a próxima consulta o reconstrói.
+ARQUIVO_INDICE = "_indice.json"
+ARQUIVO_INDICE_DESATUALIZADO = "_indice.desatualizado"
+
+def _entrada_indice(caminho_relativo, meta, mtime):
+    segmento, municipio, usuario = interpretar_nome_arquivo(caminho_relativo)
+    codigo = municipio if municipio.isdigit() else codigo_por_nome_compacto(municipio) or municipio  # layout antigo: nome do município
+    registro = municipio_por_codigo(codigo)
+    return {"segmento": segmento, "codigo": codigo, "municipio": registro["nome"] if registro else municipio,
+            "uf": registro["uf"] if registro else "", "usuario": usuario, "versao": meta.get("versao", 0), "status": meta.get("status", ""),
+            "indice": meta.get("indice"), "selo": meta.get("selo", ""), "salvo_por": meta.get("salvo_por", ""),
+            "salvo_em": meta.get("salvo_em", ""), "mtime": mtime}
+
+def _relativo_ao_indice(caminho_arquivo, pasta):
+    relativo = os.path.relpath(os.path.abspath(caminho_arquivo), os.path.abspath(pasta))
+    return None if relativo.startswith("..") else relativo.replace(os.sep, "/")
+
+def atualizar_indice(caminho_arquivo, meta, pasta=PASTA_AVALIACOES):
+    """Registra (ou, com meta None, remove) o arquivo no índice. Arquivos fora da pasta são ignorados.
+    Uma falha aqui não desfaz o salvamento: ela é registrada no log e o índice é marcado como desatualizado,
+    para que a próxima consulta o reconstrua."""
+    relativo = _relativo_ao_indice(caminho_arquivo, pasta)
+    if relativo is None or interpretar_nome_arquivo(relativo) is None: return
+    caminho_indice = os.path.join(pasta, ARQUIVO_INDICE)
+    try:
+        with trava_arquivo(caminho_indice):
+            indice = _ler_indice(caminho_indice)
+            if meta is None: indice.pop(relativo, None)
+            # Dois salvamentos seguidos podem chegar aqui fora de ordem: vale o de versão maior.
+            elif meta.get("versao", 0) >= indice.get(relativo, {}).get("versao", 0):
+                indice[relativo] = _entrada_indice(relativo, meta, int(os.path.getmtime(caminho_arquivo)))
+            _gravar_json_atomico(caminho_indice, indice, indent=None)
+    except (TravaIndisponivel, OSError, ValueError) as e:
+        logger.warning("Índice de avaliações não atualizado para %s: %s", caminho_arquivo, e)
+        try:
+            with open(os.path.join(pasta, ARQUIVO_INDICE_DESATUALIZADO), 'a', encoding='utf-8') as f:
+                f.write(f"{relativo}\n")
+        except OSError as erro_marca:
+            logger.error("Índice de avaliações sem marca de desatualizado: %s", erro_marca)
+
+def _ler_indice(caminho_indice):
+    if not os.path.exists(caminho_indice): return {}
+    with open(caminho_indice, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def reconstruir_indice(pasta=PASTA_AVALIACOES):
+    """Refaz o índice varrendo a pasta (lendo só a meta de cada arquivo; as respostas só nos arquivos
+    gravados antes da situação ir para a meta). Devolve o número de entradas."""
+    caminho_indice = os.path.join(pasta, ARQUIVO_INDICE)
+    with trava_arquivo(caminho_indice) as renovar:
+        # Removida antes da varredura: uma falha durante ela marca de novo, e não se perde.
+        try:
+            os.remove(os.path.join(pasta, ARQUIVO_INDICE_DESATUALIZADO))
+        except FileNotFoundError:
+            pass
+        indice = {}
+        for caminho, *_ in listar_arquivos_avaliacao(pasta):
+            renovar()
+            try:
+                meta = compressao.carregar_meta(caminho, CHAVE_META)
+                mtime = int(os.path.getmtime(caminho))
+                if "status" not in meta:
+                    meta = dict(meta, status=status_avaliacao(caminho, compressao.carregar(caminho, CHAVE_META)))
+            except (OSError, ValueError, compressao.ErroCompressao):
+                continue
+            relativo = _relativo_ao_indice(caminho, pasta)
+            indice[relativo] = _entrada_indice(relativo, meta, mtime)
+        _gravar_json_atomico(caminho_indice, indice, indent=None)
+    return len(indice)
+
+@lru_cache(maxsize=4)
+def _indice_da_versao(caminho_indice, assinatura):
+    return _ler_indice(caminho_indice)
+
+def consultar_indice(pasta=PASTA_AVALIACOES, usuario=None, segmento=None, codigo=None):
+    """Entradas do índice (com o "caminho" completo), das alteradas mais recentemente para as mais antigas.
+    O índice é lido de novo só quando o arquivo muda; se não existir ou estiver marcado como desatualizado, é reconstruído."""
+    caminho_indice = os.path.join(pasta, ARQUIVO_INDICE)
+    if not os.path.exists(caminho_indice) or os.path.exists(os.path.join(pasta, ARQUIVO_INDICE_DESATUALIZADO)):
+        if not os.path.isdir(pasta): return []
+        try:
+            reconstruir_indice(pasta)
+        except (TravaIndisponivel, OSError, ValueError) as e:
+            logger.warning("Índice de avaliações não reconstruído: %s", e)
+            if not os.path.exists(caminho_indice): return []
+    entradas = [dict(entrada, caminho=os.path.join(pasta, *relativo.split("/")))
+                for relativo, entrada in _indice_da_versao(caminho_indice, assinatura_arquivo(caminho_indice)).items()
+                if (usuario is None or entrada["usuario"] == usuario) and (segmento is None or entrada["segmento"] == segmento.replace(' ', ''))
+                and (codigo is None or entrada["codigo"] == codigo)]
+    return sorted(entradas, key=lambda e: e["mtime"], reverse=True)
+
+# --- AUDITORIA ---
+# Cada salvamento com alterações acrescenta um lote (data, usuário, avaliação, nova versão e, para cada
+# chave alterada, o valor antigo e o novo) ao arquivo atual do log, em PASTA_AUDITORIA. Os lotes são binários:
+# textos repetidos (chaves, usuários, avaliações, valores curtos como "Atende") ficam uma vez em
+# termos.txt, uma linha JSON por termo, e são referenciados pelo número da linha. Os arquivos do log e o
+# de termos só crescem; quando o arquivo atual passa de TAMANHO_ARQUIVO_AUDITORIA, ele é fechado com um
+# índice (avaliação -> posições dos lotes) e um novo é aberto. Consultas: auditoria.py.
+# A avaliação é identificada pela entidade (nome canônico do arquivo: segmento, código IBGE e avaliador),
+# não pelo caminho: o id não muda com o diretório atual nem quando o arquivo é movido para as subpastas.
+# Um salvamento com mais de MAXIMO_ALTERACOES_LOTE alterações ocupa vários lotes seguidos.
+ARQUIVO_TERMOS = "termos.txt"
+TAMANHO_ARQUIVO_AUDITORIA = 8 * 1024 * 1024
+TAMANHO_MAXIMO_TERMO = 40  # valores maiores (observações, listas de links) vão dentro do próprio lote
+_LOTE = struct.Struct(">BIdIIIH")  # marca, tamanho do lote, data, usuário, avaliação, versão, nº de alterações
+_MARCA_LOTE = 0xA7
+MAXIMO_ALTERACOES_LOTE = 0xFFFF  # o nº de alterações do lote tem 2 bytes
+_VALOR_AUSENTE, _VALOR_TERMO, _VALOR_EMBUTIDO = 0, 1, 2
+_SEM_VALOR = object()
+_TERMOS = {}  # pasta -> {"lista", "ids", "posicao"}: cópia em memória de termos.txt, lida aos poucos
+_TRAVA_TERMOS = threading.RLock()  # reentrante: a troca de arquivo indexa o anterior com a trava já obtida
+
+def _termos(pasta, descartar_incompleta=False):
+    """Tabela de termos da pasta, atualizada com as linhas acrescentadas desde a última leitura.
+    Uma linha sem quebra no fim é de uma gravação interrompida; o gravador (sob trava) a descarta."""
+    tabela = _TERMOS.setdefault(os.path.abspath(pasta), {"lista": [], "ids": {}, "posicao": 0})
+    caminho = os.path.join(pasta, ARQUIVO_TERMOS)
+    tamanho = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+    if tamanho < tabela["posicao"]:  # pasta recriada
+        tabela.update(lista=[], ids={}, posicao=0)
+    if tamanho > tabela["posicao"]:
+        with open(caminho, 'rb') as f:
+            f.seek(tabela["posicao"])
+            for linha in f:
+                if not linha.endswith(b"\n"): break
+                tabela["ids"].setdefault(json.loads(linha), len(tabela["lista"]))
+                tabela["lista"].append(json.loads(linha))
+                tabela["posicao"] += len(linha)
+        if descartar_incompleta and tabela["posicao"] < tamanho:
+            os.truncate(caminho, tabela["posicao"])
+    return tabela
+
+def _id_avaliacao(caminho_arquivo):
+    """Nome canônico do arquivo da avaliação; as de ciclos anteriores (PASTA_CICLOS) levam o ciclo na frente."""
+    partes = interpretar_nome_arquivo(caminho_arquivo)
+    if partes is None: return os.path.basename(caminho_arquivo)
+    segmento, municipio, usuario = partes
+    codigo = municipio if municipio.isdigit() else codigo_por_nome_compacto(municipio) or municipio
+    nome = f"avaliacao_{segmento}_{codigo}{'_' + usuario if usuario else ''}.json"
+    no_ciclo = _relativo_ao_indice(caminho_arquivo, PASTA_CICLOS)
+    return f"{no_ciclo.split('/')[0]}/{nome}" if no_ciclo else nome
+
+def arquivos_auditoria(pasta):
+    if not os.path.isdir(pasta): return []
+    return sorted(os.path.join(pasta, nome) for nome in os.listdir(pasta) if nome.startswith("auditoria_") and nome.endswith(".bin"))
+
+def _arquivo_auditoria_atual(pasta):
+    """Arquivo em que o próximo lote deve ser gravado, fechando o atual se já estiver cheio."""
+    arquivos = arquivos_auditoria(pasta)
+    if not arquivos: return os.path.join(pasta, "auditoria_000001.bin")
+    atual = arquivos[-1]
+    if os.path.getsize(atual) < TAMANHO_ARQUIVO_AUDITORIA: return atual
+    indexar_arquivo_auditoria(atual)
+    return os.path.join(pasta, f"auditoria_{len(arquivos) + 1:06d}.bin")
+
+def _codificar_valor(valor, termo):
+    if valor is _SEM_VALOR: return bytes([_VALOR_AUSENTE])
+    texto = json.dumps(valor, ensure_ascii=False)
+    if len(texto) <= TAMANHO_MAXIMO_TERMO: return struct.pack(">BI", _VALOR_TERMO, termo(texto))
+    bruto = texto.encode('utf-8')
+    return struct.pack(">BI", _VALOR_EMBUTIDO, len(bruto)) + bruto
+
+def registrar_auditoria(caminho_arquivo, antes, depois, usuario, versao, pasta=PASTA_AUDITORIA):
+    """Acrescenta ao log as chaves que mudaram de `antes` para `depois`. Devolve quantas eram."""
+    alteracoes = [(chave, antes.get(chave, _SEM_VALOR), depois.get(chave, _SEM_VALOR))
+                  for chave in sorted(antes.keys() | depois.keys())
+                  if antes.get(chave, _SEM_VALOR) != depois.get(chave, _SEM_VALOR)]
+    if not alteracoes: return 0
+    with trava_arquivo(os.path.join(pasta, "auditoria")), _TRAVA_TERMOS:
+        tabela, novos = _termos(pasta, descartar_incompleta=True), []
+        def termo(texto):
+            if texto not in tabela["ids"]:
+                tabela["ids"][texto] = len(tabela["lista"]); tabela["lista"].append(texto); novos.append(texto)
+            return tabela["ids"][texto]
+        lotes, data = [], time.time()
+        for inicio in range(0, len(alteracoes), MAXIMO_ALTERACOES_LOTE):
+            parte = alteracoes[inicio:inicio + MAXIMO_ALTERACOES_LOTE]
+            corpo = b"".join(struct.pack(">I", termo(chave)) + _codificar_valor(antigo, termo) + _codificar_valor(novo, termo)
+                             for chave, antigo, novo in parte)
+            lotes.append(_LOTE.pack(_MARCA_LOTE, _LOTE.size + len(corpo), data, termo(usuario or ""),
+                                    termo(_id_avaliacao(caminho_arquivo)), versao, len(parte)) + corpo)
+        if novos:
+            linhas = "".join(json.dumps(texto, ensure_ascii=False) + "\n" for texto in novos).encode('utf-8')
+            with open(os.path.join(pasta, ARQUIVO_TERMOS), 'ab') as f:
+                f.write(linhas)
+            tabela["posicao"] += len(linhas)
+        with open(_arquivo_auditoria_atual(pasta), 'ab') as f:
+            f.write(b"".join(lotes))
+    return len(alteracoes)
+
+def _decodificar_valor(dados, posicao, lista):
+    tipo = dados[posicao]
+    if tipo == _VALOR_AUSENTE: return None, posicao + 1
+    (numero,) = struct.unpack_from(">I", dados, posicao + 1)
+    if tipo == _VALOR_TERMO: return json.loads(lista[numero]), posicao + 5
+    return json.loads(dados[posicao + 5:posicao + 5 + numero].decode('utf-8')), posicao + 5 + numero
+
+def _lotes(dados, lista, posicoes=None):
+    """Percorre os lotes de um arquivo do log lido em memória (ou só os que começam nas `posicoes`), devolvendo
+    (posição, lote). Um lote truncado no fim (gravação interrompida) encerra a leitura."""
+    proximas = iter(posicoes) if posicoes is not None else None
+    inicio = 0
+    while True:
+        if proximas is not None:
+            inicio = next(proximas, None)
+            if inicio is None: return
+        if inicio + _LOTE.size > len(dados): return
+        marca, tamanho, data, usuario, avaliacao, versao, quantidade = _LOTE.unpack_from(dados, inicio)
+        if marca != _MARCA_LOTE or inicio + tamanho > len(dados): return
+        posicao, alteracoes = inicio + _LOTE.size, []
+        for _ in range(quantidade):
+            (chave,) = struct.unpack_from(">I", dados, posicao)
+            antigo, posicao = _decodificar_valor(dados, posicao + 4, lista)
+            novo, posicao = _decodificar_valor(dados, posicao, lista)
+            alteracoes.append((lista[chave], antigo, novo))
+        yield inicio, {"data": data, "usuario": lista[usuario], "avaliacao": lista[avaliacao], "versao": versao, "alteracoes": alteracoes}
+        inicio += tamanho
+
+def _ler_arquivo_auditoria(caminho_arquivo):
+    """Bytes do arquivo do log e a tabela de termos, lida depois deles: todo termo usado num lote já lido
+    foi gravado antes desse lote."""
+    with open(caminho_arquivo, 'rb') as f:
+        dados = f.read()
+    with _TRAVA_TERMOS:
+        return dados, _termos(os.path.dirname(caminho_arquivo))["lista"]
+
+def indexar_arquivo_auditoria(caminho_arquivo):
+    """Grava '<arquivo>.idx' com as posições dos lotes de cada avaliação. Devolve o índice."""
+    dados, lista = _ler_arquivo_auditoria(caminho_arquivo)
+    avaliacoes = {}
+    for posicao, lote in _lotes(dados, lista):
+        avaliacoes.setdefault(lote["avaliacao"], []).append(posicao)
+    indice = {"tamanho": len(dados), "avaliacoes": avaliacoes}
+    _gravar_json_atomico(f"{caminho_arquivo}.idx", indice, indent=None)
+    return indice
+
+@lru_cache(maxsize=64)
+def _indice_arquivo_auditoria(caminho_indice, assinatura):
+    return _ler_indice(caminho_indice)
+
+def ler_auditoria(pasta=PASTA_AUDITORIA, aceitar_avaliacao=None):
+    """Lotes do log, do mais antigo ao mais recente. `aceitar_avaliacao(id)` filtra por avaliação: nos
+    arquivos fechados, só os lotes das avaliações aceitas são decodificados (pelo índice do arquivo)."""
+    for caminho in arquivos_auditoria(pasta):
+        caminho_indice = f"{caminho}.idx"
+        posicoes = None
+        if aceitar_avaliacao is not None and os.path.exists(caminho_indice):
+            indice = _indice_arquivo_auditoria(caminho_indice, assinatura_arquivo(caminho_indice))
+            if indice["tamanho"] == os.path.getsize(caminho):
+                posicoes = sorted(p for avaliacao, lista_posicoes in indice["avaliacoes"].items()
+                                  if aceitar_avaliacao(avaliacao) for p in lista_posicoes)
+                if not posicoes: continue
+        dados, lista = _ler_arquivo_auditoria(caminho)
+        for _, lote in _lotes(dados, lista, posicoes):
+            if aceitar_avaliacao is None or aceitar_avaliacao(lote["avaliacao"]):
+                yield lote
+
+def mesclar_tres_vias(base, minhas, deles):
+    """Mescla duas edições concorrentes de uma mesma base, chave a chave.
+
+    Chaves alteradas de um só lado são aceitas; alteradas dos dois lados com valores diferentes
+    entram em `conflitos` (ficando, na mescla, com o valor de `deles`). Devolve (mesclada, conflitos).
+    """
+    mesclada, conflitos = {}, []
+    for chave in sorted(set(base) | set(minhas) | set(deles)):
+        if chave == CHAVE_META: continue
+        v_base, v_minha, v_deles = base.get(chave), minhas.get(chave), deles.get(chave)
+        if v_minha == v_deles or v_minha == v_base:
+            valor = v_deles
+        elif v_deles == v_base:
+            valor = v_minha
+        else:
+            valor = v_deles
+            conflitos.append(chave)
+        if valor is not None: mesclada[chave] = valor
+    return mesclada, conflitos
@@ -0,0 +1,230 @@
+# --- observabilidade.py ---
+"""Logs estruturados (uma linha JSON por evento) e métricas no formato texto do Prometheus, para a operação.
+
+As métricas ficam em memória, no processo: contadores, histogramas e medidores com rótulos, atualizados sob
+uma trava (alguns microssegundos por evento), então podem ficar sempre ligadas. O app e a API as expõem em
+GET /metrics; os processos do pool de relatórios devolvem o que mediram junto com o resultado
+(retirar_observacoes) e o processo principal incorpora (incorporar_observacoes).
+
+Os logs usam o módulo logging: configurar_logs troca o formato do logger raiz por JSON. Os campos passados
+em `extra` viram campos do JSON (ex.: logger.info("avaliacao_salva", extra={"caminho": ..., "versao": 3})).
+
+Uso:
+    configurar_logs()                        # uma vez por processo (app, API, lotes)
+    iniciar_servidor_metricas(9464)          # GET http://127.0.0.1:9464/metrics
+    SALVAMENTOS.inc(resultado="ok")
+    with medir(DURACAO_RELATORIO, fase="conversao"): ...
+"""
+import json
+import logging
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PORTA_METRICAS = 9464
+ENDERECO_METRICAS = "127.0.0.1"  # só a máquina local: o Prometheus roda ao lado ou via túnel
+TIPO_CONTEUDO_METRICAS = "text/plain; version=0.0.4; charset=utf-8"
+FAIXAS_SEGUNDOS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+JANELA_SESSAO_ATIVA = 15 * 60  # segundos sem interação até uma sessão deixar de contar como ativa
+
+_trava = threading.Lock()
+_metricas = []
+
+
+# --- MÉTRICAS ---
+def _rotulos(nomes, valores):
+    escapar = lambda valor: str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{nome}="{escapar(valor)}"' for nome, valor in zip(nomes, valores))
+
+def _numero(valor):
+    return "+Inf" if valor == math.inf else repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome, self.ajuda, self.rotulos, self.valores = nome, ajuda, tuple(rotulos), {}
+        _metricas.append(self)
+
+    def inc(self, quantidade=1, **rotulos):
+        chave = tuple(rotulos.get(nome, "") for nome in self.rotulos)
+        with _trava:
+            self.valores[chave] = self.valores.get(chave, 0) + quantidade
+
+    def _linhas(self):
+        return [f"{self.nome}{{{_rotulos(self.rotulos, chave)}}} {_numero(valor)}" if self.rotulos else f"{self.nome} {_numero(valor)}"
+                for chave, valor in sorted(self.valores.items())]
+
+    def _retirar(self):
+        valores, self.valores = self.valores, {}
+        return [[list(chave), valor] for chave, valor in valores.items()]
+
+    def _incorporar(self, valores):
+        for chave, valor in valores:
+            self.valores[tuple(chave)] = self.valores.get(tuple(chave), 0) + valor
+
+class Histograma(Contador):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), faixas=FAIXAS_SEGUNDOS):
+        super().__init__(nome, ajuda, rotulos)
+        self.faixas = tuple(faixas) + (math.inf,)
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(rotulos.get(nome, "") for nome in self.rotulos)
+        with _trava:
+            contagens, soma = self.valores.get(chave, ([0] * len(self.faixas), 0.0))
+            contagens[next(i for i, limite in enumerate(self.faixas) if valor <= limite)] += 1
+            self.valores[chave] = (contagens, soma + valor)
+
+    def inc(self, quantidade=1, **rotulos):
+        raise TypeError("use observar() em histogramas")
+
+    def _linhas(self):
+        linhas = []
+        for chave, (contagens, soma) in sorted(self.valores.items()):
+            base = _rotulos(self.rotulos, chave)
+            acumulado = 0
+            for limite, contagem in zip(self.faixas, contagens):
+                acumulado += contagem
+                linhas.append(f'{self.nome}_bucket{{{base + "," if base else ""}le="{_numero(limite)}"}} {acumulado}')
+            sufixo = f"{{{base}}}" if base else ""
+            linhas += [f"{self.nome}_sum{sufixo} {_numero(soma)}", f"{self.nome}_count{sufixo} {acumulado}"]
+        return linhas
+
+    def _incorporar(self, valores):
+        for chave, (contagens, soma) in valores:
+            atuais, soma_atual = self.valores.get(tuple(chave), ([0] * len(self.faixas), 0.0))
+            self.valores[tuple(chave)] = ([a + b for a, b in zip(atuais, contagens)], soma_atual + soma)
+
+    def _retirar(self):
+        valores, self.valores = self.valores, {}
+        return [[list(chave), [contagens, soma]] for chave, (contagens, soma) in valores.items()]
+
+class SessoesAtivas:
+    """Medidor das sessões que interagiram nos últimos JANELA_SESSAO_ATIVA segundos (calculado na leitura)."""
+    tipo = "gauge"
+
+    def __init__(self, nome, ajuda):
+        self.nome, self.ajuda, self.vistas = nome, ajuda, {}
+        _metricas.append(self)
+
+    def marcar(self, sessao):
+        with _trava:
+            self.vistas[sessao] = time.monotonic()
+
+    def encerrar(self, sessao):
+        with _trava:
+            self.vistas.pop(sessao, None)
+
+    def _linhas(self):
+        limite = time.monotonic() - JANELA_SESSAO_ATIVA
+        for sessao in [s for s, visto in self.vistas.items() if visto < limite]:
+            del self.vistas[sessao]
+        return [f"{self.nome} {len(self.vistas)}"]
+
+    def _retirar(self):
+        return []
+
+    def _incorporar(self, valores):
+        pass
+
+def texto_metricas():
+    """Todas as métricas do processo no formato texto do Prometheus."""
+    linhas = []
+    with _trava:
+        for metrica in _metricas:
+            linhas += [f"# HELP {metrica.nome} {metrica.ajuda}", f"# TYPE {metrica.nome} {metrica.tipo}"] + metrica._linhas()
+    return "\n".join(linhas) + "\n"
+
+def retirar_observacoes():
+    """O que foi medido neste processo desde a última retirada (e zera), para enviar ao processo principal."""
+    with _trava:
+        return {metrica.nome: valores for metrica in _metricas if (valores := metrica._retirar())}
+
+def incorporar_observacoes(observacoes):
+    """Soma às métricas deste processo o que foi retirado em outro (ex.: um processo do pool de relatórios)."""
+    if not observacoes: return
+    with _trava:
+        for metrica in _metricas:
+            if metrica.nome in observacoes: metrica._incorporar(observacoes[metrica.nome])
+
+@contextmanager
+def medir(histograma, **rotulos):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        histograma.observar(time.perf_counter() - inicio, **rotulos)
+
+
+SALVAMENTOS = Contador("axavalia_salvamentos_total", "Salvamentos de avaliação, por resultado (ok, conflito, trava, erro).", ["resultado"])
+DURACAO_SALVAMENTO = Histograma("axavalia_salvamento_segundos", "Duração dos salvamentos bem-sucedidos.")
+SALVAMENTOS_AUTOMATICOS = Contador("axavalia_salvamentos_automaticos_total", "Salvamentos automáticos do app, por resultado.", ["resultado"])
+RELATORIOS = Contador("axavalia_relatorios_total", "Relatórios gerados, por resultado (pdf, docx, erro).", ["resultado"])
+DURACAO_RELATORIO = Histograma("axavalia_relatorio_segundos", "Duração de cada fase da geração do relatório.", ["fase"])
+FALHAS_CONVERSAO = Contador("axavalia_conversoes_pdf_falhas_total", "Conversões para PDF que falharam (o relatório sai em .docx).")
+AVALIACOES_ATIVAS = SessoesAtivas("axavalia_avaliacoes_ativas", "Sessões do app com uma avaliação aberta e uso recente.")
+
+
+# --- SERVIDOR DE MÉTRICAS ---
+class _ServidorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = texto_metricas().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", TIPO_CONTEUDO_METRICAS)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass  # uma linha por coleta do Prometheus só poluiria o log
+
+_servidor = None
+
+def iniciar_servidor_metricas(porta=PORTA_METRICAS, endereco=ENDERECO_METRICAS):
+    """Sobe (uma vez por processo) o servidor de GET /metrics em uma thread de fundo. Devolve False se a porta
+    estiver ocupada (ex.: outro processo do app na mesma máquina) ou se porta for 0."""
+    global _servidor
+    with _trava:
+        if _servidor is not None or not porta: return bool(_servidor)
+        try:
+            _servidor = ThreadingHTTPServer((endereco, porta), _ServidorMetricas)
+        except OSError as e:
+            _servidor = False
+            logger.warning("servidor_metricas_indisponivel", extra={"porta": porta, "erro": str(e)})
+            return False
+    threading.Thread(target=_servidor.serve_forever, name="metricas", daemon=True).start()
+    logger.info("servidor_metricas_iniciado", extra={"endereco": endereco, "porta": porta})
+    return True
+
+
+# --- LOGS ESTRUTURADOS ---
+_CAMPOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class FormatoJson(logging.Formatter):
+    def format(self, record):
+        evento = {"data": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+                  "nivel": record.levelname, "logger": record.name, "evento": record.getMessage()}
+        evento.update((campo, valor) for campo, valor in vars(record).items() if campo not in _CAMPOS_PADRAO)
+        if record.exc_info:
+            evento["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+def configurar_logs(nivel=logging.INFO, saida=None):
+    """Logs do processo em JSON, uma linha por evento (idempotente: pode ser chamada a cada execução do app)."""
+    raiz = logging.getLogger()
+    if any(isinstance(handler.formatter, FormatoJson) for handler in raiz.handlers): return
+    handler = logging.StreamHandler(saida or sys.stderr)
+    handler.setFormatter(FormatoJson())
+    raiz.addHandler(handler)
+    raiz.setLevel(nivel)
@@ -0,0 +1,211 @@
+# --- pacotes.py ---
+"""Pacotes de avaliação para trabalho offline: exportar, editar longe do servidor e importar com mescla.
+
+Um pacote é um único arquivo JSON com tudo o que o avaliador offline (avaliacao_offline.py) precisa:
+a entidade, os critérios do segmento (com a versão e o hash), as respostas da versão exportada (a base,
+com versão e hash, inclusive os links de evidência) e as respostas editadas offline. Na importação, as
+respostas editadas são mescladas em três vias (base, offline, servidor) com a cópia atual do servidor:
+as chaves alteradas de um só lado entram direto, e as alteradas nos dois lados voltam agrupadas por
+critério para que alguém escolha. Se o servidor não mudou desde a exportação, não há mescla a fazer.
+
+Uso:
+    python pacotes.py exportar --municipio Balsas --segmento Prefeitura --usuario gabriel -o balsas.json
+    python pacotes.py importar balsas.json --usuario gabriel                 # conflitos: fica a do servidor
+    python pacotes.py importar balsas.json --usuario gabriel --preferir offline
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from municipios import UF_PADRAO
+from nucleo import (
+    ARQUIVO_CRITERIOS, CHAVE_META, ConflitoDeVersao, caminho_avaliacao, carregar_avaliacao_com_meta, carregar_criterios,
+    chave_resposta, hash_respostas, iterar_itens, mesclar_tres_vias, nome_arquivo_avaliacao, salvar_avaliacao,
+    validar_respostas, versao_criterios,
+)
+
+FORMATO_PACOTE = "axavalia/pacote-avaliacao"
+VERSAO_FORMATO = 1
+TENTATIVAS_IMPORTACAO = 3  # o servidor pode mudar entre a mescla e a gravação: mescla de novo
+
+
+class ErroPacote(ValueError):
+    """O arquivo não é um pacote de avaliação válido ou não pode ser importado."""
+
+
+def hash_criterios(matriz_perguntas):
+    conteudo = json.dumps(matriz_perguntas, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+def nome_pacote(segmento, municipio, usuario=None, uf=UF_PADRAO):
+    """Nome sugerido do arquivo: o da avaliação, com "pacote_" no lugar de "avaliacao_"."""
+    return "pacote_" + nome_arquivo_avaliacao(segmento, municipio, usuario, uf)[len("avaliacao_"):]
+
+def montar_pacote(matriz_completa, segmento, municipio, usuario=None, uf=UF_PADRAO, caminho_arquivo=None):
+    """Pacote com a versão salva da avaliação (a base da mescla) e os critérios do segmento."""
+    caminho_arquivo = caminho_arquivo or caminho_avaliacao(segmento, municipio, usuario, uf)
+    respostas, meta = carregar_avaliacao_com_meta(caminho_arquivo)
+    matriz_perguntas = matriz_completa[segmento]
+    return {
+        "formato": FORMATO_PACOTE, "versao_formato": VERSAO_FORMATO,
+        "exportado_em": datetime.now().isoformat(timespec="seconds"), "editado_em": "",
+        "entidade": {"segmento": segmento, "municipio": municipio, "uf": uf, "usuario": usuario or ""},
+        "criterios": {"versao": versao_criterios(matriz_completa), "hash": hash_criterios(matriz_perguntas), "matriz": matriz_perguntas},
+        "base": {"versao": meta["versao"], "hash": meta["hash"], "respostas": respostas},
+        "respostas": copy.deepcopy(respostas),
+    }
+
+def serializar_pacote(pacote):
+    return json.dumps(pacote, ensure_ascii=False, indent=1).encode('utf-8')
+
+def ler_pacote(conteudo):
+    """Lê e confere um pacote (bytes ou texto). Levanta ErroPacote."""
+    try:
+        pacote = json.loads(conteudo)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ErroPacote(f"O arquivo não é um pacote de avaliação (JSON inválido: {e}).")
+    if not isinstance(pacote, dict) or pacote.get("formato") != FORMATO_PACOTE:
+        raise ErroPacote("O arquivo não é um pacote de avaliação.")
+    if pacote.get("versao_formato", 0) > VERSAO_FORMATO:
+        raise ErroPacote(f"Pacote na versão {pacote['versao_formato']} do formato; atualize o sistema para importá-lo.")
+    faltando = [c for c in ("entidade", "criterios", "base", "respostas") if not isinstance(pacote.get(c), dict)]
+    if faltando:
+        raise ErroPacote(f"Pacote sem {', '.join(faltando)}.")
+    base = pacote["base"]
+    if base.get("versao", 0) and hash_respostas(base.get("respostas", {})) != base.get("hash"):
+        raise ErroPacote("As respostas da base não conferem com o hash exportado: o pacote foi alterado fora do avaliador.")
+    return pacote
+
+def carregar_pacote(caminho):
+    with open(caminho, 'rb') as f:
+        return ler_pacote(f.read())
+
+def gravar_pacote(pacote, caminho):
+    """Grava o pacote de forma atômica (usado também pelo avaliador offline a cada salvamento)."""
+    pasta = os.path.dirname(caminho)
+    if pasta: os.makedirs(pasta, exist_ok=True)
+    caminho_tmp = f"{caminho}.{os.getpid()}.tmp"
+    with open(caminho_tmp, 'wb') as f:
+        f.write(serializar_pacote(pacote))
+    os.replace(caminho_tmp, caminho)
+
+
+# --- MESCLA ---
+def _criterio_de_cada_chave(matriz_perguntas):
+    """Chave de resposta -> (secao, item, rótulo da resposta no critério)."""
+    mapa = {}
+    for secao, item in iterar_itens(matriz_perguntas):
+        mapa[chave_resposta(secao, item['criterio'], "links")] = (secao, item, "Links de evidência")
+        for sub in item["subcriterios"]:
+            mapa[chave_resposta(secao, item['criterio'], sub)] = (secao, item, sub)
+            mapa[chave_resposta(secao, item['criterio'], f"{sub}_obs")] = (secao, item, f"Observação ({sub})")
+    return mapa
+
+def conflitos_por_criterio(conflitos, matriz_perguntas, offline, servidor):
+    """Agrupa as chaves em conflito por critério, na ordem dos critérios: lista de
+    {"secao", "topico", "criterio", "respostas": [{"chave", "rotulo", "offline", "servidor"}]}."""
+    mapa, grupos = _criterio_de_cada_chave(matriz_perguntas), {}
+    for chave in conflitos:
+        secao, item, rotulo = mapa.get(chave, ("", {"topico": "", "criterio": "(fora dos critérios)"}, chave))
+        grupo = grupos.setdefault((secao, item["criterio"]), {"secao": secao, "topico": item["topico"], "criterio": item["criterio"], "respostas": []})
+        grupo["respostas"].append({"chave": chave, "rotulo": rotulo, "offline": offline.get(chave), "servidor": servidor.get(chave)})
+    ordem = {(secao, item["criterio"]): i for i, (secao, item) in enumerate(iterar_itens(matriz_perguntas))}
+    return sorted(grupos.values(), key=lambda g: ordem.get((g["secao"], g["criterio"]), len(ordem)))
+
+def comparar_com_servidor(pacote, matriz_completa, caminho_arquivo=None):
+    """Mescla as respostas do pacote com a cópia atual do servidor, sem gravar.
+
+    Devolve {"caminho", "mesclada", "conflitos" (por critério), "servidor" (respostas), "meta_atual", "alteradas_offline", "avisos"}.
+    Levanta ErroPacote se o segmento não existir ou se as respostas editadas não valerem nos critérios atuais.
+    """
+    entidade = pacote["entidade"]
+    if entidade["segmento"] not in matriz_completa:
+        raise ErroPacote(f"Segmento '{entidade['segmento']}' não existe nos critérios atuais.")
+    matriz_perguntas = matriz_completa[entidade["segmento"]]
+    caminho_arquivo = caminho_arquivo or caminho_avaliacao(entidade["segmento"], entidade["municipio"], entidade["usuario"] or None, entidade["uf"])
+    base, offline = pacote["base"]["respostas"], {k: v for k, v in pacote["respostas"].items() if k != CHAVE_META}
+    servidor, meta_atual = carregar_avaliacao_com_meta(caminho_arquivo)
+
+    alteradas_offline = sorted(chave for chave in set(base) | set(offline) if base.get(chave) != offline.get(chave))
+    erros = validar_respostas({k: offline[k] for k in alteradas_offline if k in offline}, matriz_perguntas)
+    if erros:
+        raise ErroPacote(f"{len(erros)} resposta(s) do pacote não valem nos critérios atuais: " + " ".join(erros[:5]))
+    avisos = []
+    if pacote["criterios"].get("hash") != hash_criterios(matriz_perguntas):
+        avisos.append(f"O pacote foi exportado com outra versão dos critérios ({pacote['criterios'].get('versao') or 'sem versão'}).")
+
+    if meta_atual["hash"] == pacote["base"]["hash"]:  # ninguém gravou desde a exportação
+        mesclada, conflitos = offline, []
+    else:
+        mesclada, conflitos = mesclar_tres_vias(base, offline, servidor)
+        avisos.append(f"A avaliação foi salva no servidor depois da exportação (versão {pacote['base']['versao']} -> {meta_atual['versao']}).")
+    return {"caminho": caminho_arquivo, "mesclada": mesclada, "servidor": servidor, "meta_atual": meta_atual, "alteradas_offline": alteradas_offline,
+            "conflitos": conflitos_por_criterio(conflitos, matriz_perguntas, offline, servidor), "avisos": avisos}
+
+def resolver_conflitos(comparacao, escolhas=None, preferir="servidor"):
+    """Respostas finais: `escolhas` ({chave: "offline" | "servidor"}) decide cada conflito; os demais seguem `preferir`."""
+    respostas = dict(comparacao["mesclada"])
+    for grupo in comparacao["conflitos"]:
+        for resposta in grupo["respostas"]:
+            lado = (escolhas or {}).get(resposta["chave"], preferir)
+            valor = resposta["offline"] if lado == "offline" else resposta["servidor"]
+            if valor is None: respostas.pop(resposta["chave"], None)
+            else: respostas[resposta["chave"]] = valor
+    return respostas
+
+def importar_pacote(pacote, matriz_completa, usuario=None, escolhas=None, preferir="servidor", caminho_arquivo=None, meta_extra=None):
+    """Mescla e grava o pacote no servidor. Se outra gravação acontecer no meio, mescla de novo
+    (até TENTATIVAS_IMPORTACAO vezes). Devolve (nova meta, comparação usada)."""
+    for tentativa in range(TENTATIVAS_IMPORTACAO):
+        comparacao = comparar_com_servidor(pacote, matriz_completa, caminho_arquivo)
+        try:
+            meta = salvar_avaliacao(comparacao["caminho"], resolver_conflitos(comparacao, escolhas, preferir),
+                                    comparacao["meta_atual"], usuario, meta_extra)
+            return meta, comparacao
+        except ConflitoDeVersao:
+            if tentativa == TENTATIVAS_IMPORTACAO - 1: raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pacotes de avaliação para trabalho offline.")
+    parser.add_argument("--criterios", default=ARQUIVO_CRITERIOS)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    exportar = comandos.add_parser("exportar", help="Gera o pacote com a versão salva da avaliação.")
+    exportar.add_argument("--municipio", required=True)
+    exportar.add_argument("--segmento", required=True)
+    exportar.add_argument("--usuario")
+    exportar.add_argument("--uf", default=UF_PADRAO)
+    exportar.add_argument("-o", "--saida")
+    importar = comandos.add_parser("importar", help="Mescla o pacote com a cópia do servidor e grava.")
+    importar.add_argument("pacote")
+    importar.add_argument("--usuario", help="Quem está importando (vai para a meta e para a auditoria).")
+    importar.add_argument("--preferir", choices=["servidor", "offline"], default="servidor", help="Lado que vence nos conflitos.")
+    args = parser.parse_args()
+    matriz_completa = carregar_criterios(args.criterios)
+
+    if args.comando == "exportar":
+        if args.segmento not in matriz_completa:
+            parser.error(f"segmento '{args.segmento}' não existe nos critérios.")
+        saida = args.saida or nome_pacote(args.segmento, args.municipio, args.usuario, args.uf)
+        gravar_pacote(montar_pacote(matriz_completa, args.segmento, args.municipio, args.usuario, args.uf), saida)
+        print(f"Pacote gravado em {saida}.")
+        return
+
+    try:
+        meta, comparacao = importar_pacote(carregar_pacote(args.pacote), matriz_completa, args.usuario, preferir=args.preferir)
+    except (ErroPacote, ConflitoDeVersao, OSError) as e:
+        raise SystemExit(f"Pacote não importado: {e}")
+    for aviso in comparacao["avisos"]:
+        print(f"Aviso: {aviso}")
+    for grupo in comparacao["conflitos"]:
+        print(f"Conflito em {grupo['topico']} - {grupo['criterio']} ({grupo['secao']}):")
+        for resposta in grupo["respostas"]:
+            print(f"  {resposta['rotulo']}: offline={resposta['offline']!r} servidor={resposta['servidor']!r} -> ficou a do {args.preferir}")
+    print(f"{len(comparacao['alteradas_offline'])} resposta(s) alterada(s) offline; gravado em {comparacao['caminho']} (versão {meta['versao']}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import json
+from functools import lru_cache
+
+from nucleo import CHAVE_MUNICIPIOS
+
+# --- REGRAS DE PONTUAÇÃO (ATRICON) ---
+# Pesos, faixas e nomes de selo vêm de um arquivo versionado (regras_pontuacao.json), que muda a cada
+# ciclo. O arquivo é validado e compilado em uma tabela de decisão: para cada situação dos essenciais
+# (exigência cumprida ou não), uma lista de (mínimo, nome) em ordem decrescente de mínimo.
+ARQUIVO_REGRAS = "regras_pontuacao.json"
+CAMPOS_OBRIGATORIOS = ("versao", "pesos", "selos", "nivel_sem_selo", "niveis_sem_essenciais", "sem_pontuacao")
+
+class RegrasInvalidas(ValueError):
+    """O arquivo de regras não segue o formato esperado."""
+
+def compilar_regras(definicao):
+    """Valida a definição de regras e monta a tabela de decisão usada no cálculo."""
+    faltando = [c for c in CAMPOS_OBRIGATORIOS if c not in definicao]
+    if faltando:
+        raise RegrasInvalidas(f"Regras sem os campos: {', '.join(faltando)}.")
+    faixas_selo = sorted(((float(s["minimo"]), s["nome"]) for s in definicao["selos"]), reverse=True)
+    faixas_sem_essenciais = sorted(((float(n["minimo"]), n["nome"]) for n in definicao["niveis_sem_essenciais"]), reverse=True)
+    if not faixas_sem_essenciais or faixas_sem_essenciais[-1][0] > 0:
+        raise RegrasInvalidas("'niveis_sem_essenciais' precisa de uma faixa com mínimo 0.")
+    return {
+        "versao": str(definicao["versao"]),
+        "descricao": definicao.get("descricao", ""),
+        "pesos": {c.upper(): float(p) for c, p in definicao["pesos"].items()},
+        "classificacao_padrao": definicao.get("classificacao_padrao", "RECOMENDADA").upper(),
+        "peso_padrao": float(definicao.get("peso_padrao", 1.0)),
+        "percentual_essenciais_exigido": float(definicao.get("percentual_essenciais_exigido", 100)),
+        "selos": faixas_selo,
+        "sem_pontuacao": definicao["sem_pontuacao"],
+        # Tabela de decisão: True = exigência de essenciais cumprida.
+        "tabela": {
+            True: faixas_selo + [(0.0, definicao["nivel_sem_selo"])],
+            False: faixas_sem_essenciais,
+        },
+    }
+
+def carregar_regras(caminho_arquivo=ARQUIVO_REGRAS):
+    """Lê e compila um arquivo de regras."""
+    with open(caminho_arquivo, 'r', encoding='utf-8') as f:
+        return compilar_regras(json.load(f))
+
+@lru_cache(maxsize=None)
+def regras_vigentes(caminho_arquivo=ARQUIVO_REGRAS):
+    """Regras em uso pelo app, compiladas uma única vez por processo."""
+    return carregar_regras(caminho_arquivo)
+
+def peso_item(item, regras):
+    """Classificação normalizada e peso de um item segundo as regras."""
+    classificacao = item.get("classificacao", regras["classificacao_padrao"]).upper()
+    return classificacao, regras["pesos"].get(classificacao, regras["peso_padrao"])
+
+def item_atende(respostas, secao, item):
+    """Um item só é atendido se nenhum dos seus subcritérios estiver como "Não Atende"."""
+    for sub in item["subcriterios"]:
+        if respostas.get(f"{secao}_{item['criterio']}_{sub}") == "Não Atende":
+            return False
+    return True
+
+def calcular_indice_e_selo(respostas, matriz_perguntas, regras=None):
+    """Calcula o índice de transparência e o selo Atricon com base nos pesos."""
+    regras = regras or regras_vigentes()
+    total_pontos_possiveis, pontos_obtidos, total_essenciais, essenciais_atendidos = 0, 0, 0, 0
+    for secao, perguntas in matriz_perguntas.items():
+        if secao == CHAVE_MUNICIPIOS: continue
+        for item in perguntas:
+            classificacao, peso = peso_item(item, regras)
+            total_pontos_possiveis += peso
+            status_geral_atende_item = item_atende(respostas, secao, item)
+
+            if status_geral_atende_item: pontos_obtidos += peso
+            if classificacao == "ESSENCIAL":
+                total_essenciais += 1
+                if status_geral_atende_item: essenciais_atendidos += 1
+
+    percentual_essenciais = (essenciais_atendidos / total_essenciais * 100) if total_essenciais > 0 else 100
+    indice = (pontos_obtidos / total_pontos_possiveis * 100) if total_pontos_possiveis > 0 else 0
+    return {"indice": indice, "selo": definir_selo(indice, percentual_essenciais, regras),
+            "percentual_essenciais": percentual_essenciais, "regras": regras["versao"]}
+
+def definir_selo(indice, percentual_essenciais, regras=None):
+    """Consulta a tabela de decisão: primeira faixa cujo mínimo o índice alcança."""
+    regras = regras or regras_vigentes()
+    if indice <= 0: return regras["sem_pontuacao"]
+    faixas = regras["tabela"][percentual_essenciais >= regras["percentual_essenciais_exigido"]]
+    return next(nome for minimo, nome in faixas if indice >= minimo)
+
+def calcular_pontuacao_secao(respostas, perguntas_secao, nome_secao, regras=None):
+    """Calcula a pontuação de uma seção específica."""
+    regras = regras or regras_vigentes()
+    total_pontos_possiveis, pontos_obtidos = 0, 0
+    for item in perguntas_secao:
+        _, peso = peso_item(item, regras)
+        total_pontos_possiveis += peso
+
+        if item_atende(respostas, nome_secao, item):
+            pontos_obtidos += peso
+    return (pontos_obtidos / total_pontos_possiveis * 100) if total_pontos_possiveis > 0 else 100
@@ -0,0 +1,241 @@
+# --- portal_estatico.py ---
+"""Portal de transparência estático: uma página HTML por entidade (índice, selo, pontuação das seções e
+não conformidades), uma página inicial com o ranking e um índice de busca em JSON, servidos por qualquer
+servidor web, sem o app.
+
+A geração é incremental. O manifesto (manifesto.json, na pasta de saída) guarda, para cada página, o hash
+das entradas: conteúdo do arquivo da avaliação, critérios do segmento, regras de pontuação e versão do
+layout (VERSAO_PORTAL). Só são refeitas as páginas cujo hash mudou; arquivos com o mesmo mtime e tamanho
+da última geração nem são lidos. A página inicial e o índice de busca dependem apenas dos resumos das
+entidades, guardados no manifesto. Páginas de entidades que deixaram de existir são apagadas.
+
+Cada entidade publica uma única avaliação: a consolidada (data/consolidadas), se houver; senão, a
+salva mais recentemente entre as dos avaliadores.
+
+Uso:
+    python portal_estatico.py                    # gera/atualiza a pasta portal/
+    python portal_estatico.py --completo         # refaz todas as páginas
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import time
+
+import compressao
+from conteudo_relatorio import nao_conformidades, pontuacoes_por_secao
+from graficos import grafico_secoes, grafico_selo
+from consolidar_avaliacoes import PASTA_CONSOLIDADAS, USUARIO_CONSOLIDADO
+from municipios import codigo_por_nome_compacto, municipio_por_codigo, normalizar_nome
+from nucleo import (
+    ARQUIVO_CRITERIOS, CHAVE_META, PASTA_AVALIACOES, assinatura_arquivo, carregar_criterios,
+    listar_arquivos_avaliacao, resolver_entidade, segmentos, separar_meta,
+)
+from pontuacao import ARQUIVO_REGRAS, calcular_indice_e_selo, carregar_regras
+
+PASTA_PORTAL = "portal"
+VERSAO_PORTAL = "2"  # mude ao alterar o layout das páginas: força a reconstrução de todas
+ARQUIVO_MANIFESTO = "manifesto.json"
+ARQUIVO_BUSCA = "busca.json"
+PASTA_ENTIDADES = "entidades"
+
+ESTILO = """body{font-family:system-ui,sans-serif;max-width:960px;margin:0 auto;padding:1rem;color:#222}
+table{border-collapse:collapse;width:100%}th,td{padding:.35rem .5rem;border-bottom:1px solid #ddd;text-align:left}
+td.num{text-align:right}.selo{font-weight:bold}.indice{font-size:2.5rem;font-weight:bold;margin:.2rem 0}
+.nao{color:#c00;font-weight:bold}input[type=search]{width:100%;padding:.5rem;font-size:1rem;margin:.5rem 0}
+footer{margin-top:2rem;color:#777;font-size:.85rem}.grafico svg{max-width:100%;height:auto}"""
+
+
+def _hash(*partes):
+    return hashlib.sha256(json.dumps(partes, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _ler_bytes(caminho):
+    with open(caminho, 'rb') as f:
+        return f.read()
+
+def _gravar(caminho, texto):
+    """Grava de forma atômica: o servidor web nunca entrega uma página pela metade."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    caminho_tmp = f"{caminho}.{os.getpid()}.tmp"
+    with open(caminho_tmp, 'w', encoding='utf-8') as f:
+        f.write(texto)
+    os.replace(caminho_tmp, caminho)
+
+def identificador(segmento_arquivo, codigo):
+    """Nome da página da entidade, só com ASCII (ex.: "camara-2101400")."""
+    return f"{normalizar_nome(segmento_arquivo)}-{normalizar_nome(codigo)}".replace(" ", "-")
+
+
+# --- SELEÇÃO DAS AVALIAÇÕES ---
+def avaliacoes_publicadas(matriz_completa, pasta=PASTA_AVALIACOES, pasta_consolidadas=PASTA_CONSOLIDADAS):
+    """{id: {"caminho", "segmento", "municipio", "codigo", "uf"}}, uma avaliação por entidade."""
+    escolhidas = {}
+    for prioridade, pasta_origem in enumerate((pasta_consolidadas, pasta)):
+        if not os.path.isdir(pasta_origem): continue
+        for caminho, segmento_arquivo, municipio_arquivo, usuario in listar_arquivos_avaliacao(pasta_origem):
+            if prioridade == 1 and usuario == USUARIO_CONSOLIDADO: continue
+            segmento, municipio = resolver_entidade(matriz_completa, segmento_arquivo, municipio_arquivo)
+            if segmento not in matriz_completa: continue
+            codigo = municipio_arquivo if municipio_arquivo.isdigit() else codigo_por_nome_compacto(municipio_arquivo) or municipio_arquivo
+            chave = identificador(segmento_arquivo, codigo)
+            mtime = os.path.getmtime(caminho)
+            atual = escolhidas.get(chave)
+            if atual is None or (atual["prioridade"] == prioridade and mtime > atual["mtime"]):
+                registro = municipio_por_codigo(codigo)
+                escolhidas[chave] = {"caminho": caminho, "segmento": segmento, "municipio": municipio, "codigo": codigo,
+                                     "uf": registro["uf"] if registro else "", "prioridade": prioridade, "mtime": mtime}
+    return escolhidas
+
+
+# --- PÁGINAS ---
+def _pagina(titulo, corpo, raiz=""):
+    return (f'<!DOCTYPE html>\n<html lang="pt-BR"><head><meta charset="utf-8">'
+            f'<meta name="viewport" content="width=device-width, initial-scale=1"><title>{html.escape(titulo)}</title>'
+            f'<link rel="stylesheet" href="{raiz}estilo.css"></head><body>\n{corpo}\n'
+            f'<footer>Gerado em {time.strftime("%d/%m/%Y %H:%M")}</footer></body></html>\n')
+
+def resumo_e_pagina(entidade, respostas, meta, matriz_perguntas, regras):
+    """Resumo da entidade (para o ranking e a busca) e o HTML da sua página."""
+    resultado = calcular_indice_e_selo(respostas, matriz_perguntas, regras)
+    secoes = pontuacoes_por_secao(respostas, matriz_perguntas, regras)
+    nao_conformes = nao_conformidades(respostas, matriz_perguntas, regras)
+    nome = f"{entidade['segmento']} de {entidade['municipio']}" + (f" ({entidade['uf']})" if entidade["uf"] else "")
+    resumo = {"id": entidade["id"], "nome": nome, "segmento": entidade["segmento"], "municipio": entidade["municipio"],
+              "uf": entidade["uf"], "codigo": entidade["codigo"], "indice": round(resultado["indice"], 2), "selo": resultado["selo"],
+              "nao_conformidades": sum(len(s["itens"]) for s in nao_conformes), "atualizado": meta.get("salvo_em", ""),
+              "pagina": f"{PASTA_ENTIDADES}/{entidade['id']}.html", "busca": normalizar_nome(nome)}
+
+    partes = [f'<p><a href="../index.html">← Todas as entidades</a></p><h1>{html.escape(nome)}</h1>',
+              f'<p class="indice">{resultado["indice"]:.2f}%</p><p class="selo">{html.escape(resultado["selo"])}</p>',
+              f'<p>Regras de pontuação: {html.escape(resultado["regras"])}'
+              + (f' · avaliação salva em {html.escape(resumo["atualizado"])}' if resumo["atualizado"] else "") + "</p>",
+              f'<div class="grafico">{grafico_selo(resultado["indice"], resultado["selo"], regras=regras)}</div>',
+              f'<h2>Pontuação por seção</h2><div class="grafico">{grafico_secoes(secoes)}</div><table><tr><th>Seção</th><th>Pontuação</th></tr>']
+    partes += [f'<tr><td>{html.escape(secao)}</td><td class="num">{pontuacao:.2f}%</td></tr>' for secao, pontuacao in secoes]
+    partes.append("</table><h2>Não conformidades</h2>")
+    if not nao_conformes:
+        partes.append("<p>Nenhuma não conformidade foi encontrada nesta avaliação. Todos os critérios foram atendidos.</p>")
+    for secao in nao_conformes:
+        partes.append(f'<h3>{html.escape(secao["secao"])} - {secao["pontuacao"]:.2f}%</h3>')
+        for item in secao["itens"]:
+            partes.append(f'<h4>Item {html.escape(item["topico"])} - {html.escape(item["criterio"])} ({html.escape(item["classificacao"].upper())})</h4><ul>')
+            partes += [f'<li><em>{html.escape(sub)}:</em> <span class="nao">Não Atende</span></li>' for sub in item["subcriterios"]]
+            partes.append("</ul>")
+            if item["links"] or item["observacoes"]:
+                partes.append("<p><strong>Evidências e Comentários:</strong></p><ul>")
+                partes += [f'<li>Link: <a href="{html.escape(link)}" rel="nofollow">{html.escape(link)}</a></li>' for link in item["links"]]
+                partes += [f'<li>Observação ({html.escape(sub)}): {html.escape(obs)}</li>' for sub, obs in item["observacoes"]]
+                partes.append("</ul>")
+    return resumo, _pagina(nome, "\n".join(partes), raiz="../")
+
+def pagina_inicial(resumos):
+    """Ranking de todas as entidades, com a busca (sem acentos) sobre busca.json; sem JavaScript, fica a tabela completa."""
+    linhas = [f'<tr data-busca="{html.escape(r["busca"])}"><td class="num">{posicao}</td><td><a href="{html.escape(r["pagina"])}">{html.escape(r["nome"])}</a></td>'
+              f'<td class="num">{r["indice"]:.2f}%</td><td>{html.escape(r["selo"])}</td><td class="num">{r["nao_conformidades"]}</td></tr>'
+              for posicao, r in enumerate(resumos, 1)]
+    corpo = ('<h1>Transparência Pública Municipal</h1>'
+             '<input type="search" id="busca" placeholder="Buscar entidade (ex.: camara sao luis)">'
+             '<table id="ranking"><tr><th>#</th><th>Entidade</th><th>Índice</th><th>Selo</th><th>Não conformidades</th></tr>\n'
+             + "\n".join(linhas) + "</table>\n"
+             "<script>\n"
+             "const normalizar = t => t.normalize('NFKD').replace(/[\\u0300-\\u036f]/g, '').toLowerCase().replace(/[^a-z0-9]+/g, ' ').trim();\n"
+             f"fetch('{ARQUIVO_BUSCA}').then(r => r.json()).then(indice => {{\n"
+             "  const linhas = Array.from(document.querySelectorAll('#ranking tr[data-busca]'));\n"
+             "  document.getElementById('busca').addEventListener('input', e => {\n"
+             "    const termos = normalizar(e.target.value).split(' ').filter(Boolean);\n"
+             "    const visiveis = new Set(indice.filter(r => termos.every(t => r.busca.split(' ').some(p => p.startsWith(t)))).map(r => r.busca));\n"
+             "    linhas.forEach(l => { l.hidden = !visiveis.has(l.dataset.busca); });\n"
+             "  });\n"
+             "});\n</script>")
+    return _pagina("Transparência Pública Municipal", corpo)
+
+
+# --- GERAÇÃO INCREMENTAL ---
+def _ler_manifesto(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            manifesto = json.load(f)
+        return manifesto if manifesto.get("versao") == VERSAO_PORTAL else {}
+    except (OSError, ValueError):
+        return {}
+
+def gerar_portal(pasta_saida=PASTA_PORTAL, pasta=PASTA_AVALIACOES, pasta_consolidadas=PASTA_CONSOLIDADAS,
+                 arquivo_criterios=ARQUIVO_CRITERIOS, arquivo_regras=ARQUIVO_REGRAS, completo=False):
+    """Gera ou atualiza o portal. Devolve {"paginas", "refeitas", "removidas", "lidas", "inicial_refeita", "falhas"}."""
+    matriz_completa, regras = carregar_criterios(arquivo_criterios), carregar_regras(arquivo_regras)
+    caminho_manifesto = os.path.join(pasta_saida, ARQUIVO_MANIFESTO)
+    manifesto_anterior = {} if completo else _ler_manifesto(caminho_manifesto)
+    anterior = manifesto_anterior.get("entidades", {})
+    hash_regras = hashlib.sha256(_ler_bytes(arquivo_regras)).hexdigest()
+    hash_segmentos = {segmento: _hash(matriz_completa[segmento]) for segmento in segmentos(matriz_completa)}
+    entidades, estatisticas = {}, {"refeitas": 0, "removidas": 0, "lidas": 0, "falhas": []}
+
+    for id_entidade, entidade in sorted(avaliacoes_publicadas(matriz_completa, pasta, pasta_consolidadas).items()):
+        entidade = dict(entidade, id=id_entidade)
+        registro_anterior = anterior.get(id_entidade, {})
+        assinatura = list(assinatura_arquivo(entidade["caminho"]))
+        bruto = None
+        try:
+            if registro_anterior.get("caminho") == entidade["caminho"] and registro_anterior.get("assinatura") == assinatura:
+                hash_conteudo = registro_anterior["conteudo"]  # mesmo mtime e tamanho: nem lê o arquivo
+            else:
+                bruto = _ler_bytes(entidade["caminho"])
+                hash_conteudo = hashlib.sha256(bruto).hexdigest()
+            entrada = _hash(VERSAO_PORTAL, hash_conteudo, hash_segmentos[entidade["segmento"]], hash_regras, entidade["segmento"], entidade["municipio"], entidade["uf"])
+            pagina = os.path.join(pasta_saida, PASTA_ENTIDADES, f"{id_entidade}.html")
+            if registro_anterior.get("entrada") == entrada and os.path.exists(pagina):
+                entidades[id_entidade] = dict(registro_anterior, caminho=entidade["caminho"], assinatura=assinatura)
+                continue
+            if bruto is None: bruto = _ler_bytes(entidade["caminho"])  # critérios ou regras mudaram
+            respostas, meta = separar_meta(compressao.decodificar(bruto, CHAVE_META, os.path.dirname(entidade["caminho"])))
+            estatisticas["lidas"] += 1
+            resumo, conteudo = resumo_e_pagina(entidade, respostas, meta, matriz_completa[entidade["segmento"]], regras)
+        except (OSError, ValueError, compressao.ErroCompressao) as e:
+            estatisticas["falhas"].append((entidade["caminho"], str(e)))
+            continue
+        _gravar(pagina, conteudo)
+        estatisticas["refeitas"] += 1
+        entidades[id_entidade] = {"caminho": entidade["caminho"], "assinatura": assinatura, "conteudo": hash_conteudo, "entrada": entrada, "resumo": resumo}
+
+    for id_entidade in set(anterior) - set(entidades):
+        try:
+            os.remove(os.path.join(pasta_saida, PASTA_ENTIDADES, f"{id_entidade}.html")); estatisticas["removidas"] += 1
+        except FileNotFoundError:
+            pass
+
+    resumos = sorted((registro["resumo"] for registro in entidades.values()), key=lambda r: (-r["indice"], r["nome"]))
+    hash_inicial = _hash(VERSAO_PORTAL, resumos)
+    estatisticas["inicial_refeita"] = manifesto_anterior.get("inicial") != hash_inicial or not os.path.exists(os.path.join(pasta_saida, "index.html"))
+    if estatisticas["inicial_refeita"]:
+        _gravar(os.path.join(pasta_saida, "estilo.css"), ESTILO)
+        _gravar(os.path.join(pasta_saida, ARQUIVO_BUSCA), json.dumps(
+            [{campo: r[campo] for campo in ("id", "nome", "uf", "segmento", "indice", "selo", "pagina", "busca")} for r in resumos],
+            ensure_ascii=False, separators=(",", ":")))
+        _gravar(os.path.join(pasta_saida, "index.html"), pagina_inicial(resumos))
+    _gravar(caminho_manifesto, json.dumps({"versao": VERSAO_PORTAL, "inicial": hash_inicial, "entidades": entidades}, ensure_ascii=False))
+    estatisticas["paginas"] = len(entidades)
+    return estatisticas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera o portal de transparência estático a partir das avaliações.")
+    parser.add_argument("--saida", default=PASTA_PORTAL)
+    parser.add_argument("--pasta", default=PASTA_AVALIACOES)
+    parser.add_argument("--consolidadas", default=PASTA_CONSOLIDADAS)
+    parser.add_argument("--criterios", default=ARQUIVO_CRITERIOS)
+    parser.add_argument("--regras", default=ARQUIVO_REGRAS)
+    parser.add_argument("--completo", action="store_true", help="Ignora o manifesto e refaz todas as páginas.")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    estatisticas = gerar_portal(args.saida, args.pasta, args.consolidadas, args.criterios, args.regras, args.completo)
+    print(f"{estatisticas['paginas']} entidade(s): {estatisticas['refeitas']} página(s) refeita(s), {estatisticas['removidas']} removida(s), "
+          f"{estatisticas['lidas']} avaliação(ões) lida(s), página inicial {'refeita' if estatisticas['inicial_refeita'] else 'sem mudanças'} "
+          f"({time.perf_counter() - inicio:.2f} s).")
+    for caminho, erro in estatisticas["falhas"]:
+        print(f"  Não publicada: {caminho} ({erro})")
+
+
+if __name__ == "__main__":
+    main()
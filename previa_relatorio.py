@@ -0,0 +1,105 @@
+# --- previa_relatorio.py ---
+"""Prévia do relatório em HTML, montada direto das respostas em memória, sem Word e sem conversão para PDF.
+
+Mostra o mesmo conteúdo que relatorio.montar_documento coloca no .docx: a página de rosto (os parágrafos do
+modelo da entidade ou do usuário com os campos preenchidos e, nos modelos de capa "gerada", a capa do sistema), os gráficos (em SVG), as seções com não
+conformidades e a pontuação de cada uma, as "Evidências e Comentários" e, se pedido, o plano de melhoria.
+Os textos vêm de conteudo_relatorio.py, os mesmos do relatório, então a prévia acompanha o documento final.
+
+Uso (no app, a cada alteração das respostas):
+    st.html(html_relatorio(respostas, municipio, segmento, matriz_perguntas, nome_usuario, usuario_config))
+"""
+import html
+from datetime import datetime
+
+from conteudo_relatorio import TEXTO_SEM_NAO_CONFORMIDADES, capa_gerada, introducao_plano, nao_conformidades, pontuacoes_por_secao, preencher_campos_do_modelo, valores_dos_campos
+from graficos import grafico_secoes, grafico_selo
+from modelos_relatorio import ErroModelo, modelo_do_relatorio
+from pontuacao import calcular_indice_e_selo
+from simulador import plano_de_melhoria
+
+ESTILO = """<style>
+.previa{font-family:Calibri,system-ui,sans-serif;color:#222;background:#fff;border:1px solid #ddd;padding:1.5rem 2rem;max-width:820px}
+.previa .capa{text-align:center;border-bottom:2px dashed #ccc;padding-bottom:1rem;margin-bottom:1rem}
+.previa .capa .titulo{font-size:1.6rem;font-weight:bold}.previa .capa .indice{font-size:3rem;font-weight:bold;margin:.5rem 0 0}
+.previa .capa .selo{font-size:1.5rem;font-weight:bold}.previa .capa p.texto{text-align:left}
+.previa h2{font-size:1.35rem}.previa h3{font-size:1.1rem;margin-top:1.5rem}.previa h4{font-size:1rem;margin-bottom:.3rem}
+.previa .nao{color:#f00;font-weight:bold}.previa .plano{border-top:2px dashed #ccc;margin-top:1.5rem}
+.previa ul{margin:.2rem 0 .8rem}.previa .graficos{text-align:center}.previa .graficos svg{max-width:100%;height:auto}
+</style>"""
+
+
+def _e(texto):
+    return html.escape(str(texto))
+
+def _capa(respostas, municipio, segmento, matriz_perguntas, nome_usuario, usuario_config, agora):
+    try:
+        modelo = modelo_do_relatorio(usuario_config, segmento, municipio)
+    except ErroModelo as e:
+        return f"<div class='capa'><p class='nao'>{_e(e)}</p></div>"
+    capa = capa_gerada(respostas, municipio, segmento, matriz_perguntas, nome_usuario, agora)
+    valores = valores_dos_campos(capa, segmento, municipio, nome_usuario, agora)
+    partes = [f"<p class='texto'>{_e(preencher_campos_do_modelo(texto, valores, modelo['campos']))}</p>" for texto in modelo["paragrafos"] if texto.strip()]
+    if modelo["capa"] == "gerada":
+        partes += [f"<div class='titulo'>{_e(capa['titulo'])}</div>",
+                   f"<p><b>{_e(capa['subtitulo'])}<br>{_e(capa['entidade'])}</b></p>",
+                   f"<div class='indice'>{_e(capa['indice'])}</div><div class='selo'>{_e(capa['selo'])}</div>",
+                   f"<p class='texto'>{_e(capa['introducao'])}</p>"]
+        partes += [f"<p class='texto'>{_e(linha)}</p>" for linha in capa["linhas"]]
+    return f"<div class='capa'>{''.join(partes)}</div>"
+
+def _graficos(respostas, matriz_perguntas):
+    resultados = calcular_indice_e_selo(respostas, matriz_perguntas)
+    return (f"<div class='graficos'>{grafico_selo(resultados['indice'], resultados['selo'])}<br>"
+            f"{grafico_secoes(pontuacoes_por_secao(respostas, matriz_perguntas))}</div>")
+
+def _detalhamento(respostas, matriz_perguntas, incluir_graficos):
+    partes = ["<h2>Detalhamento da Avaliação</h2>"]
+    if incluir_graficos:
+        partes.append(_graficos(respostas, matriz_perguntas))
+    secoes = nao_conformidades(respostas, matriz_perguntas)
+    if not secoes:
+        partes.append(f"<p>{_e(TEXTO_SEM_NAO_CONFORMIDADES)}</p>")
+    for secao in secoes:
+        partes.append(f"<h3>{_e(secao['secao'].upper())} - {secao['pontuacao']:.2f}%</h3>")
+        for item in secao["itens"]:
+            partes.append(f"<h4>Item {_e(item['topico'])} - {_e(item['criterio'])} ({_e(item['classificacao'].upper())})</h4><ul>")
+            partes += [f"<li><i>{_e(sub)}:</i> <span class='nao'>Não Atende</span></li>" for sub in item["subcriterios"]]
+            partes.append("</ul>")
+            if item["links"] or item["observacoes"]:
+                partes.append("<b>Evidências e Comentários:</b><ul>")
+                partes += [f"<li>Link: <a href='{_e(link)}' target='_blank'>{_e(link)}</a></li>" for link in item["links"]]
+                partes += [f"<li>Observação ({_e(sub)}): {_e(obs)}</li>" for sub, obs in item["observacoes"]]
+                partes.append("</ul>")
+    return "".join(partes)
+
+def _plano(respostas, matriz_perguntas):
+    plano = plano_de_melhoria(respostas, matriz_perguntas)
+    partes = ["<div class='plano'><h2>Plano de Melhoria</h2>", f"<p>{_e(introducao_plano(plano))}</p>"]
+    for meta in plano['metas']:
+        partes.append(f"<h4>{_e(meta['selo'])} (mínimo de {_e(meta['minimo'])}%)</h4>")
+        if meta['ja_alcancado']:
+            partes.append("<p>Selo já alcançado.</p>")
+            continue
+        partes.append(f"<p>Corrigir {len(meta['itens'])} item(ns) leva o índice a {meta['indice_final']:.2f}%:</p><ul>")
+        partes += [f"<li>Item {_e(item['topico'])} - {_e(item['criterio'])} ({_e(item['classificacao'])}): {_e(', '.join(item['subcriterios_pendentes']))}</li>"
+                   for item in meta['itens']]
+        partes.append("</ul>")
+    if plano['ranking']:
+        partes.append("<h4>Itens pendentes por ganho no índice</h4><ul>")
+        partes += [f"<li>+{item['ganho']:.2f} p.p. - Item {_e(item['topico'])} - {_e(item['criterio'])} ({_e(item['classificacao'])})</li>"
+                   for item in plano['ranking']]
+        partes.append("</ul>")
+    partes.append("</div>")
+    return "".join(partes)
+
+def html_relatorio(respostas, municipio, segmento, matriz_perguntas, nome_usuario, usuario_config, incluir_plano_melhoria=False, agora=None):
+    """HTML (com o estilo embutido) com o conteúdo do relatório .docx das respostas informadas."""
+    agora = agora or datetime.now()
+    partes = [ESTILO, "<div class='previa'>",
+              _capa(respostas, municipio, segmento, matriz_perguntas, nome_usuario, usuario_config, agora),
+              _detalhamento(respostas, matriz_perguntas, usuario_config.get('graficos', True))]
+    if incluir_plano_melhoria:
+        partes.append(_plano(respostas, matriz_perguntas))
+    partes.append("</div>")
+    return "".join(partes)
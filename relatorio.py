@@ -0,0 +1,180 @@
+import gc
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from docx.shared import Cm, Pt, RGBColor
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx2pdf import convert
+
+from conteudo_relatorio import TEXTO_SEM_NAO_CONFORMIDADES, capa_gerada, introducao_plano, nao_conformidades, pontuacoes_por_secao, valores_dos_campos
+from graficos import grafico_secoes, grafico_selo
+from modelos_relatorio import modelo_do_relatorio, preencher_esqueleto
+from nucleo import PASTA_RELATORIOS
+from observabilidade import DURACAO_RELATORIO, FALHAS_CONVERSAO, RELATORIOS, medir
+from pontuacao import calcular_indice_e_selo
+from simulador import plano_de_melhoria
+
+# Geração do relatório Word/PDF, sem dependência do Streamlit: usada pelo app e pelos serviços em lote.
+# Cada fase (montagem, com os gráficos medidos à parte, gravação do .docx e conversão) é medida em
+# axavalia_relatorio_segundos; as falhas de conversão são contadas e registradas no log.
+logger = logging.getLogger(__name__)
+
+# --- ORÇAMENTO DE MEMÓRIA ---
+# Processos de longa duração (app, API, lotes) geram centenas de relatórios. Os objetos do python-docx
+# formam ciclos (pai <-> filho), então a árvore lxml de cada documento só é liberada pelo coletor de
+# ciclos: a geração força a coleta ao terminar. Os processos que geram relatórios são reciclados a cada
+# RELATORIOS_POR_PROCESSO relatórios e os arquivos antigos da pasta de saída são apagados.
+RELATORIOS_POR_PROCESSO = 50
+VALIDADE_RELATORIOS = 24 * 3600  # segundos que um arquivo gerado fica na pasta de saída
+
+def adicionar_graficos(doc, respostas, matriz_perguntas):
+    """Etapa de gráficos: medidor do índice e barras por seção, em PNG, vindos do cache de graficos.py."""
+    resultados = calcular_indice_e_selo(respostas, matriz_perguntas)
+    doc.add_picture(io.BytesIO(grafico_selo(resultados['indice'], resultados['selo'], "png")), width=Cm(8))
+    doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
+    doc.add_picture(io.BytesIO(grafico_secoes(pontuacoes_por_secao(respostas, matriz_perguntas), "png")), width=Cm(16))
+    doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
+    doc.add_paragraph()
+
+# --- FUNÇÃO DE GERAÇÃO DE RELATÓRIO ---
+def montar_documento(respostas, municipio, segmento, matriz_perguntas, tipo_relatorio, nome_usuario, usuario_config, incluir_plano_melhoria=False):
+    """Monta o documento Word do relatório a partir do esqueleto do modelo da entidade ou do usuário (levanta
+    modelos_relatorio.ErroModelo). Campos, página de rosto e título do detalhamento já vêm do esqueleto compilado."""
+    modelo = modelo_do_relatorio(usuario_config, segmento, municipio)
+    agora = datetime.now()
+    capa = capa_gerada(respostas, municipio, segmento, matriz_perguntas, nome_usuario, agora)
+    doc = preencher_esqueleto(modelo, valores_dos_campos(capa, segmento, municipio, nome_usuario, agora), capa)
+
+    # --- PÁGINAS DE DETALHAMENTO ---
+    if usuario_config.get('graficos', True):
+        with medir(DURACAO_RELATORIO, fase="graficos"):
+            adicionar_graficos(doc, respostas, matriz_perguntas)
+
+    secoes_nao_conformes = nao_conformidades(respostas, matriz_perguntas)
+    if not secoes_nao_conformes:
+        doc.add_paragraph(TEXTO_SEM_NAO_CONFORMIDADES)
+        doc.add_paragraph()
+    else:
+        for secao in secoes_nao_conformes:
+            p_secao_titulo = doc.add_paragraph()
+            run_secao_titulo = p_secao_titulo.add_run(f"{secao['secao'].upper()} - {secao['pontuacao']:.2f}%")
+            run_secao_titulo.font.size = Pt(14)
+            run_secao_titulo.bold = True
+            doc.add_paragraph()
+            doc.add_paragraph()
+
+            for item in secao["itens"]:
+                p_item_title = doc.add_paragraph()
+                p_item_title.add_run(f"Item {item['topico']} - {item['criterio']} ({item['classificacao'].upper()})")
+                p_item_title.runs[0].bold = True
+                doc.add_paragraph()
+
+                # --- Lógica de Impressão do Relatório (Apenas "Não Atende") ---
+                for subcriterio in item["subcriterios"]:
+                    p_criterio = doc.add_paragraph()
+                    p_criterio.add_run(f"• {subcriterio}: ").italic = True
+                    run_status = p_criterio.add_run("Não Atende")
+                    run_status.bold = True
+                    run_status.font.color.rgb = RGBColor(0xFF, 0, 0)
+                    doc.add_paragraph()
+
+                if item["links"] or item["observacoes"]:
+                    p_obs_titulo = doc.add_paragraph()
+                    p_obs_titulo.add_run("Evidências e Comentários:").bold = True
+                    for link_url in item["links"]:
+                        p_obs_titulo.add_run(f"\n- Link: {link_url}")
+                    for sub, obs_text in item["observacoes"]:
+                        p_obs_titulo.add_run(f"\n- Observação ({sub}): {obs_text}")
+                    doc.add_paragraph()
+                    doc.add_paragraph()
+
+    # --- PLANO DE MELHORIA (OPCIONAL) ---
+    if incluir_plano_melhoria:
+        plano = plano_de_melhoria(respostas, matriz_perguntas)
+        doc.add_page_break()
+        p_plano = doc.add_paragraph()
+        run_plano = p_plano.add_run("Plano de Melhoria")
+        run_plano.font.size = Pt(18); run_plano.bold = True
+        doc.add_paragraph(introducao_plano(plano))
+
+        for meta in plano['metas']:
+            p_meta = doc.add_paragraph()
+            p_meta.add_run(f"{meta['selo']} (mínimo de {meta['minimo']}%)").bold = True
+            if meta['ja_alcancado']:
+                doc.add_paragraph("Selo já alcançado.")
+                continue
+            doc.add_paragraph(f"Corrigir {len(meta['itens'])} item(ns) leva o índice a {meta['indice_final']:.2f}%:")
+            for item in meta['itens']:
+                doc.add_paragraph(f"• Item {item['topico']} - {item['criterio']} ({item['classificacao']}): {', '.join(item['subcriterios_pendentes'])}")
+
+        if plano['ranking']:
+            doc.add_paragraph()
+            p_ranking = doc.add_paragraph()
+            p_ranking.add_run("Itens pendentes por ganho no índice").bold = True
+            for item in plano['ranking']:
+                doc.add_paragraph(f"• +{item['ganho']:.2f} p.p. - Item {item['topico']} - {item['criterio']} ({item['classificacao']})")
+
+    return doc
+
+def salvar_e_converter(doc, segmento, municipio, pasta_saida=PASTA_RELATORIOS):
+    """Salva o DOCX e tenta convertê-lo para PDF. Devolve (path_docx, path_pdf, erro_conversao):
+    com sucesso o DOCX é apagado e volta como None; se a conversão falhar, o PDF volta como None."""
+    os.makedirs(pasta_saida, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    nome_base = f"Relatorio_Final_{segmento.replace(' ', '')}_{municipio.replace(' ', '')}_{timestamp}"
+    path_docx = os.path.join(pasta_saida, f"{nome_base}.docx"); path_pdf = os.path.join(pasta_saida, f"{nome_base}.pdf")
+    with medir(DURACAO_RELATORIO, fase="gravacao"):
+        doc.save(path_docx)
+    try:
+        with medir(DURACAO_RELATORIO, fase="conversao"):
+            convert(path_docx, path_pdf)
+        os.remove(path_docx)
+        return None, path_pdf, None
+    except Exception as e:
+        FALHAS_CONVERSAO.inc()
+        logger.warning("conversao_pdf_falhou", extra={"arquivo": path_docx, "erro": str(e)})
+        return path_docx, None, e
+
+def gerar_relatorio_novo_modelo(respostas, municipio, segmento, matriz_perguntas, tipo_relatorio, nome_usuario, usuario_config, incluir_plano_melhoria=False, pasta_saida=PASTA_RELATORIOS):
+    """Gera o relatório completo (DOCX e, se possível, PDF). Devolve (path_docx, path_pdf, erro_conversao)."""
+    inicio, doc = time.perf_counter(), None
+    try:
+        with medir(DURACAO_RELATORIO, fase="montagem"):
+            doc = montar_documento(respostas, municipio, segmento, matriz_perguntas, tipo_relatorio, nome_usuario, usuario_config, incluir_plano_melhoria)
+        path_docx, path_pdf, erro_conversao = salvar_e_converter(doc, segmento, municipio, pasta_saida)
+    except Exception as e:
+        RELATORIOS.inc(resultado="erro")
+        logger.error("relatorio_com_erro", extra={"segmento": segmento, "municipio": municipio, "erro": f"{type(e).__name__}: {e}"})
+        raise
+    finally:
+        del doc
+        gc.collect()
+    duracao = time.perf_counter() - inicio
+    RELATORIOS.inc(resultado="pdf" if path_pdf else "docx")
+    DURACAO_RELATORIO.observar(duracao, fase="total")
+    logger.info("relatorio_gerado", extra={"segmento": segmento, "municipio": municipio, "formato": "pdf" if path_pdf else "docx",
+                                           "duracao_ms": round(duracao * 1000, 1)})
+    return path_docx, path_pdf, erro_conversao
+
+def limpar_relatorios_antigos(pasta_saida=PASTA_RELATORIOS, idade_maxima=VALIDADE_RELATORIOS):
+    """Apaga os arquivos da pasta de saída mais antigos que idade_maxima (segundos). Devolve quantos apagou."""
+    if not os.path.isdir(pasta_saida): return 0
+    limite, apagados = time.time() - idade_maxima, 0
+    for entrada in os.scandir(pasta_saida):
+        try:
+            if entrada.is_file() and entrada.stat().st_mtime < limite:
+                os.remove(entrada.path); apagados += 1
+        except OSError:
+            pass  # arquivo em uso ou já removido por outro processo
+    return apagados
+
+def criar_pool_relatorios(processos=None, relatorios_por_processo=RELATORIOS_POR_PROCESSO, initializer=None, initargs=()):
+    """Pool de processos para relatórios, com cada processo reciclado após relatorios_por_processo relatórios."""
+    # max_tasks_per_child exige processos criados por "spawn" (não por "fork").
+    return ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn"),
+                               max_tasks_per_child=relatorios_por_processo, initializer=initializer, initargs=initargs)
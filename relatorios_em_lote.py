@@ -0,0 +1,270 @@
+# --- relatorios_em_lote.py ---
+"""Gera relatórios em lote (centenas por execução) com orçamento de memória explícito.
+
+- Os relatórios são gerados em um pool de processos; cada processo é reciclado após --por-processo
+  relatórios e, se um processo passar de --orcamento-mb de memória residente, o pool inteiro é
+  trocado assim que os relatórios em andamento terminam.
+- Poucas tarefas ficam em andamento por vez (2 por processo), então o lote não acumula respostas
+  nem resultados em memória: as avaliações são lidas do disco pelo próprio processo que gera o relatório.
+- Cada relatório é medido com tracemalloc: pico de alocação durante a geração, memória Python que
+  continua retida depois dela e memória residente do processo.
+
+Com --verificar-memoria N são gerados N relatórios sintéticos (em uma pasta temporária) e o script
+falha (código de saída 1) se a memória retida ou a residente de um mesmo processo crescer mais que
+--tolerancia-mb entre o início e o fim do lote. Na verificação os processos não são reciclados
+(--por-processo e --orcamento-mb são ignorados), senão um vazamento nunca apareceria. É a verificação
+de regressão de memória da geração de relatórios (também em tests/test_relatorios_em_lote.py).
+
+Uso:
+    python relatorios_em_lote.py --pasta data/avaliacoes --saida relatorios/lote
+    python relatorios_em_lote.py --verificar-memoria 500
+"""
+import argparse
+import csv
+import gc
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import yaml
+from yaml.loader import SafeLoader
+
+from nucleo import (
+    ARQUIVO_CRITERIOS, CHAVE_MUNICIPIOS, PASTA_AVALIACOES, PASTA_RELATORIOS, carregar_avaliacao, carregar_criterios,
+    chave_resposta, iterar_itens, listar_arquivos_avaliacao, resolver_entidade, segmentos,
+)
+from observabilidade import configurar_logs, incorporar_observacoes, retirar_observacoes
+from pontuacao import calcular_indice_e_selo
+from relatorio import RELATORIOS_POR_PROCESSO, criar_pool_relatorios, gerar_relatorio_novo_modelo
+
+try:
+    import psutil
+except ImportError:  # psutil é opcional: sem ele a memória residente vem de /proc (Linux) ou de ru_maxrss
+    psutil = None
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ARQUIVO_CONFIG = "config.yaml"
+PASTA_LOTE = os.path.join(PASTA_RELATORIOS, "lote")
+TAREFAS_POR_PROCESSO = 2  # tarefas em andamento por processo do pool
+
+# Estado de cada processo do pool (preenchido por _inicializar_worker).
+_MATRIZ = None
+
+
+def memoria_residente_mb():
+    """Memória residente atual do processo, em MB."""
+    if psutil:
+        return psutil.Process().memory_info().rss / 2**20
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource:
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo / 2**20 if sys.platform == "darwin" else maximo / 1024
+    return 0.0
+
+
+def _inicializar_worker(arquivo_criterios):
+    global _MATRIZ
+    _MATRIZ = carregar_criterios(arquivo_criterios)
+    configurar_logs()
+    tracemalloc.start()
+
+
+def _gerar_medindo(tarefa):
+    """Roda em um processo do pool: gera um relatório e mede a memória usada na geração."""
+    tracemalloc.reset_peak()
+    inicio = time.perf_counter()
+    resultado = {c: tarefa.get(c, "") for c in ("segmento", "municipio", "avaliador", "caminho")}
+    resultado.update(indice="", selo="")
+    try:
+        respostas = tarefa["respostas"] if "respostas" in tarefa else carregar_avaliacao(tarefa["caminho"])
+        indice_e_selo = calcular_indice_e_selo(respostas, _MATRIZ[tarefa["segmento"]])
+        resultado.update(indice=round(indice_e_selo["indice"], 2), selo=indice_e_selo["selo"])
+        path_docx, path_pdf, erro = gerar_relatorio_novo_modelo(
+            respostas, tarefa["municipio"], tarefa["segmento"], _MATRIZ[tarefa["segmento"]],
+            tarefa.get("tipo_relatorio", "Apenas Não Conformidades"), tarefa["nome_usuario"], tarefa["usuario_config"],
+            tarefa.get("incluir_plano_melhoria", False), tarefa["pasta_saida"])
+        del respostas
+        resultado.update(arquivo=path_pdf or path_docx, aviso=str(erro) if erro else "", falha="")
+    except Exception as e:
+        resultado.update(arquivo="", aviso="", falha=f"{type(e).__name__}: {e}")
+    gc.collect()
+    retido, pico = tracemalloc.get_traced_memory()
+    resultado.update(segundos=round(time.perf_counter() - inicio, 3), pid=os.getpid(),
+                     pico_mb=round(pico / 2**20, 2), retido_mb=round(retido / 2**20, 2),
+                     rss_mb=round(memoria_residente_mb(), 2))
+    resultado["metricas"] = retirar_observacoes()  # incorporadas às métricas do processo principal por gerar_em_lote
+    return resultado
+
+
+def gerar_em_lote(tarefas, arquivo_criterios=ARQUIVO_CRITERIOS, processos=None,
+                  relatorios_por_processo=RELATORIOS_POR_PROCESSO, orcamento_mb=None):
+    """Gera os relatórios das tarefas em paralelo, devolvendo (yield) um resultado por relatório na ordem de conclusão."""
+    processos = processos or os.cpu_count() or 1
+    tarefas = iter(tarefas)
+
+    def novo_pool():
+        return criar_pool_relatorios(processos, relatorios_por_processo or None, _inicializar_worker, (arquivo_criterios,))
+
+    pool, pendentes, esgotadas = novo_pool(), set(), False
+    try:
+        while True:
+            while not esgotadas and len(pendentes) < processos * TAREFAS_POR_PROCESSO:
+                tarefa = next(tarefas, None)
+                if tarefa is None: esgotadas = True
+                else: pendentes.add(pool.submit(_gerar_medindo, tarefa))
+            if not pendentes: break
+            concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            acima_do_orcamento = False
+            for futuro in concluidos:
+                resultado = futuro.result()
+                incorporar_observacoes(resultado.pop("metricas", None))
+                acima_do_orcamento |= bool(orcamento_mb and resultado["rss_mb"] > orcamento_mb)
+                yield resultado
+            if acima_do_orcamento:
+                # Termina o que está em andamento e troca todos os processos antes de continuar.
+                for futuro in wait(pendentes).done:
+                    resultado = futuro.result()
+                    incorporar_observacoes(resultado.pop("metricas", None))
+                    yield resultado
+                pendentes = set()
+                pool.shutdown()
+                pool = novo_pool()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def tarefas_da_pasta(matriz_completa, config, pasta=PASTA_AVALIACOES, pasta_saida=PASTA_LOTE, usuario_padrao="", selecao=None, **opcoes):
+    """Uma tarefa por avaliação salva (ou só pelas de `selecao`, caminhos de arquivo); o modelo do relatório
+    é o do avaliador (ou o de usuario_padrao)."""
+    usuarios = config.get("credentials", {}).get("usernames", {})
+    selecao = None if selecao is None else {os.path.normpath(caminho) for caminho in selecao}
+    for caminho, segmento, municipio, usuario in listar_arquivos_avaliacao(pasta):
+        if selecao is not None and os.path.normpath(caminho) not in selecao: continue
+        segmento, municipio = resolver_entidade(matriz_completa, segmento, municipio)
+        if segmento not in matriz_completa: continue
+        usuario_config = usuarios.get(usuario) or usuarios.get(usuario_padrao) or {}
+        yield dict(opcoes, caminho=caminho, segmento=segmento, municipio=municipio, avaliador=usuario,
+                   nome_usuario=usuario_config.get("name", usuario or usuario_padrao), usuario_config=usuario_config,
+                   pasta_saida=pasta_saida)
+
+
+def respostas_sinteticas(matriz_perguntas, semente):
+    """Avaliação aleatória (reprodutível pela semente) com não conformidades, observações e links."""
+    aleatorio = random.Random(semente)
+    respostas = {}
+    for secao, item in iterar_itens(matriz_perguntas):
+        for sub in item["subcriterios"]:
+            chave = chave_resposta(secao, item["criterio"], sub)
+            respostas[chave] = "Não Atende" if aleatorio.random() < 0.3 else "Atende"
+            if respostas[chave] == "Não Atende":
+                respostas[f"{chave}_obs"] = f"Observação sintética {semente}-{aleatorio.randint(0, 10**6)}"
+        if aleatorio.random() < 0.3:
+            respostas[chave_resposta(secao, item["criterio"], "links")] = [
+                f"https://transparencia.exemplo/{semente}/{n}" for n in range(aleatorio.randint(1, 3))]
+    return respostas
+
+
+def _mediana_da_janela(valores, inicio, fim):
+    janela = valores[int(len(valores) * inicio):max(int(len(valores) * fim), int(len(valores) * inicio) + 1)]
+    return statistics.median(janela) if janela else 0.0
+
+
+def verificar_memoria(quantidade, arquivo_criterios=ARQUIVO_CRITERIOS, processos=1, tolerancia_mb=20.0):
+    """Gera `quantidade` relatórios sintéticos sem reciclar os processos e compara a memória do início (10%-20%)
+    e do fim (últimos 10%) dos relatórios do processo que mais gerou, que viveu o lote inteiro."""
+    matriz_completa = carregar_criterios(arquivo_criterios)
+    lista_segmentos, municipios = segmentos(matriz_completa), sorted(matriz_completa.get(CHAVE_MUNICIPIOS, ["Teste"]))
+    pasta = tempfile.mkdtemp(prefix="relatorios_memoria_")
+    tarefas = ({"segmento": lista_segmentos[n % len(lista_segmentos)], "municipio": municipios[n % len(municipios)],
+                "respostas": respostas_sinteticas(matriz_completa[lista_segmentos[n % len(lista_segmentos)]], n),
+                "nome_usuario": "Verificação de memória", "usuario_config": {"template": "padrao"},
+                "incluir_plano_melhoria": n % 2 == 0, "pasta_saida": pasta} for n in range(quantidade))
+    resultados = []
+    try:
+        for resultado in gerar_em_lote(tarefas, arquivo_criterios, processos, relatorios_por_processo=0):
+            if resultado["arquivo"] and os.path.exists(resultado["arquivo"]): os.remove(resultado["arquivo"])
+            resultados.append(resultado)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    resumo = {"relatorios": len(resultados), "falhas": sum(1 for r in resultados if r["falha"])}
+    por_pid = {}
+    for resultado in resultados:
+        por_pid.setdefault(resultado["pid"], []).append(resultado)
+    do_processo = max(por_pid.values(), key=len, default=[])
+    resumo["relatorios_do_processo"] = len(do_processo)
+    for medida in ("retido_mb", "rss_mb"):
+        valores = [r[medida] for r in do_processo]
+        resumo[f"{medida}_inicio"] = _mediana_da_janela(valores, 0.1, 0.2)
+        resumo[f"{medida}_fim"] = _mediana_da_janela(valores, 0.9, 1.0)
+        resumo[f"crescimento_{medida}"] = resumo[f"{medida}_fim"] - resumo[f"{medida}_inicio"]
+    resumo["pico_mb_mediano"] = statistics.median(r["pico_mb"] for r in resultados) if resultados else 0.0
+    resumo["ok"] = (resumo["falhas"] == 0 and resumo["crescimento_retido_mb"] <= tolerancia_mb
+                    and resumo["crescimento_rss_mb"] <= tolerancia_mb)
+    return resumo, resultados
+
+
+def salvar_resultados(resultados, caminho):
+    with open(caminho, 'w', encoding='utf-8-sig', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=list(resultados[0]) if resultados else ["segmento"], delimiter=";")
+        escritor.writeheader(); escritor.writerows(resultados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera relatórios em lote com orçamento de memória.")
+    parser.add_argument("--pasta", default=PASTA_AVALIACOES, help="Pasta das avaliações salvas.")
+    parser.add_argument("--saida", default=PASTA_LOTE, help="Pasta onde os relatórios são gravados.")
+    parser.add_argument("--usuario", default="", help="Usuário de config.yaml cujo modelo é usado nas avaliações sem avaliador.")
+    parser.add_argument("--tipo", default="Apenas Não Conformidades", choices=("Apenas Não Conformidades", "Relatório Completo"))
+    parser.add_argument("--plano", action="store_true", help="Inclui o plano de melhoria nos relatórios.")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--por-processo", type=int, default=RELATORIOS_POR_PROCESSO,
+                        help="Relatórios por processo antes de reciclá-lo (0 = nunca reciclar).")
+    parser.add_argument("--orcamento-mb", type=float, default=None, help="Memória residente máxima por processo antes de trocar o pool.")
+    parser.add_argument("--resultados", default="relatorios_em_lote.csv", help="CSV com o resultado e a memória de cada relatório.")
+    parser.add_argument("--criterios", default=ARQUIVO_CRITERIOS)
+    parser.add_argument("--config", default=ARQUIVO_CONFIG)
+    parser.add_argument("--verificar-memoria", type=int, metavar="N", help="Gera N relatórios sintéticos e verifica se a memória fica estável.")
+    parser.add_argument("--tolerancia-mb", type=float, default=20.0, help="Crescimento de memória aceito na verificação.")
+    args = parser.parse_args()
+    configurar_logs()
+
+    if args.verificar_memoria:
+        resumo, resultados = verificar_memoria(args.verificar_memoria, args.criterios, args.processos or 1, args.tolerancia_mb)
+        salvar_resultados(resultados, args.resultados)
+        print(f"{resumo['relatorios']} relatório(s) sintético(s), {resumo['falhas']} falha(s), pico mediano {resumo['pico_mb_mediano']:.1f} MB; "
+              f"{resumo['relatorios_do_processo']} no processo comparado.")
+        print(f"Memória retida: {resumo['retido_mb_inicio']:.1f} -> {resumo['retido_mb_fim']:.1f} MB; "
+              f"residente: {resumo['rss_mb_inicio']:.1f} -> {resumo['rss_mb_fim']:.1f} MB (tolerância {args.tolerancia_mb:g} MB).")
+        print("Memória estável." if resumo["ok"] else "FALHA: a memória cresceu ao longo do lote.")
+        sys.exit(0 if resumo["ok"] else 1)
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.load(f, Loader=SafeLoader)
+    matriz_completa = carregar_criterios(args.criterios)
+    os.makedirs(args.saida, exist_ok=True)
+    tarefas = tarefas_da_pasta(matriz_completa, config, args.pasta, args.saida, args.usuario,
+                               tipo_relatorio=args.tipo, incluir_plano_melhoria=args.plano)
+    resultados = list(gerar_em_lote(tarefas, args.criterios, args.processos, args.por_processo, args.orcamento_mb))
+    salvar_resultados(resultados, args.resultados)
+    falhas = [r for r in resultados if r["falha"]]
+    print(f"{len(resultados)} relatório(s) gerado(s) em '{args.saida}', {len(falhas)} falha(s), "
+          f"pico máximo {max((r['pico_mb'] for r in resultados), default=0):.1f} MB por relatório.")
+    print(f"Detalhes em: {args.resultados}")
+
+
+if __name__ == "__main__":
+    main()
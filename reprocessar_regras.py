@@ -0,0 +1,100 @@
+# --- reprocessar_regras.py ---
+"""Reprocessa todas as avaliações salvas sob um conjunto de regras candidato e lista as mudanças de selo.
+
+A matriz de atendimento (avaliações x itens) é montada uma vez por segmento; cada conjunto de regras
+é aplicado a ela em uma única passada vetorizada (numpy), sem recalcular avaliação por avaliação.
+
+Uso:
+    python reprocessar_regras.py regras_2026.json
+    python reprocessar_regras.py regras_2026.json --base regras_pontuacao.json --saida mudancas.csv --todas
+"""
+import argparse
+import csv
+from collections import Counter
+
+import numpy as np
+
+from nucleo import (
+    ARQUIVO_CRITERIOS, PASTA_AVALIACOES, carregar_avaliacao_com_meta, carregar_criterios,
+    listar_arquivos_avaliacao, resolver_entidade,
+)
+from pontuacao import ARQUIVO_REGRAS, carregar_regras
+from simulador import estrutura_segmento, matriz_atendimento
+
+
+def selos_vetorizados(indices, cumpre_essenciais, regras):
+    """Aplica a tabela de decisão das regras a vetores de índice e de "exigência de essenciais cumprida"."""
+    selos = np.empty(len(indices), dtype=object)
+    for cumpre in (True, False):
+        faixas = regras["tabela"][cumpre][::-1]  # ordem crescente de mínimo
+        minimos = np.array([minimo for minimo, _ in faixas])
+        nomes = np.array([nome for _, nome in faixas], dtype=object)
+        posicoes = np.clip(np.searchsorted(minimos, indices, side="right") - 1, 0, None)
+        selecionados = cumpre_essenciais == cumpre
+        selos[selecionados] = nomes[posicoes[selecionados]]
+    selos[indices <= 0] = regras["sem_pontuacao"]
+    return selos
+
+
+def pontuar_lote(atende, matriz_perguntas, regras):
+    """Índice, percentual de essenciais e selo de todas as linhas da matriz de atendimento."""
+    estrutura = estrutura_segmento(matriz_perguntas, regras)
+    pesos, essencial = estrutura["pesos"], estrutura["essencial"]
+    indices = atende @ pesos / pesos.sum() * 100 if pesos.sum() > 0 else np.zeros(len(atende))
+    total_essenciais = essencial.sum()
+    percentual = (atende & essencial).sum(axis=1) / total_essenciais * 100 if total_essenciais else np.full(len(atende), 100.0)
+    return indices, percentual, selos_vetorizados(indices, percentual >= regras["percentual_essenciais_exigido"], regras)
+
+
+def reprocessar(matriz_completa, regras_base, regras_candidatas, pasta=PASTA_AVALIACOES):
+    """Pontua todas as avaliações da pasta sob as duas regras. Devolve uma linha (dicionário) por avaliação."""
+    por_segmento = {}
+    for caminho, segmento, municipio, usuario in listar_arquivos_avaliacao(pasta):
+        segmento, municipio = resolver_entidade(matriz_completa, segmento, municipio)
+        if segmento not in matriz_completa: continue
+        respostas, meta = carregar_avaliacao_com_meta(caminho)
+        por_segmento.setdefault(segmento, []).append((municipio, usuario, meta.get("regras", ""), respostas))
+
+    linhas = []
+    for segmento, avaliacoes in sorted(por_segmento.items()):
+        matriz_perguntas = matriz_completa[segmento]
+        atende = matriz_atendimento([r for *_, r in avaliacoes], estrutura_segmento(matriz_perguntas, regras_base))
+        indices_base, _, selos_base = pontuar_lote(atende, matriz_perguntas, regras_base)
+        indices_cand, _, selos_cand = pontuar_lote(atende, matriz_perguntas, regras_candidatas)
+        for n, (municipio, usuario, regras_registradas, _) in enumerate(avaliacoes):
+            linhas.append({
+                "segmento": segmento, "municipio": municipio, "avaliador": usuario,
+                "regras_registradas": regras_registradas,
+                "indice_base": round(float(indices_base[n]), 2), "selo_base": selos_base[n],
+                "indice_candidato": round(float(indices_cand[n]), 2), "selo_candidato": selos_cand[n],
+                "mudou": selos_base[n] != selos_cand[n],
+            })
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocessa as avaliações sob regras candidatas e mostra as mudanças de selo.")
+    parser.add_argument("candidatas", help="Arquivo de regras candidato (mesmo formato de regras_pontuacao.json).")
+    parser.add_argument("--base", default=ARQUIVO_REGRAS, help="Regras de comparação (padrão: as vigentes).")
+    parser.add_argument("--pasta", default=PASTA_AVALIACOES)
+    parser.add_argument("--criterios", default=ARQUIVO_CRITERIOS)
+    parser.add_argument("--saida", default="reprocessamento_regras.csv")
+    parser.add_argument("--todas", action="store_true", help="Inclui no CSV também as avaliações sem mudança de selo.")
+    args = parser.parse_args()
+
+    regras_base, regras_candidatas = carregar_regras(args.base), carregar_regras(args.candidatas)
+    linhas = reprocessar(carregar_criterios(args.criterios), regras_base, regras_candidatas, args.pasta)
+    selecionadas = linhas if args.todas else [l for l in linhas if l["mudou"]]
+    with open(args.saida, 'w', encoding='utf-8-sig', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=list(linhas[0]) if linhas else ["segmento"], delimiter=";")
+        escritor.writeheader(); escritor.writerows(selecionadas)
+
+    mudancas = Counter((l["selo_base"], l["selo_candidato"]) for l in linhas if l["mudou"])
+    print(f"Regras {regras_base['versao']} -> {regras_candidatas['versao']}: {len(linhas)} avaliação(ões), {sum(mudancas.values())} mudança(s) de selo.")
+    for (antes, depois), quantidade in mudancas.most_common():
+        print(f"  {antes} -> {depois}: {quantidade}")
+    print(f"Detalhes em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# --- simulador.py ---
+"""Simulador "e se": quais itens corrigir primeiro para alcançar cada selo.
+
+Para uma avaliação, calcula o menor conjunto de itens não atendidos que leva a cada selo
+(Prata, Ouro, Diamante), sempre incluindo todos os essenciais pendentes, e ordena os demais
+itens pelo ganho marginal no índice. O cálculo é vetorizado (numpy) para rodar sobre todas as
+avaliações de uma vez na visão de carteira.
+
+Uso:
+    python simulador.py                          # carteira de data/avaliacoes
+    python simulador.py --saida carteira.csv
+"""
+import argparse
+import csv
+
+import numpy as np
+
+from nucleo import (
+    ARQUIVO_CRITERIOS, PASTA_AVALIACOES, carregar_avaliacao, carregar_criterios, iterar_itens,
+    listar_arquivos_avaliacao, resolver_entidade,
+)
+from pontuacao import calcular_indice_e_selo, peso_item, regras_vigentes
+
+# Tolerância para comparações de ponto flutuante ao somar pesos.
+EPSILON = 1e-9
+
+
+def estrutura_segmento(matriz_perguntas, regras=None):
+    """Lista os itens do segmento e os vetores de peso e de "é essencial"."""
+    regras = regras or regras_vigentes()
+    itens = list(iterar_itens(matriz_perguntas))
+    classificacoes_pesos = [peso_item(item, regras) for _, item in itens]
+    return {
+        "itens": itens,
+        "pesos": np.array([peso for _, peso in classificacoes_pesos]),
+        "essencial": np.array([c == "ESSENCIAL" for c, _ in classificacoes_pesos]),
+    }
+
+
+def matriz_atendimento(lista_respostas, estrutura):
+    """Matriz booleana (avaliações x itens): True quando o item é atendido."""
+    chaves = [[f"{secao}_{item['criterio']}_{sub}" for sub in item["subcriterios"]] for secao, item in estrutura["itens"]]
+    return np.array([[not any(r.get(c) == "Não Atende" for c in chaves_item) for chaves_item in chaves] for r in lista_respostas],
+                    dtype=bool).reshape(len(lista_respostas), len(chaves))
+
+
+def simular_carteira(lista_respostas, matriz_perguntas, regras=None):
+    """Para várias avaliações do mesmo segmento, devolve índice atual, essenciais pendentes e,
+    para cada selo, quantos itens precisam ser corrigidos (essenciais incluídos)."""
+    regras = regras or regras_vigentes()
+    estrutura = estrutura_segmento(matriz_perguntas, regras)
+    atende = matriz_atendimento(lista_respostas, estrutura)
+    pesos, essencial = estrutura["pesos"], estrutura["essencial"]
+    total = pesos.sum()
+
+    pontos = atende @ pesos
+    pendentes_essenciais = (~atende & essencial).sum(axis=1)
+    pontos_com_essenciais = pontos + (~atende & essencial) @ pesos
+
+    # Ganhos disponíveis fora os essenciais, em ordem decrescente, e seu acumulado por avaliação.
+    ganhos = np.where(~atende & ~essencial, pesos, 0.0)
+    acumulado = np.cumsum(-np.sort(-ganhos, axis=1), axis=1)
+
+    resultado = {"indice": pontos / total * 100, "essenciais_pendentes": pendentes_essenciais, "itens_por_selo": {}}
+    for minimo, nome in regras["selos"]:
+        falta = minimo / 100 * total - pontos_com_essenciais
+        extras = (acumulado < falta[:, None] - EPSILON).sum(axis=1) + 1
+        extras = np.where(falta <= EPSILON, 0, extras)
+        resultado["itens_por_selo"][nome] = np.where(extras > ganhos.shape[1], -1, extras + pendentes_essenciais)
+    return resultado
+
+
+def plano_de_melhoria(respostas, matriz_perguntas, regras=None):
+    """Plano para uma avaliação: metas por selo (itens mínimos) e ranking dos itens pendentes por ganho."""
+    regras = regras or regras_vigentes()
+    estrutura = estrutura_segmento(matriz_perguntas, regras)
+    atende = matriz_atendimento([respostas], estrutura)[0]
+    pesos, essencial = estrutura["pesos"], estrutura["essencial"]
+    total = pesos.sum()
+
+    def descrever(i):
+        secao, item = estrutura["itens"][i]
+        pendentes = [sub for sub in item["subcriterios"] if respostas.get(f"{secao}_{item['criterio']}_{sub}") == "Não Atende"]
+        return {"secao": secao, "topico": item["topico"], "criterio": item["criterio"],
+                "classificacao": item.get("classificacao", "").upper(), "ganho": pesos[i] / total * 100,
+                "subcriterios_pendentes": pendentes}
+
+    pendentes = np.flatnonzero(~atende)
+    # Maior ganho primeiro; no empate, o item com menos subcritérios a corrigir.
+    ordem = sorted(pendentes, key=lambda i: (-pesos[i], len(descrever(i)["subcriterios_pendentes"])))
+    ranking = [descrever(i) for i in ordem]
+
+    essenciais = [i for i in ordem if essencial[i]]
+    demais = [i for i in ordem if not essencial[i]]
+    pontos_base = atende @ pesos + pesos[essenciais].sum()
+    metas = []
+    for minimo, nome in reversed(regras["selos"]):
+        escolhidos, pontos = list(essenciais), pontos_base
+        for i in demais:
+            if pontos >= minimo / 100 * total - EPSILON: break
+            escolhidos.append(i); pontos += pesos[i]
+        metas.append({"selo": nome, "minimo": f"{minimo:g}", "indice_final": pontos / total * 100,
+                      "ja_alcancado": not escolhidos, "itens": [descrever(i) for i in escolhidos]})
+
+    atual = calcular_indice_e_selo(respostas, matriz_perguntas, regras)
+    return {"indice": atual["indice"], "selo": atual["selo"], "metas": metas, "ranking": ranking}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Visão de carteira: itens a corrigir para cada selo, por avaliação.")
+    parser.add_argument("--pasta", default=PASTA_AVALIACOES)
+    parser.add_argument("--criterios", default=ARQUIVO_CRITERIOS)
+    parser.add_argument("--saida", help="Grava a tabela em CSV em vez de imprimir.")
+    args = parser.parse_args()
+
+    matriz_completa = carregar_criterios(args.criterios)
+    por_segmento = {}
+    for caminho, segmento, municipio, usuario in listar_arquivos_avaliacao(args.pasta):
+        segmento, municipio = resolver_entidade(matriz_completa, segmento, municipio)
+        if segmento in matriz_completa:
+            por_segmento.setdefault(segmento, []).append((municipio, usuario, carregar_avaliacao(caminho)))
+
+    selos = [nome for _, nome in regras_vigentes()["selos"]]
+    linhas = [["segmento", "municipio", "avaliador", "indice", "essenciais_pendentes"] + [f"itens_para_{s.split()[-1].lower()}" for s in selos]]
+    for segmento, avaliacoes in sorted(por_segmento.items()):
+        resultado = simular_carteira([r for _, _, r in avaliacoes], matriz_completa[segmento])
+        for n, (municipio, usuario, _) in enumerate(avaliacoes):
+            linhas.append([segmento, municipio, usuario, f"{resultado['indice'][n]:.2f}", int(resultado["essenciais_pendentes"][n])]
+                          + [int(resultado["itens_por_selo"][s][n]) for s in selos])
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8-sig', newline='') as f:
+            csv.writer(f, delimiter=";").writerows(linhas)
+        print(f"{len(linhas) - 1} avaliação(ões) gravada(s) em {args.saida}")
+    else:
+        for linha in linhas: print(" | ".join(str(c) for c in linha))
+
+
+if __name__ == "__main__":
+    main()
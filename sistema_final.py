@@ -1,311 +1,441 @@
 import streamlit as st
+import copy
 import json
+import logging
 import os
+import uuid
 from datetime import datetime, timedelta
-import docx
-from docx.shared import Pt, RGBColor, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.section import WD_ORIENT
-
-from docx2pdf import convert
 import streamlit_authenticator as stauth
 import yaml
 from yaml.loader import SafeLoader
 
+from nucleo import (
+    ARQUIVO_CRITERIOS, PASTA_AVALIACOES, PASTA_RELATORIOS, STATUS_VALIDOS, ConflitoDeVersao, ErroCriterios, assinatura_arquivo,
+    caminho_avaliacao, carregar_avaliacao, carregar_avaliacao_com_meta, carregar_criterios_validados, consultar_indice, copiar_respostas,
+    listar_arquivos_avaliacao, listar_ciclos_anteriores, mapear_itens_comuns, marcar_todos, mesclar_tres_vias, nome_arquivo_avaliacao,
+    resolver_entidade, salvar_avaliacao, segmentos, versao_criterios,
+)
+from pontuacao import calcular_indice_e_selo
+from simulador import plano_de_melhoria
+from relatorio import gerar_relatorio_novo_modelo, limpar_relatorios_antigos
+from modelos_relatorio import ErroModelo, modelos_vigentes
+from previa_relatorio import html_relatorio
+from graficos import grafico_secoes, grafico_selo
+from conteudo_relatorio import pontuacoes_por_secao
+from backup_avaliacoes import agendar_backup
+from municipios import UF_PADRAO, buscar_municipios, carregar_catalogo, codigo_municipio, municipios_da_uf, ufs_disponiveis
+from interface_avaliacao import concluir_alteracao_em_lote, renderizar_secoes
+from pacotes import ErroPacote, comparar_com_servidor, ler_pacote, montar_pacote, nome_pacote, resolver_conflitos, serializar_pacote
+from coletanea_relatorios import FORMATOS, TITULO_PADRAO, ErroColetanea, gerar_coletanea, rotulo_entidade
+from relatorios_em_lote import tarefas_da_pasta
+from consolidar_avaliacoes import PASTA_CONSOLIDADAS, POLITICAS, USUARIO_CONSOLIDADO, agrupar_por_entidade, consolidar, rotulo_usuario
+from observabilidade import AVALIACOES_ATIVAS, PORTA_METRICAS, SALVAMENTOS_AUTOMATICOS, configurar_logs, iniciar_servidor_metricas
+
 # --- CONFIGURAÇÕES E INICIALIZAÇÃO ---
+configurar_logs()
+logger = logging.getLogger("sistema_final")
 if not os.path.exists("data/avaliacoes"):
     os.makedirs("data/avaliacoes")
 if not os.path.exists("relatorios"):
     os.makedirs("relatorios")
+MAXIMO_MINHAS_AVALIACOES = 15  # itens de "Minhas avaliações" na barra lateral
 
 # --- FUNÇÕES AUXILIARES ---
-@st.cache_data
-def carregar_criterios_do_arquivo(caminho_arquivo="criterios_por_topico.json"):
-    """Carrega os critérios de avaliação e a lista de municípios do arquivo JSON."""
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _criterios_da_versao(caminho_arquivo, assinatura):
+    """Uma entrada por versão do arquivo (mtime/tamanho): regravar o arquivo carrega a nova versão sem reiniciar o servidor."""
+    return carregar_criterios_validados(caminho_arquivo)
+
+@st.cache_resource
+def _ultima_versao_valida():
+    """Versão mais recente que passou na validação, compartilhada entre as sessões."""
+    return {}
+
+def carregar_criterios_do_arquivo(caminho_arquivo=ARQUIVO_CRITERIOS):
+    """Carrega os critérios de avaliação e a lista de municípios do arquivo JSON.
+
+    A matriz é compartilhada (somente leitura) entre as sessões; cada sessão continua com a versão
+    com que começou até o avaliador optar pela nova. Um arquivo inválido não substitui a última versão válida.
+    """
+    ultima = _ultima_versao_valida()
     try:
-        with open(caminho_arquivo, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        ultima["matriz"] = _criterios_da_versao(caminho_arquivo, assinatura_arquivo(caminho_arquivo))
     except FileNotFoundError:
         st.error(f"ERRO: O arquivo de dados '{caminho_arquivo}' não foi encontrado.")
-        return None
     except json.JSONDecodeError:
         st.error(f"ERRO: O arquivo '{caminho_arquivo}' contém um erro de formatação.")
-        return None
+    except ErroCriterios as e:
+        st.error(f"ERRO: {e}")
+    atual = ultima.get("matriz")
+    if st.session_state.get("criterios_sessao") is None:
+        st.session_state.criterios_sessao = atual
+    elif atual is not None and atual is not st.session_state.criterios_sessao:
+        st.sidebar.info(f"Há uma nova versão dos critérios ({versao_criterios(atual) or atual['_hash'][:8]}).")
+        if st.sidebar.button("Usar a nova versão dos critérios", key="atualizar_criterios"):
+            st.session_state.criterios_sessao = atual
+            st.rerun()
+    return st.session_state.criterios_sessao
 
 def criar_pastas_necessarias():
     """Cria as pastas para salvar os dados e relatórios."""
     os.makedirs("data/avaliacoes", exist_ok=True)
     os.makedirs("relatorios", exist_ok=True)
 
-def calcular_indice_e_selo(respostas, matriz_perguntas):
-    """Calcula o índice de transparência e o selo Atricon com base nos pesos."""
-    pesos = {"ESSENCIAL": 2.0, "OBRIGATÓRIA": 1.5, "RECOMENDADA": 1.0}
-    total_pontos_possiveis, pontos_obtidos, total_essenciais, essenciais_atendidos = 0, 0, 0, 0
-    for secao, perguntas in matriz_perguntas.items():
-        if secao == "Municipios_MA": continue
-        for item in perguntas:
-            classificacao = item.get("classificacao", "RECOMENDADA").upper()
-            peso = pesos.get(classificacao, 1.0)
-            total_pontos_possiveis += peso
-            status_geral_atende_item = True
-            for sub in item["subcriterios"]:
-                chave_resposta_sub = f"{secao}_{item['criterio']}_{sub}"
-                if respostas.get(chave_resposta_sub) == "Não Atende":
-                    status_geral_atende_item = False
-                    break
-            
-            if status_geral_atende_item: pontos_obtidos += peso
-            if classificacao == "ESSENCIAL":
-                total_essenciais += 1
-                if status_geral_atende_item: essenciais_atendidos += 1
-                
-    percentual_essenciais = (essenciais_atendidos / total_essenciais * 100) if total_essenciais > 0 else 100
-    indice = (pontos_obtidos / total_pontos_possiveis * 100) if total_pontos_possiveis > 0 else 0
-    
-    selo = "Inexistente"
-    if indice > 0:
-        if percentual_essenciais == 100:
-            if indice >= 95: selo = "💎 Diamante"
-            elif indice >= 85: selo = "🥇 Ouro"
-            elif indice >= 75: selo = "🥈 Prata"
-            else: selo = "Elevado (não elegível para selo)"
-        else:
-            if indice >= 75: selo = "Elevado"
-            elif indice >= 50: selo = "Intermediário"
-            elif indice >= 30: selo = "Básico"
-            else: selo = "Inicial"
-    return {"indice": indice, "selo": selo, "percentual_essenciais": percentual_essenciais}
-
-
-def calcular_pontuacao_secao(respostas, perguntas_secao, nome_secao):
-    """Calcula a pontuação de uma seção específica."""
-    pesos = {"ESSENCIAL": 2.0, "OBRIGATÓRIA": 1.5, "RECOMENDADA": 1.0}
-    total_pontos_possiveis, pontos_obtidos = 0, 0
-    for item in perguntas_secao:
-        classificacao = item.get("classificacao", "RECOMENDADA").upper()
-        peso = pesos.get(classificacao, 1.0)
-        total_pontos_possiveis += peso
-        
-        item_atende = True
-        for sub in item["subcriterios"]:
-            chave_resposta = f"{nome_secao}_{item['criterio']}_{sub}"
-            if respostas.get(chave_resposta) == "Não Atende":
-                item_atende = False
-                break
-        
-        if item_atende:
-            pontos_obtidos += peso
-    return (pontos_obtidos / total_pontos_possiveis * 100) if total_pontos_possiveis > 0 else 100
-
-# Callback para quando a opção de Disponibilidade muda
-def on_disponibilidade_change(secao, criterio, subcriterios):
-    chave_disponibilidade = f"{secao}_{criterio}_Disponibilidade"
-    novo_status_disponibilidade = st.session_state[chave_disponibilidade]
-    st.session_state.respostas[chave_disponibilidade] = novo_status_disponibilidade
-
-    for sub in subcriterios:
-        if sub != "Disponibilidade":
-            chave_subcriterio = f"{secao}_{criterio}_{sub}"
-            if novo_status_disponibilidade == "Não Atende":
-                st.session_state.respostas[chave_subcriterio] = "Não Atende"
-                st.session_state.respostas[f"{chave_subcriterio}_obs"] = ""
-            else:
-                st.session_state.respostas[chave_subcriterio] = "Atende"
-                st.session_state.respostas[f"{chave_subcriterio}_obs"] = ""
-    # st.rerun() # Removido, pois já foi explicado que não é necessário aqui.
-
 # --- FUNÇÃO DE GERAÇÃO DE RELATÓRIO ---
-def gerar_relatorio_novo_modelo(respostas, municipio, segmento, matriz_perguntas, tipo_relatorio, nome_usuario, usuario_config):
-    template_tipo = usuario_config.get('template', 'padrao')
-    template_path = f"modelo_{template_tipo}.docx"
-    
-    if not os.path.exists(template_path):
-        st.error(f"ERRO: Arquivo de modelo '{template_path}' não foi encontrado. Certifique-se de que ele está na mesma pasta do script.")
-        return None, None 
-
-    try:
-        doc = docx.Document(template_path)
-    except Exception as e:
-        st.error(f"Erro ao carregar o modelo de relatório '{template_path}': {e}")
-        return None, None 
-    
-    # --- PÁGINA DE ROSTO ---
-    for paragraph in doc.paragraphs:
-        if "SEGMENTO" in paragraph.text:
-            paragraph.text = paragraph.text.replace("SEGMENTO", segmento)
-        if "NOME DO CLIENTE" in paragraph.text:
-            paragraph.text = paragraph.text.replace("NOME DO CLIENTE", municipio)
-        if "Data" in paragraph.text:
-            paragraph.text = paragraph.text.replace("Data", datetime.now().strftime("%d/%m/%Y"))
-    
-    if template_tipo == 'padrao':
-        doc.add_paragraph()
-        p_title = doc.add_paragraph()
-        p_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run_title = p_title.add_run("PROGRAMA NACIONAL DE TRANSPARÊNCIA PÚBLICA")
-        run_title.font.size = Pt(22); run_title.bold = True
-
-        p_subtitulo = doc.add_paragraph(); p_subtitulo.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        p_subtitulo.add_run("Relatório de Transparência\n").bold = True
-        p_subtitulo.add_run(f"{segmento} de {municipio}").bold = True
-        
-        doc.add_paragraph()
-        resultados = calcular_indice_e_selo(respostas, matriz_perguntas)
-        p_score = doc.add_paragraph(f"{resultados['indice']:.2f}%"); p_score.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        p_score.runs[0].font.size = Pt(48); p_score.runs[0].bold = True
-        p_selo = doc.add_paragraph(f"{resultados['selo']}"); p_selo.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        p_selo.runs[0].font.size = Pt(24); p_selo.runs[0].bold = True
-        doc.add_paragraph()
-        
-        texto_intro = f"Com base na Lei 12.527/2011 (Lei de Acesso à Informação), o nosso controle de qualidade fez uma avaliação geral da {segmento} de {municipio}, na qual, apresentou as seguintes informações:"
-        doc.add_paragraph(texto_intro)
-        doc.add_paragraph()
-
-        p_exercicio = doc.add_paragraph(f"Exercício: {datetime.now().year}")
-        doc.add_paragraph()
-        p_avaliador = doc.add_paragraph(f"Avaliação feita por: {nome_usuario}")
-        doc.add_paragraph()
-        p_data_geracao = doc.add_paragraph(f"Data de Geração: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-        doc.add_paragraph()
-
-    doc.add_page_break()
-
-    # --- PÁGINAS DE DETALHAMENTO ---
-    p_detalhe = doc.add_paragraph()
-    run_detalhe = p_detalhe.add_run("Detalhamento da Avaliação")
-    run_detalhe.font.size = Pt(18); run_detalhe.bold = True
-    doc.add_paragraph()
-
-    matriz_para_relatorio = {}
-    for secao, perguntas in matriz_perguntas.items():
-        if secao == "Municipios_MA": continue
-
-        itens_nao_conformes_na_secao = []
-        for item in perguntas:
-            algum_subcriterio_nao_atende = False
-            for subcriterio in item["subcriterios"]:
-                chave_resposta = f"{secao}_{item['criterio']}_{subcriterio}"
-                if respostas.get(chave_resposta) == "Não Atende":
-                    algum_subcriterio_nao_atende = True
-                    break
-            
-            if algum_subcriterio_nao_atende:
-                itens_nao_conformes_na_secao.append(item)
-        
-        if itens_nao_conformes_na_secao:
-            matriz_para_relatorio[secao] = itens_nao_conformes_na_secao
-    
-    if not matriz_para_relatorio:
-        doc.add_paragraph("Nenhuma não conformidade foi encontrada nesta avaliação. Todos os critérios foram atendidos.")
-        doc.add_paragraph()
-    else:
-        for secao_nome, perguntas_secao_filtradas in matriz_para_relatorio.items():
-            score_secao = calcular_pontuacao_secao(respostas, matriz_perguntas[secao_nome], secao_nome)
-            
-            p_secao_titulo = doc.add_paragraph()
-            run_secao_titulo = p_secao_titulo.add_run(f"{secao_nome.upper()} - {score_secao:.2f}%")
-            run_secao_titulo.font.size = Pt(14)
-            run_secao_titulo.bold = True
-            doc.add_paragraph()
-            doc.add_paragraph()
-
-            for item_idx, item in enumerate(perguntas_secao_filtradas):
-                p_item_title = doc.add_paragraph()
-                p_item_title.add_run(f"Item {item['topico']} - {item['criterio']} ({item.get('classificacao', '').upper()})")
-                p_item_title.runs[0].bold = True
-                doc.add_paragraph()
-
-                observacoes_finais = []
-                links_finais = []
-
-                # --- Lógica de Impressão do Relatório (Apenas "Não Atende") ---
-                chave_disponibilidade_item = f"{secao_nome}_{item['criterio']}_Disponibilidade"
-                disponibilidade_nao_atende_status = respostas.get(chave_disponibilidade_item, "Atende") 
-
-                if disponibilidade_nao_atende_status == "Não Atende":
-                    p_criterio = doc.add_paragraph()
-                    p_criterio.add_run(f"• Disponibilidade: ").italic = True
-                    run_status = p_criterio.add_run("Não Atende")
-                    run_status.bold = True
-                    run_status.font.color.rgb = RGBColor(0xFF, 0, 0)
-                    doc.add_paragraph()
-                    
-                    obs_disp = respostas.get(f"{chave_disponibilidade_item}_obs", "")
-                    if obs_disp: observacoes_finais.append(("Disponibilidade", obs_disp))
-                
-                for subcriterio in item["subcriterios"]:
-                    if subcriterio == "Disponibilidade":
-                        continue
-
-                    chave_resposta = f"{secao_nome}_{item['criterio']}_{subcriterio}"
-                    resposta_sub = respostas.get(chave_resposta, "Atende")
-
-                    if resposta_sub == "Não Atende" and (disponibilidade_nao_atende_status == "Atende" or "Disponibilidade" not in item["subcriterios"]):
-                        p_criterio = doc.add_paragraph()
-                        p_criterio.add_run(f"• {subcriterio}: ").italic = True
-                        run_status = p_criterio.add_run("Não Atende")
-                        run_status.bold = True
-                        run_status.font.color.rgb = RGBColor(0xFF, 0, 0)
-                        doc.add_paragraph()
-                        
-                        obs = respostas.get(f"{chave_resposta}_obs", "")
-                        if obs: observacoes_finais.append((subcriterio, obs))
-
-                chave_links_pergunta_geral = f"{secao_nome}_{item['criterio']}_links"
-                links_genericos_item = respostas.get(chave_links_pergunta_geral, []) # Renomeei para evitar conflito com links_finais
-                links_finais.extend(links_genericos_item) # Usar links_genericos_item aqui
-
-                if links_finais or observacoes_finais:
-                    p_obs_titulo = doc.add_paragraph()
-                    p_obs_titulo.add_run("Evidências e Comentários:").bold = True
-                    
-                    for link_url in sorted(list(set(links_finais))):
-                        if not (link_url.startswith("http://") or link_url.startswith("https://")):
-                            link_url = "http://" + link_url
-                        
-                        p_obs_titulo.add_run(f"\n- Link: {link_url}")
-
-
-                    for sub, obs_text in observacoes_finais:
-                        p_obs_titulo.add_run(f"\n- Observação ({sub}): {obs_text}")
-                    
-                    doc.add_paragraph()
-                    doc.add_paragraph()
-
-    # --- SALVAMENTO E CONVERSÃO ---
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    nome_base = f"Relatorio_Final_{segmento.replace(' ', '')}_{municipio.replace(' ', '')}_{timestamp}"
-    path_docx = os.path.join("relatorios", f"{nome_base}.docx"); path_pdf = os.path.join("relatorios", f"{nome_base}.pdf")
-    doc.save(path_docx)
+def gerar_relatorio_pela_interface(*args, **kwargs):
+    """Gera o relatório mostrando os erros na interface. Devolve (path_docx, path_pdf)."""
+    limpar_relatorios_antigos()
     try:
-        convert(path_docx, path_pdf); os.remove(path_docx)
-        return path_docx, path_pdf # Retorna tupla (path_docx, path_pdf) em caso de sucesso
-    except Exception as e:
-        st.sidebar.error(f"Falha ao converter para PDF: {e}. O arquivo DOCX foi salvo e está disponível para download."); st.session_state.fallback_docx_path = path_docx
-        return path_docx, None # Retorna tupla (path_docx, None) em caso de falha na conversão
+        path_docx, path_pdf, erro_conversao = gerar_relatorio_novo_modelo(*args, **kwargs)
+    except ErroModelo as e:
+        st.error(str(e))
+        return None, None
+    if erro_conversao:
+        st.sidebar.error(f"Falha ao converter para PDF: {erro_conversao}. O arquivo DOCX foi salvo e está disponível para download.")
+    return path_docx, path_pdf
 
 
 # --- INTERFACE GRÁFICA ---
 st.set_page_config(layout="wide", page_title="Avaliador de Transparência")
 st.title("📄 Sistema de Avaliação de Transparência Municipal")
 matriz_completa = carregar_criterios_do_arquivo()
-
-# Inicializa o estado de qual expander está aberto, se não existir
-if 'open_expander_key' not in st.session_state:
-    st.session_state.open_expander_key = None
-
-def handle_section_button_click(clicked_section_key):
-    # Este callback é acionado quando um dos botões de seção é clicado.
-    if st.session_state.open_expander_key == clicked_section_key:
-        st.session_state.open_expander_key = None # Se clicou no mesmo, fecha.
+try:
+    modelos_vigentes()  # valida e compila os modelos de relatório na primeira execução do processo
+except ErroModelo as e:
+    st.warning(f"Modelos de relatório: {e}")
+
+def renderizar_acoes_em_lote(matriz_completa):
+    """Ações que alteram uma seção ou a avaliação inteira de uma vez: marcar tudo e copiar de outra avaliação."""
+    segmento_atual, municipio_atual = st.session_state.segmento, st.session_state.municipio
+    matriz_perguntas = matriz_completa[segmento_atual]
+    respostas = st.session_state.respostas
+    if st.session_state.get('aviso_lote'):
+        st.success(st.session_state.pop('aviso_lote'))
+
+    secoes = [secao for secao in matriz_perguntas if secao != "Municipios_MA"]
+    escopo = st.selectbox("Aplicar a", ["Avaliação inteira"] + secoes, key="lote_escopo")
+    secao = None if escopo == "Avaliação inteira" else escopo
+
+    cols_marcar = st.columns(2)
+    for col, status in zip(cols_marcar, STATUS_VALIDOS):
+        if col.button(f"Marcar tudo como \"{status}\"", key=f"lote_marcar_{status}", use_container_width=True):
+            alteradas = marcar_todos(respostas, matriz_perguntas, status, secao)
+            concluir_alteracao_em_lote(alteradas, f"{escopo}: {len(alteradas)} resposta(s) marcada(s) como \"{status}\".")
+
+    st.markdown("**Copiar do ciclo anterior**")
+    ciclos = listar_ciclos_anteriores(matriz_completa, segmento_atual, municipio_atual)
+    if ciclos:
+        cols_ciclo = st.columns([2, 1])
+        ciclo, usuario, caminho = cols_ciclo[0].selectbox("Avaliação do ciclo", ciclos, key="lote_ciclo", label_visibility="collapsed",
+                                                          format_func=lambda c: f"{c[0]} - {c[1] or 'sem avaliador'}")
+        if cols_ciclo[1].button("📋 Copiar do ciclo", use_container_width=True):
+            alteradas = copiar_respostas(respostas, carregar_avaliacao(caminho), matriz_perguntas, secao=secao)
+            concluir_alteracao_em_lote(alteradas, f"{escopo}: {len(alteradas)} resposta(s) copiada(s) do ciclo {ciclo}.")
+    else:
+        st.caption("Nenhuma avaliação desta entidade em ciclos anteriores (data/ciclos/<ciclo>/).")
+
+    st.markdown("**Copiar os critérios comuns de outro órgão/poder do município**")
+    # Lidas do índice (relido só quando muda): o expander roda a cada interação, mesmo fechado.
+    disponiveis = [(outro, rotulo_usuario(entrada["usuario"]), entrada["caminho"])
+                   for outro in segmentos(matriz_completa) if outro != segmento_atual
+                   for entrada in consultar_indice(segmento=outro)
+                   if entrada["usuario"] != USUARIO_CONSOLIDADO and os.path.exists(entrada["caminho"])
+                   and resolver_entidade(matriz_completa, entrada["segmento"], entrada["codigo"]) == (outro, municipio_atual)]
+    if disponiveis:
+        cols_irmao = st.columns([2, 1])
+        outro, usuario, caminho = cols_irmao[0].selectbox("Avaliação de origem", disponiveis, key="lote_irmao", label_visibility="collapsed",
+                                                          format_func=lambda d: f"{d[0]} de {municipio_atual} - {d[1] or 'sem avaliador'}")
+        comuns = mapear_itens_comuns(matriz_perguntas, matriz_completa[outro])
+        if cols_irmao[1].button(f"📋 Copiar {len(comuns)} itens comuns", use_container_width=True):
+            alteradas = copiar_respostas(respostas, carregar_avaliacao(caminho), matriz_perguntas, matriz_completa[outro], secao)
+            concluir_alteracao_em_lote(alteradas, f"{escopo}: {len(alteradas)} resposta(s) copiada(s) de {outro} (matriz COMUM).")
     else:
-        st.session_state.open_expander_key = clicked_section_key # Abre o novo.
-    st.rerun() # Essencial para que a interface se redesenhe
+        st.caption(f"Nenhuma avaliação salva de outro órgão/poder de {municipio_atual}.")
+
+def renderizar_consolidacao(matriz_completa):
+    """Tela de consolidação: mostra as divergências entre avaliadores e permite resolvê-las uma a uma."""
+    segmento_cons = st.session_state.consolidacao["segmento"]
+    municipio_cons = st.session_state.consolidacao["municipio"]
+    arquivos = agrupar_por_entidade("data/avaliacoes", matriz_completa).get((segmento_cons, municipio_cons), {})
+    avaliacoes = {}
+    for usuario, caminho in arquivos.items():
+        avaliacoes[usuario] = carregar_avaliacao(caminho)
+
+    st.header(f"Consolidação: {municipio_cons} - {segmento_cons}")
+    st.caption(f"Avaliadores: {', '.join(avaliacoes)}")
+    cols_politica = st.columns(2)
+    politica = cols_politica[0].selectbox("Política de resolução", list(POLITICAS), format_func=POLITICAS.get, key="consolidacao_politica")
+    revisor = None
+    if politica == "revisor":
+        revisor = cols_politica[1].selectbox("Revisor", list(avaliacoes), key="consolidacao_revisor")
+
+    _, conflitos = consolidar(avaliacoes, matriz_completa[segmento_cons], politica, revisor)
+    if not conflitos:
+        st.success("Nenhuma divergência entre os avaliadores.")
+    else:
+        st.info(f"**{len(conflitos)}** divergência(s). O valor pré-selecionado segue a política escolhida.")
+
+    # As chaves dos widgets incluem a política para que a troca de política restaure as sugestões.
+    escolhas = {}
+    secao_atual = None
+    for conflito in conflitos:
+        if conflito["secao"] != secao_atual:
+            secao_atual = conflito["secao"]; st.subheader(secao_atual)
+        valores = " / ".join(f"**{u}**: {v or '—'}" for u, v in conflito["valores"].items())
+        st.markdown(f"{conflito['topico']} - {conflito['criterio']} · *{conflito['subcriterio']}*  \n{valores}")
+        chave_widget = f"conflito_{politica}_{revisor}_{conflito['chave']}"
+        if conflito["tipo"] == "status":
+            opcoes = ("Atende", "Não Atende")
+            escolhas[conflito["chave"]] = st.radio("Status consolidado", opcoes, index=opcoes.index(conflito["escolhido"]), key=chave_widget, horizontal=True)
+        else:
+            escolhas[conflito["chave"]] = st.text_area("Observação consolidada", value=conflito["escolhido"], key=chave_widget)
+        st.markdown("---")
+
+    consolidada, conflitos_finais = consolidar(avaliacoes, matriz_completa[segmento_cons], politica, revisor, escolhas)
+    for conflito in conflitos_finais:
+        if conflito["tipo"] == "disponibilidade":
+            st.warning(f"{conflito['topico']} - {conflito['criterio']} · *{conflito['subcriterio']}*: a escolha "
+                       f"\"{conflito['valores']['escolha']}\" fica como \"Não Atende\" porque a Disponibilidade consolidada é \"Não Atende\".")
+
+    cols_acoes = st.columns(2)
+    if cols_acoes[0].button("💾 Salvar avaliação consolidada", use_container_width=True):
+        destino = os.path.join(PASTA_CONSOLIDADAS, nome_arquivo_avaliacao(segmento_cons, municipio_cons, USUARIO_CONSOLIDADO))
+        try:
+            salvar_avaliacao(destino, consolidada, usuario=st.session_state['username'])
+            st.success(f"Avaliação consolidada salva em '{destino}'.")
+        except Exception as e:
+            st.error(f"Erro ao salvar a consolidação: {e}")
+    if cols_acoes[1].button("Fechar consolidação", use_container_width=True):
+        st.session_state.consolidacao = None
+        st.rerun()
+
+def abrir_avaliacao(caminho_arquivo, segmento, municipio, uf):
+    """Carrega (ou inicia) a avaliação do arquivo e a torna a avaliação ativa da sessão."""
+    st.session_state.respostas, st.session_state.meta_avaliacao = carregar_avaliacao_com_meta(caminho_arquivo)
+    if os.path.exists(caminho_arquivo):
+        st.sidebar.success("Avaliação anterior carregada!")
+    else:
+        st.sidebar.info("Iniciando uma nova avaliação.")
+    # Cópia do que foi carregado: é a base da mescla se outra sessão salvar antes.
+    st.session_state.respostas_base = copy.deepcopy(st.session_state.respostas)
+    st.session_state.conflito_salvamento = None
+
+    st.session_state.path_pdf = None
+    st.session_state.fallback_docx_path = None
+    st.session_state.open_expander_key = None # Reseta o expander aberto ao iniciar/continuar
+
+    st.session_state.avaliacao_iniciada = True
+    st.session_state.consolidacao = None
+    st.session_state.caminho_arquivo = caminho_arquivo
+    st.session_state.municipio = municipio
+    st.session_state.uf = uf
+    st.session_state.segmento = segmento
+    st.session_state.last_save_time = datetime.now()
+    st.rerun()
+
+def renderizar_minhas_avaliacoes(matriz_completa):
+    """Avaliações do usuário, lidas do índice (sem abrir os arquivos), das mais recentes para as mais antigas."""
+    minhas = [entrada for entrada in consultar_indice(usuario=st.session_state['username']) if os.path.exists(entrada["caminho"])]
+    if not minhas: return
+    em_andamento = sum(1 for entrada in minhas if entrada.get("status") == "em andamento")
+    with st.sidebar.expander(f"📂 Minhas avaliações ({len(minhas)}, {em_andamento} em andamento)"):
+        for entrada in minhas[:MAXIMO_MINHAS_AVALIACOES]:
+            segmento_entrada, municipio_entrada = resolver_entidade(matriz_completa, entrada["segmento"], entrada["codigo"])
+            indice = f" · {entrada['indice']:.2f}" if entrada["indice"] is not None else ""
+            situacao = {"em andamento": "✏️ ", "concluída": "✅ "}.get(entrada.get("status"), "")
+            rotulo = f"{situacao}{municipio_entrada} ({segmento_entrada}){indice} {entrada['selo']}"
+            if st.button(rotulo, key=f"minha_{entrada['caminho']}", use_container_width=True):
+                abrir_avaliacao(entrada["caminho"], segmento_entrada, municipio_entrada, entrada["uf"] or UF_PADRAO)
+        if len(minhas) > MAXIMO_MINHAS_AVALIACOES:
+            st.caption(f"Mostrando as {MAXIMO_MINHAS_AVALIACOES} salvas mais recentemente.")
+
+def renderizar_coletanea(matriz_completa):
+    """Coletânea dos relatórios de várias entidades (ZIP ou PDF único), gerada no pool de relatórios em lote."""
+    with st.sidebar.expander("📚 Coletânea de relatórios"):
+        # Avaliações pelo índice (sem abrir os arquivos) e as consolidadas, que ficam em outra pasta.
+        avaliacoes = {entrada["caminho"]: (entrada["segmento"], entrada["codigo"], entrada["usuario"])
+                      for entrada in consultar_indice() if os.path.exists(entrada["caminho"])}
+        avaliacoes.update({caminho: (segmento_arquivo, municipio_arquivo, usuario)
+                           for caminho, segmento_arquivo, municipio_arquivo, usuario in listar_arquivos_avaliacao(PASTA_CONSOLIDADAS)})
+        def rotulo(caminho):
+            segmento_arquivo, municipio_arquivo, usuario = avaliacoes[caminho]
+            segmento_entrada, municipio_entrada = resolver_entidade(matriz_completa, segmento_arquivo, municipio_arquivo)
+            return f"{municipio_entrada} ({segmento_entrada}) - {rotulo_usuario(usuario)}"
+        selecionadas = st.multiselect("Avaliações", sorted(avaliacoes, key=rotulo), format_func=rotulo, key="coletanea_selecao",
+                                      placeholder="Escolha as entidades")
+        formato = st.radio("Formato", list(FORMATOS), format_func=FORMATOS.get, key="coletanea_formato")
+        titulo = st.text_input("Título da abertura", value=TITULO_PADRAO, key="coletanea_titulo") if formato == "pdf" else TITULO_PADRAO
+        if st.button("📚 Gerar coletânea", disabled=not selecionadas, use_container_width=True):
+            caminho_saida = os.path.join(PASTA_RELATORIOS, f"Coletanea_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}")
+            tarefas = (tarefa for pasta in (PASTA_AVALIACOES, PASTA_CONSOLIDADAS)
+                       for tarefa in tarefas_da_pasta(matriz_completa, config, pasta, usuario_padrao=st.session_state['username'], selecao=selecionadas))
+            barra = st.progress(0.0, text="Gerando os relatórios...")
+            def progresso(n, resultado):
+                barra.progress(n / len(selecionadas), text=f"{n}/{len(selecionadas)} · {rotulo_entidade(resultado)}")
+            limpar_relatorios_antigos()
+            try:
+                resultados = gerar_coletanea(tarefas, caminho_saida, formato, titulo, processos=min(len(selecionadas), os.cpu_count() or 1), progresso=progresso)
+                st.session_state.coletanea = {"caminho": caminho_saida, "falhas": [rotulo_entidade(r) for r in resultados if r["falha"]],
+                                              "sem_pdf": [rotulo_entidade(r) for r in resultados if r["aviso"]]}
+            except ErroColetanea as e:
+                st.error(str(e))
+        coletanea = st.session_state.get('coletanea')
+        if coletanea and os.path.exists(coletanea["caminho"]):
+            if coletanea["falhas"]:
+                st.warning(f"Sem relatório: {', '.join(coletanea['falhas'])}.")
+            if coletanea["sem_pdf"]:
+                st.warning(f"Sem conversão para PDF ({'enviados em .docx' if coletanea['caminho'].endswith('.zip') else 'fora do PDF'}): {', '.join(coletanea['sem_pdf'])}.")
+            with open(coletanea["caminho"], "rb") as arquivo:
+                st.download_button("⬇️ Baixar coletânea", data=arquivo, file_name=os.path.basename(coletanea["caminho"]), use_container_width=True,
+                                   mime="application/zip" if coletanea["caminho"].endswith(".zip") else "application/pdf", key="download_coletanea")
+
+def salvar_progresso():
+    """Salva as respostas da sessão só se ninguém tiver gravado o arquivo desde o carregamento (levanta ConflitoDeVersao)."""
+    # Registra junto com a avaliação o resultado e a versão das regras usadas no cálculo.
+    resultado = calcular_indice_e_selo(st.session_state.respostas, matriz_completa[st.session_state.segmento])
+    st.session_state.meta_avaliacao = salvar_avaliacao(
+        st.session_state.caminho_arquivo, st.session_state.respostas,
+        st.session_state.get('meta_avaliacao'), st.session_state['username'],
+        {"regras": resultado["regras"], "indice": round(resultado["indice"], 2), "selo": resultado["selo"],
+         "criterios": versao_criterios(matriz_completa)})
+    st.session_state.respostas_base = copy.deepcopy(st.session_state.respostas)
+    st.session_state.last_save_time = datetime.now()
+    agendar_backup() # Snapshot incremental de data/ em segundo plano (no máximo um a cada 15 minutos).
+
+def recarregar_respostas(respostas, meta):
+    """Troca as respostas da sessão, descartando o estado dos widgets para que mostrem os novos valores."""
+    for chave in set(st.session_state.respostas) | set(respostas):
+        if chave in st.session_state: del st.session_state[chave]
+    st.session_state.respostas = copy.deepcopy(respostas)
+    st.session_state.respostas_base = copy.deepcopy(respostas)
+    st.session_state.meta_avaliacao = meta
+
+@st.dialog("⚠️ Conflito ao salvar", width="large")
+def dialogo_conflito_salvamento():
+    conflito = st.session_state.conflito_salvamento
+    minhas, deles = st.session_state.respostas, conflito.respostas_atuais
+    mesclada, chaves_em_conflito = mesclar_tres_vias(st.session_state.get('respostas_base', {}), minhas, deles)
+    st.warning(f"{conflito} Suas alterações ainda não foram gravadas.")
+    if chaves_em_conflito:
+        st.markdown(f"**{len(chaves_em_conflito)}** resposta(s) foram alteradas nas duas versões. Escolha qual manter:")
+    else:
+        st.info("As alterações não se sobrepõem: é possível mesclar tudo automaticamente.")
+
+    escolhas = {}
+    for chave in chaves_em_conflito:
+        st.markdown(f"`{chave}`")
+        escolhas[chave] = st.radio("Manter", ("Minha versão", "Versão salva"), key=f"mescla_{chave}", horizontal=True,
+                                   captions=[str(minhas.get(chave, "(vazio)")), str(deles.get(chave, "(vazio)"))])
+
+    cols = st.columns(3)
+    if cols[0].button("🔀 Mesclar e salvar", use_container_width=True):
+        for chave, escolha in escolhas.items():
+            if escolha == "Minha versão":
+                if chave in minhas: mesclada[chave] = minhas[chave]
+                else: mesclada.pop(chave, None)
+        recarregar_respostas(deles, conflito.meta_atual)
+        st.session_state.respostas = mesclada
+        resolver_conflito_salvamento()
+    if cols[1].button("Sobrescrever com a minha", use_container_width=True):
+        st.session_state.meta_avaliacao = conflito.meta_atual
+        resolver_conflito_salvamento()
+    if cols[2].button("Descartar a minha", use_container_width=True):
+        recarregar_respostas(deles, conflito.meta_atual)
+        st.session_state.conflito_salvamento = None
+        st.rerun()
+
+def resolver_conflito_salvamento():
+    try:
+        salvar_progresso()
+        st.session_state.conflito_salvamento = None
+    except ConflitoDeVersao as e:
+        st.session_state.conflito_salvamento = e # Outra gravação aconteceu nesse meio tempo: o diálogo reabre.
+    st.rerun()
+
+def aplicar_pacote_offline(comparacao, escolhas=None):
+    """Troca as respostas da sessão pela mescla do pacote com o servidor e grava."""
+    recarregar_respostas(resolver_conflitos(comparacao, escolhas), comparacao["meta_atual"])
+    st.session_state.respostas_base = copy.deepcopy(comparacao["servidor"])
+    st.session_state.pacote_importado = None
+    st.session_state.aviso_pacote = f"Pacote importado: {len(comparacao['alteradas_offline'])} resposta(s) alterada(s) offline."
+    resolver_conflito_salvamento()
+
+@st.dialog("📦 Importar pacote offline", width="large")
+def dialogo_importacao_pacote():
+    try:
+        comparacao = comparar_com_servidor(st.session_state.pacote_importado, matriz_completa, st.session_state.caminho_arquivo)
+    except ErroPacote as e:
+        st.error(str(e))
+        st.session_state.pacote_importado = None
+        return
+    for aviso in comparacao["avisos"]:
+        st.warning(aviso)
+    total = sum(len(grupo["respostas"]) for grupo in comparacao["conflitos"])
+    if total:
+        st.markdown(f"**{total}** resposta(s) foram alteradas offline e no servidor. Escolha, em cada critério, qual manter:")
+    else:
+        st.info("As alterações não se sobrepõem: é possível mesclar tudo automaticamente.")
+    escolhas = {}
+    for grupo in comparacao["conflitos"]:
+        st.markdown(f"**{grupo['topico']} - {grupo['criterio']}**  \n*{grupo['secao']}*")
+        for resposta in grupo["respostas"]:
+            lado = st.radio(resposta["rotulo"], ("Versão offline", "Versão do servidor"), key=f"pacote_{resposta['chave']}", horizontal=True,
+                            captions=[str(resposta["offline"] if resposta["offline"] is not None else "(vazio)"),
+                                      str(resposta["servidor"] if resposta["servidor"] is not None else "(vazio)")])
+            escolhas[resposta["chave"]] = "offline" if lado == "Versão offline" else "servidor"
+    cols = st.columns(2)
+    if cols[0].button("📦 Importar e salvar", use_container_width=True):
+        aplicar_pacote_offline(comparacao, escolhas)
+    if cols[1].button("Cancelar importação", use_container_width=True):
+        st.session_state.pacote_importado = None
+        st.rerun()
+
+def renderizar_pacote_offline():
+    """Exportação do pacote para o avaliador offline e importação do pacote editado."""
+    with st.sidebar.expander("📦 Pacote offline"):
+        if st.session_state.get('aviso_pacote'):
+            st.success(st.session_state.pop('aviso_pacote'))
+        if st.button("Preparar pacote para trabalho offline", use_container_width=True):
+            try:
+                salvar_progresso() # O pacote leva a versão salva: ela é a base da mescla na volta.
+            except ConflitoDeVersao as e:
+                st.session_state.conflito_salvamento = e
+                st.rerun()
+            st.session_state.pacote_exportado = serializar_pacote(montar_pacote(
+                matriz_completa, st.session_state.segmento, st.session_state.municipio, st.session_state['username'],
+                st.session_state.uf, st.session_state.caminho_arquivo))
+        if st.session_state.get('pacote_exportado'):
+            st.download_button("⬇️ Baixar pacote (.json)", st.session_state.pacote_exportado, mime="application/json",
+                               file_name=nome_pacote(st.session_state.segmento, st.session_state.municipio, st.session_state['username'], st.session_state.uf),
+                               use_container_width=True, key="download_pacote")
+            st.caption("Edite com `streamlit run avaliacao_offline.py -- <pacote>` e importe o arquivo de volta aqui.")
+
+        arquivo = st.file_uploader("Importar pacote editado", type=["json"], key="upload_pacote")
+        if arquivo is not None and st.button("Importar pacote", use_container_width=True):
+            try:
+                pacote = ler_pacote(arquivo.getvalue())
+                entidade = pacote["entidade"]
+                if caminho_avaliacao(entidade["segmento"], entidade["municipio"], entidade["usuario"] or None, entidade["uf"]) != st.session_state.caminho_arquivo:
+                    raise ErroPacote(f"O pacote é da avaliação de {entidade['segmento']} de {entidade['municipio']} ({entidade['usuario'] or 'sem avaliador'}); abra essa avaliação para importá-lo.")
+                salvar_progresso() # As alterações da sessão entram na mescla como parte da versão do servidor.
+                comparacao = comparar_com_servidor(pacote, matriz_completa, st.session_state.caminho_arquivo)
+            except ErroPacote as e:
+                st.error(str(e))
+            except ConflitoDeVersao as e:
+                st.session_state.conflito_salvamento = e
+                st.rerun()
+            else:
+                if comparacao["conflitos"]:
+                    st.session_state.pacote_importado = pacote
+                    st.rerun()
+                aplicar_pacote_offline(comparacao)
 
 
 if matriz_completa:
     try:
         with open('config.yaml', 'r', encoding='utf-8') as file: config = yaml.load(file, Loader=SafeLoader)
+        # GET http://127.0.0.1:<porta>/metrics; "observabilidade: {porta_metricas: 0}" em config.yaml desliga.
+        iniciar_servidor_metricas((config.get('observabilidade') or {}).get('porta_metricas', PORTA_METRICAS))
         authenticator = stauth.Authenticate(
             config['credentials'],
             config['cookie']['name'],
@@ -325,50 +455,64 @@ if matriz_completa:
         authenticator.logout('Logout', 'sidebar', key='logout_button')
         st.sidebar.title(f"Bem-vindo(a),\n{st.session_state['name']}!")
         
+        renderizar_minhas_avaliacoes(matriz_completa)
+        renderizar_coletanea(matriz_completa)
         st.sidebar.header("Configuração da Avaliação")
         
-        MUNICIPIOS_MARANHAO = ["- Selecione um município -"] + sorted(matriz_completa.get("Municipios_MA", []))
-        municipio = st.sidebar.selectbox("Nome do Município", options=MUNICIPIOS_MARANHAO, key="select_municipio")
+        catalogo = carregar_catalogo()
+        ufs = ufs_disponiveis(catalogo)
+        indice_uf = ufs.index(UF_PADRAO) if UF_PADRAO in ufs else 0  # catálogo sem o MA: a primeira UF
+        uf = st.sidebar.selectbox("UF", ufs, index=indice_uf, key="select_uf") if len(ufs) > 1 else (ufs[0] if ufs else UF_PADRAO)
+        busca_municipio = st.sidebar.text_input("Buscar município", key="busca_municipio", placeholder="Ex.: sao luis")
+        encontrados = buscar_municipios(catalogo, busca_municipio, uf, limite=50) if busca_municipio.strip() else municipios_da_uf(catalogo, uf)
+        opcoes_municipio = ["- Selecione um município -"] + [registro["nome"] for registro in encontrados]
+        municipio = st.sidebar.selectbox("Nome do Município", options=opcoes_municipio, key="select_municipio")
         
-        opcoes_segmento = [key for key in matriz_completa.keys() if key != "Municipios_MA"]
+        opcoes_segmento = segmentos(matriz_completa)
         segmento = st.sidebar.selectbox("Órgão/Poder", opcoes_segmento, key="select_segmento")
         
         if municipio != "- Selecione um município -" and segmento:
-            nome_arquivo_avaliacao = f"avaliacao_{segmento.replace(' ', '')}_{municipio.replace(' ', '')}_{st.session_state['username']}.json"
-            caminho_arquivo = os.path.join("data/avaliacoes", nome_arquivo_avaliacao)
+            caminho_arquivo = caminho_avaliacao(segmento, municipio, st.session_state['username'], uf)
             
             if st.sidebar.button("✅ Iniciar / Continuar Avaliação"):
-                if os.path.exists(caminho_arquivo):
-                    with open(caminho_arquivo, 'r', encoding='utf-8') as f: 
-                        st.session_state.respostas = json.load(f)
-                    st.sidebar.success("Avaliação anterior carregada!")
-                else:
-                    st.session_state.respostas = {}
-                    st.sidebar.info("Iniciando uma nova avaliação.")
-                
-                st.session_state.path_pdf = None
-                st.session_state.fallback_docx_path = None
-                st.session_state.open_expander_key = None # Reseta o expander aberto ao iniciar/continuar
-
-                st.session_state.avaliacao_iniciada = True
-                st.session_state.caminho_arquivo = caminho_arquivo
-                st.session_state.municipio = municipio
-                st.session_state.segmento = segmento
-                st.session_state.last_save_time = datetime.now()
-                st.rerun()
-
-        if st.session_state.get('avaliacao_iniciada', False):
+                abrir_avaliacao(caminho_arquivo, segmento, municipio, uf)
+
+            # Mais de um avaliador para a mesma entidade: oferece a consolidação.
+            codigo_entidade = codigo_municipio(municipio, uf) or municipio.replace(' ', '')
+            avaliadores_entidade = {rotulo_usuario(entrada["usuario"]): entrada["caminho"]
+                                    for entrada in consultar_indice(segmento=segmento, codigo=codigo_entidade)}
+            if len(avaliadores_entidade) > 1:
+                if st.sidebar.button(f"🔀 Consolidar {len(avaliadores_entidade)} avaliações"):
+                    st.session_state.consolidacao = {"segmento": segmento, "municipio": municipio}
+                    st.session_state.avaliacao_iniciada = False
+                    st.rerun()
+
+        if st.session_state.get('consolidacao'):
+            renderizar_consolidacao(matriz_completa)
+
+        elif st.session_state.get('avaliacao_iniciada', False):
+            AVALIACOES_ATIVAS.marcar(st.session_state.setdefault('id_sessao', uuid.uuid4().hex))
             if 'last_save_time' not in st.session_state:
                 st.session_state.last_save_time = datetime.now()
             if datetime.now() - st.session_state.last_save_time > timedelta(minutes=10):
                 try:
-                    with open(st.session_state.caminho_arquivo, 'w', encoding='utf-8') as f: 
-                        json.dump(st.session_state.respostas, f, ensure_ascii=False, indent=4)
-                    st.session_state.last_save_time = datetime.now()
+                    salvar_progresso()
+                    SALVAMENTOS_AUTOMATICOS.inc(resultado="ok")
                     st.toast(f"Progresso salvo automaticamente às {datetime.now().strftime('%H:%M:%S')}")
+                except ConflitoDeVersao as e:
+                    SALVAMENTOS_AUTOMATICOS.inc(resultado="conflito")
+                    st.session_state.conflito_salvamento = e
+                    st.session_state.last_save_time = datetime.now()
                 except Exception as e: 
+                    SALVAMENTOS_AUTOMATICOS.inc(resultado="erro")
+                    logger.error("salvamento_automatico_com_erro", extra={"caminho": st.session_state.caminho_arquivo, "usuario": st.session_state['username'], "erro": str(e)})
                     st.toast(f"Erro no salvamento automático: {e}")
             
+            if st.session_state.get('conflito_salvamento'):
+                dialogo_conflito_salvamento()
+            elif st.session_state.get('pacote_importado'):
+                dialogo_importacao_pacote()
+
             st.header(f"Avaliação: {st.session_state.municipio} - {st.session_state.segmento}")
             
             if st.session_state.segmento not in matriz_completa:
@@ -379,123 +523,55 @@ if matriz_completa:
             
             current_results = calcular_indice_e_selo(st.session_state.respostas, matriz_perguntas_segmento)
             st.info(f"**Índice Geral de Transparência:** {current_results['indice']:.2f}% | **Selo Atricon:** {current_results['selo']}")
+            st.caption(f"Regras de pontuação: {current_results['regras']}")
 
-            for secao, perguntas in matriz_perguntas_segmento.items():
-                if secao == "Municipios_MA": continue
-                
-                section_button_key = f"btn_section_{secao}"
-                score_secao_atendimento = calcular_pontuacao_secao(st.session_state.respostas, perguntas, secao)
-                
-                # Botão para o tópico com porcentagem e on_click para gerenciar o acordeão
-                if st.button(f"**{secao}** - {score_secao_atendimento:.2f}%", key=section_button_key, use_container_width=True, on_click=handle_section_button_click, args=(section_button_key,)):
-                    pass # O clique é gerenciado pelo on_click
-                
-                # Exibe o conteúdo do tópico APENAS SE A CHAVE DO BOTÃO ESTIVER NO open_expander_key
-                if st.session_state.open_expander_key == section_button_key:
-                    # Usamos st.container para agrupar o conteúdo que seria do expander
-                    with st.container(border=True):
-                        st.markdown("---") # Linha separadora visualmente
-
-                        for item in perguntas:
-                            st.markdown(f"#### {item['topico']} - {item['criterio']}"); st.markdown("---")
-                            
-                            col_link_ui, _ = st.columns([1, 1])
-                            with col_link_ui:
-                                st.subheader("Links de Evidência")
-                                chave_links = f"{secao}_{item['criterio']}_links"
-                                if chave_links not in st.session_state.respostas:
-                                    st.session_state.respostas[chave_links] = []
-                                
-                                for i, link in enumerate(st.session_state.respostas[chave_links]):
-                                    link_cols = st.columns([10, 1])
-                                    link_cols[0].info(link)
-                                    if link_cols[1].button("X", key=f"rem_{chave_links}_{i}"): 
-                                        st.session_state.respostas[chave_links].pop(i)
-                                        st.rerun()
-                            
-                            link_cols = st.columns([10, 1])
-                            novo_link_key = f"add_{chave_links}"
-                            novo_link = link_cols[0].text_input("Adicionar novo link", value="", key=novo_link_key, label_visibility="collapsed")
-                            if link_cols[1].button("➕", key=f"btn_{chave_links}"):
-                                if novo_link and novo_link not in st.session_state.respostas[chave_links]:
-                                    st.session_state.respostas[chave_links].append(novo_link)
-                                    st.rerun()
-
-
-                            # AQUI: A seção "Critérios de Avaliação" deve ser renderizada para CADA ITEM.
-                            st.markdown("---"); st.subheader("Critérios de Avaliação")
-                            subcriterios = item["subcriterios"]
-                            
-                            # --- Renderização de Disponibilidade ---
-                            chave_disponibilidade_resposta = f"{secao}_{item['criterio']}_Disponibilidade"
-                            current_disponibilidade_status = st.session_state.respostas.get(chave_disponibilidade_resposta, "Atende")
-
-                            cols_disp = st.columns([1, 2])
-                            with cols_disp[0]:
-                                st.radio("Disponibilidade", ("Atende", "Não Atende"), 
-                                         index=1 if current_disponibilidade_status == "Não Atende" else 0, 
-                                         key=chave_disponibilidade_resposta, 
-                                         horizontal=True, 
-                                         on_change=on_disponibilidade_change, 
-                                         kwargs=dict(secao=secao, criterio=item['criterio'], subcriterios=subcriterios))
-                            
-                            if current_disponibilidade_status == "Não Atende":
-                                with cols_disp[1]:
-                                    chave_obs_disp = f"{chave_disponibilidade_resposta}_obs"
-                                    obs_disp = st.text_area("Observação:", value=st.session_state.respostas.get(chave_obs_disp, ""), key=chave_obs_disp)
-                                    st.session_state.respostas[chave_obs_disp] = obs_disp
-                                    
-                            # --- Renderização de Outros Subcritérios ---
-                            # Estes aparecem sempre na UI, independentemente do status de Disponibilidade.
-                            for subcriterio in subcriterios:
-                                if subcriterio == "Disponibilidade":
-                                    continue # Já tratamos acima
-                                
-                                cols_sub = st.columns([1, 2])
-                                chave_resposta_sub = f"{secao}_{item['criterio']}_{subcriterio}"
-                                
-                                with cols_sub[0]:
-                                    resposta_atual_sub = st.session_state.respostas.get(chave_resposta_sub, "Atende")
-                                    
-                                    # AQUI: A desabilitação é controlada pelo status de Disponibilidade
-                                    disabled_by_disponibilidade = (current_disponibilidade_status == "Não Atende")
-                                    
-                                    display_index = 1 if resposta_atual_sub == "Não Atende" else 0
-
-                                    st.radio(subcriterio, ("Atende", "Não Atende"), 
-                                             index=display_index, 
-                                             key=chave_resposta_sub, 
-                                             horizontal=True, 
-                                             disabled=disabled_by_disponibilidade) # Aplica o disabled aqui
-                                        
-                                # EXIBIR CAMPO DE OBSERVAÇÃO PARA OUTROS CRITÉRIOS SE "NÃO ATENDE"
-                                if st.session_state.respostas.get(chave_resposta_sub) == "Não Atende":
-                                    with cols_sub[1]:
-                                        chave_obs_sub = f"{chave_resposta_sub}_obs"
-                                        obs_sub = st.text_area("Observação:", value=st.session_state.respostas.get(chave_obs_sub, ""), key=chave_obs_sub, disabled=disabled_by_disponibilidade) # Aplica o disabled aqui também
-                                        st.session_state.respostas[chave_obs_sub] = obs_sub
-                                        
-                            st.markdown("---") # Mantém esse separador após o item completo
+            with st.expander("📊 Gráficos da avaliação"):
+                cols_graficos = st.columns([2, 3])
+                cols_graficos[0].html(grafico_selo(current_results['indice'], current_results['selo']))
+                cols_graficos[1].html(grafico_secoes(pontuacoes_por_secao(st.session_state.respostas, matriz_perguntas_segmento)))
+
+            with st.expander("🎯 O que corrigir primeiro? (simulação de selos)"):
+                plano = plano_de_melhoria(st.session_state.respostas, matriz_perguntas_segmento)
+                cols_metas = st.columns(len(plano['metas']))
+                for col_meta, meta in zip(cols_metas, plano['metas']):
+                    col_meta.metric(meta['selo'], "Alcançado" if meta['ja_alcancado'] else f"{len(meta['itens'])} item(ns)")
+                for item in plano['ranking'][:10]:
+                    st.markdown(f"- **+{item['ganho']:.2f} p.p.** · {item['topico']} - {item['criterio']} ({item['classificacao']}) · *{', '.join(item['subcriterios_pendentes'])}*")
+
+            with st.expander("⚡ Ações em lote", expanded=bool(st.session_state.get('aviso_lote'))):
+                renderizar_acoes_em_lote(matriz_completa)
+
+            renderizar_secoes(matriz_perguntas_segmento)
             
             st.sidebar.header("Ações")
             if st.sidebar.button("💾 Salvar Progresso"):
                 try:
-                    with open(st.session_state.caminho_arquivo, 'w', encoding='utf-8') as f: 
-                        json.dump(st.session_state.respostas, f, ensure_ascii=False, indent=4)
-                    st.session_state.last_save_time = datetime.now()
+                    salvar_progresso()
                     st.sidebar.success("Progresso salvo!")
+                except ConflitoDeVersao as e:
+                    st.session_state.conflito_salvamento = e
+                    st.rerun()
                 except Exception as e:
                     st.sidebar.error(f"Erro ao salvar progresso: {e}")
+            renderizar_pacote_offline()
 
             st.sidebar.markdown("##### Tipo de Relatório")
             tipo_relatorio = st.sidebar.radio("Escolha o tipo:", ("Apenas Não Conformidades", "Relatório Completo"), label_visibility="collapsed")
+            incluir_plano_melhoria = st.sidebar.checkbox("Incluir plano de melhoria (simulação de selos)")
+            if st.sidebar.toggle("👁️ Prévia do relatório", key="mostrar_previa", help="Mostra abaixo das seções o conteúdo do relatório, atualizado a cada resposta."):
+                st.divider()
+                st.subheader("👁️ Prévia do relatório")
+                st.html(html_relatorio(st.session_state.respostas, st.session_state.municipio, st.session_state.segmento, matriz_perguntas_segmento,
+                                       st.session_state["name"], config['credentials']['usernames'][st.session_state['username']], incluir_plano_melhoria))
             
             if st.sidebar.button("📊 Gerar Relatório PDF"):
                 with st.spinner("Gerando relatório PDF..."):
                     try:
-                        with open(st.session_state.caminho_arquivo, 'w', encoding='utf-8') as f: 
-                            json.dump(st.session_state.respostas, f, ensure_ascii=False, indent=4)
-                        st.session_state.last_save_time = datetime.now()
+                        salvar_progresso()
+                    except ConflitoDeVersao as e:
+                        st.session_state.conflito_salvamento = e
+                        dialogo_conflito_salvamento()
+                        st.stop()
                     except Exception as e:
                         st.error(f"Erro ao salvar antes de gerar relatório: {e}")
                         st.stop() 
@@ -503,14 +579,15 @@ if matriz_completa:
                     st.session_state.path_pdf = None
                     st.session_state.fallback_docx_path = None
                     
-                    docx_output_path, pdf_output_path = gerar_relatorio_novo_modelo(
+                    docx_output_path, pdf_output_path = gerar_relatorio_pela_interface(
                         st.session_state.respostas, 
                         st.session_state.municipio, 
                         st.session_state.segmento, 
                         matriz_completa[st.session_state.segmento], 
                         tipo_relatorio, 
                         st.session_state["name"], 
-                        config['credentials']['usernames'][st.session_state['username']]
+                        config['credentials']['usernames'][st.session_state['username']],
+                        incluir_plano_melhoria
                     )
                     
                     st.session_state.path_pdf = pdf_output_path
@@ -523,7 +600,7 @@ if matriz_completa:
                 
                 st.rerun()
 
-            if st.session_state.get('path_pdf'):
+            if st.session_state.get('path_pdf') and os.path.exists(st.session_state.path_pdf):
                 with open(st.session_state.path_pdf, "rb") as pdf_file:
                     st.sidebar.download_button(
                         label="⬇️ Baixar Relatório (.pdf)", 
@@ -533,7 +610,7 @@ if matriz_completa:
                         key="download_pdf"
                     )
             
-            if st.session_state.get('fallback_docx_path'):
+            if st.session_state.get('fallback_docx_path') and os.path.exists(st.session_state.fallback_docx_path):
                 with open(st.session_state.fallback_docx_path, "rb") as docx_file:
                     st.sidebar.download_button(
                         label="⬇️ Baixar Arquivo Word (.docx)", 
@@ -330,7 +330,7 @@ if matriz_completa:
         MUNICIPIOS_MARANHAO = ["- Selecione um município -"] + sorted(matriz_completa.get("Municipios_MA", []))
         municipio = st.sidebar.selectbox("Nome do Município", options=MUNICIPIOS_MARANHAO, key="select_municipio")
         
-        opcoes_segmento = [key for key in matriz_completa.keys() if key != "Municipios_MA"]
+        opcoes_segmento = [key for key in matriz_completa.keys() if key != "Municipios_MA" and not key.startswith("_")]
         segmento = st.sidebar.selectbox("Órgão/Poder", opcoes_segmento, key="select_segmento")
         
         if municipio != "- Selecione um município -" and segmento:
@@ -0,0 +1,300 @@
+# --- teste_carga.py ---
+"""Teste de carga: simula N avaliadores simultâneos e mede cada fase do uso.
+
+Cada sessão simulada percorre a sequência realista: login, abrir um município, alternar respostas,
+adicionar links, salvar e gerar o relatório. Todas as sessões executam a mesma fase ao mesmo tempo
+(com uma barreira entre as fases), o que permite atribuir CPU e memória a cada fase.
+
+Modos:
+    apptest - roda o próprio sistema_final.py com o AppTest do Streamlit, em uma pasta temporária
+              (as avaliações geradas não tocam em data/avaliacoes);
+    api     - dispara as mesmas fases contra um api.py em execução (--url e --token).
+
+Para cada fase são informados: chamadas, erros, latência p50/p90/p99/máx (ms), vazão (chamadas/s),
+CPU (s) e memória residente (MB) - no modo apptest, somadas entre os processos das sessões.
+Com --json o resultado é gravado para comparação entre versões.
+
+Uso:
+    python teste_carga.py --sessoes 8
+    python teste_carga.py --modo api --url http://127.0.0.1:8600 --token <token> --sessoes 32
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:  # psutil é opcional: sem ele a memória é a máxima do processo (ru_maxrss)
+    psutil = None
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from municipios import ARQUIVO_MUNICIPIOS
+from nucleo import ARQUIVO_CRITERIOS, CHAVE_MUNICIPIOS, carregar_criterios, chave_resposta, iterar_itens
+
+FASES = ("login", "abrir_municipio", "alternar_respostas", "adicionar_links", "salvar", "gerar_relatorio")
+ARQUIVOS_DO_APP = ("sistema_final.py", ARQUIVO_CRITERIOS, "regras_pontuacao.json", "config.yaml", "modelos_relatorio.json",
+                   "modelo_padrao.docx", "modelo_timbrado.docx", "modelo_assesi.docx", ARQUIVO_MUNICIPIOS)
+
+
+# --- MEDIÇÃO ---
+def memoria_mb():
+    if psutil:
+        return psutil.Process().memory_info().rss / 2**20
+    if resource:
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo / 2**20 if sys.platform == "darwin" else maximo / 1024
+    return 0.0
+
+def cpu_processo():
+    tempos = os.times()
+    return tempos.user + tempos.system
+
+def percentil(valores, p):
+    if not valores: return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+class Medidor:
+    """Acumula latências por fase e fotografa CPU/memória no início e no fim de cada fase.
+
+    Quando as sessões rodam em processos próprios, cada uma informa seus recursos (CPU, memória no
+    início e no fim da fase) e o resumo soma os processos; senão vale a medição do processo atual.
+    """
+    def __init__(self):
+        self.latencias = {f: [] for f in FASES}
+        self.erros = {f: [] for f in FASES}
+        self.recursos = {f: [] for f in FASES}
+        self.janelas = {}
+        self._trava = threading.Lock()
+
+    def iniciar_fase(self, fase):
+        self.janelas[fase] = {"inicio": time.perf_counter(), "cpu": cpu_processo(), "memoria_inicio": memoria_mb()}
+
+    def encerrar_fase(self, fase):
+        janela = self.janelas[fase]
+        janela.update(duracao=time.perf_counter() - janela["inicio"], cpu=cpu_processo() - janela["cpu"], memoria_fim=memoria_mb())
+
+    def registrar(self, fase, segundos, erro=None, recursos=None):
+        with self._trava:
+            self.latencias[fase].append(segundos)
+            if erro: self.erros[fase].append(str(erro))
+            if recursos: self.recursos[fase].append(recursos)
+
+    def resumo(self):
+        linhas = []
+        for fase in FASES:
+            if fase not in self.janelas: continue
+            lat, janela = [s * 1000 for s in self.latencias[fase]], dict(self.janelas[fase])
+            if self.recursos[fase]:
+                cpus, inicios, fins = zip(*self.recursos[fase])
+                janela.update(cpu=sum(cpus), memoria_inicio=sum(inicios), memoria_fim=sum(fins))
+            linhas.append({
+                "fase": fase, "chamadas": len(lat), "erros": len(self.erros[fase]),
+                "p50_ms": percentil(lat, 50), "p90_ms": percentil(lat, 90), "p99_ms": percentil(lat, 99),
+                "max_ms": max(lat, default=0.0),
+                "vazao_por_s": len(lat) / janela["duracao"] if janela["duracao"] else 0.0,
+                "cpu_s": janela["cpu"], "memoria_mb": janela["memoria_fim"],
+                "memoria_delta_mb": janela["memoria_fim"] - janela["memoria_inicio"],
+            })
+        return linhas
+
+
+def imprimir_resumo(linhas, medidor):
+    colunas = ("fase", "chamadas", "erros", "p50_ms", "p90_ms", "p99_ms", "max_ms", "vazao_por_s", "cpu_s", "memoria_mb", "memoria_delta_mb")
+    print(" | ".join(f"{c:>16}" for c in colunas))
+    for linha in linhas:
+        print(" | ".join(f"{linha[c]:>16.1f}" if isinstance(linha[c], float) else f"{linha[c]:>16}" for c in colunas))
+    for fase, erros in medidor.erros.items():
+        for erro in sorted(set(erros))[:3]:
+            print(f"  [{fase}] {erro}")
+
+
+def alvos_da_sessao(matriz_completa, n):
+    """Município e respostas que a sessão n vai alternar (sessões diferentes usam municípios diferentes)."""
+    municipios = sorted(matriz_completa.get(CHAVE_MUNICIPIOS, []))
+    itens = list(iterar_itens(matriz_completa["Prefeitura"]))
+    escolhidos = [itens[(n * 7 + i * 13) % len(itens)] for i in range(5)]
+    return municipios[n % len(municipios)], escolhidos
+
+
+# --- MODO APPTEST (Streamlit) ---
+# O AppTest não é seguro entre threads (cada execução cria e desfaz o Runtime global), então cada
+# sessão simulada roda em um processo próprio; o processo principal só marca as fronteiras das fases.
+def clicar(at, rotulo, lateral=True):
+    botoes = at.sidebar.button if lateral else at.button
+    next(b for b in botoes if rotulo in b.label).click().run()
+
+def passo_apptest(at, sessao, fase, args, matriz_completa):
+    """Executa uma fase em uma sessão do AppTest. Devolve o AppTest (criado no login)."""
+    from streamlit.testing.v1 import AppTest
+
+    if fase == "login":
+        at = AppTest.from_file("sistema_final.py", default_timeout=args.timeout)
+        at.run()
+        at.text_input[0].input(args.usuario); at.text_input[1].input(args.senha)
+        at.button[0].click().run()
+        if not at.session_state["authentication_status"]: raise RuntimeError("login recusado")
+    elif fase == "abrir_municipio":
+        municipio, sessao["itens"] = alvos_da_sessao(matriz_completa, sessao["n"])
+        at.sidebar.selectbox(key="select_segmento").set_value("Prefeitura").run()
+        at.sidebar.selectbox(key="select_municipio").set_value(municipio).run()
+        clicar(at, "Iniciar")
+    elif fase == "alternar_respostas":
+        for secao, item in sessao["itens"]:
+            if at.session_state["open_expander_key"] != f"btn_section_{secao}":
+                at.button(key=f"btn_section_{secao}").click().run()
+            at.radio(key=chave_resposta(secao, item['criterio'], "Disponibilidade")).set_value("Não Atende").run()
+    elif fase == "adicionar_links":
+        secao, item = sessao["itens"][-1]
+        chave_links = chave_resposta(secao, item['criterio'], "links")
+        at.text_input(key=f"add_{chave_links}").input(f"https://transparencia.exemplo/{sessao['n']}").run()
+        at.button(key=f"btn_{chave_links}").click().run()
+    elif fase == "salvar":
+        clicar(at, "Salvar Progresso")
+    elif fase == "gerar_relatorio":
+        clicar(at, "Gerar Relatório")
+    if at.exception: raise RuntimeError(at.exception[0].value)
+    return at
+
+def sessao_apptest(n, args, barreira, fila):
+    """Processo de uma sessão: a cada fase espera a barreira, executa e informa latência, CPU e memória."""
+    matriz_completa = carregar_criterios()
+    sessao, at, falhou = {"n": n}, None, False
+    for fase in FASES:
+        barreira.wait()
+        inicio, cpu_inicio, memoria_inicio = time.perf_counter(), cpu_processo(), memoria_mb()
+        erro = "fase anterior falhou" if falhou else None
+        if not falhou:
+            try:
+                at = passo_apptest(at, sessao, fase, args, matriz_completa)
+            except Exception as e:
+                erro, falhou = f"{type(e).__name__}: {e}", True
+        fila.put((fase, time.perf_counter() - inicio, erro, (cpu_processo() - cpu_inicio, memoria_inicio, memoria_mb())))
+        barreira.wait()
+
+def executar_fases_apptest(args, medidor):
+    contexto = multiprocessing.get_context()
+    barreira, fila = contexto.Barrier(args.sessoes + 1), contexto.Queue()
+    processos = [contexto.Process(target=sessao_apptest, args=(n, args, barreira, fila), daemon=True)
+                 for n in range(args.sessoes)]
+    for processo in processos: processo.start()
+    try:
+        for fase in FASES:
+            barreira.wait(timeout=args.timeout * 10)
+            medidor.iniciar_fase(fase)
+            barreira.wait(timeout=args.timeout * 10)
+            medidor.encerrar_fase(fase)
+            for _ in range(args.sessoes):
+                medidor.registrar(*fila.get(timeout=args.timeout))
+    except (threading.BrokenBarrierError, queue.Empty):
+        print("Sessões não concluíram a fase dentro do tempo limite; resultados parciais.", file=sys.stderr)
+    finally:
+        for processo in processos:
+            processo.join(timeout=5)
+            if processo.is_alive(): processo.terminate()
+
+
+# --- MODO API ---
+async def executar_fases_api(args, medidor):
+    import aiohttp
+
+    matriz_completa = carregar_criterios()
+    cabecalhos = {"Authorization": f"Bearer {args.token}"}
+
+    async def chamada(sessao, metodo, caminho, **kwargs):
+        async with sessao.request(metodo, args.url.rstrip("/") + caminho, headers=cabecalhos, **kwargs) as r:
+            if r.status >= 400: raise RuntimeError(f"{metodo} {caminho}: HTTP {r.status}")
+            return await r.json() if r.content_type == "application/json" else await r.read()
+
+    async def passo(sessao, n, fase, estado):
+        base = f"/avaliacoes/Prefeitura/{estado['municipio']}"
+        if fase == "login":
+            await chamada(sessao, "GET", "/saude")
+        elif fase == "abrir_municipio":
+            estado["avaliacao"] = await chamada(sessao, "GET", base)
+        elif fase == "alternar_respostas":
+            for secao, item in estado["itens"]:
+                await chamada(sessao, "PATCH", base, json={"respostas": {chave_resposta(secao, item['criterio'], "Disponibilidade"): "Não Atende"}})
+        elif fase == "adicionar_links":
+            secao, item = estado["itens"][-1]
+            await chamada(sessao, "PATCH", base, json={"respostas": {chave_resposta(secao, item['criterio'], "links"): [f"https://transparencia.exemplo/{n}"]}})
+        elif fase == "salvar":
+            atual = await chamada(sessao, "GET", base)
+            await chamada(sessao, "PUT", base, json={"respostas": atual["respostas"]})
+        elif fase == "gerar_relatorio":
+            trabalho = await chamada(sessao, "POST", base + "/relatorios", json={})
+            while trabalho["status"] not in ("concluido", "erro"):
+                await asyncio.sleep(0.1)
+                trabalho = await chamada(sessao, "GET", trabalho["url"])
+            if trabalho["status"] == "erro": raise RuntimeError(trabalho.get("erro"))
+
+    estados = []
+    for n in range(args.sessoes):
+        municipio, itens = alvos_da_sessao(matriz_completa, n)
+        estados.append({"municipio": municipio, "itens": itens})
+
+    async def medir(sessao, n, fase):
+        inicio = time.perf_counter()
+        try:
+            await passo(sessao, n, fase, estados[n])
+            medidor.registrar(fase, time.perf_counter() - inicio)
+        except Exception as e:
+            medidor.registrar(fase, time.perf_counter() - inicio, e)
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=args.timeout)) as sessao:
+        for fase in FASES:
+            medidor.iniciar_fase(fase)
+            await asyncio.gather(*(medir(sessao, n, fase) for n in range(args.sessoes)))
+            medidor.encerrar_fase(fase)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simula avaliadores simultâneos e mede latência, vazão, CPU e memória por fase.")
+    parser.add_argument("--modo", choices=("apptest", "api"), default="apptest")
+    parser.add_argument("--sessoes", type=int, default=4)
+    parser.add_argument("--usuario", default="assesi", help="Usuário de config.yaml usado no login (modo apptest).")
+    parser.add_argument("--senha", default="assesi")
+    parser.add_argument("--url", default="http://127.0.0.1:8600", help="Endereço do api.py (modo api).")
+    parser.add_argument("--token", help="Token da API (modo api).")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", help="Grava o resumo em JSON neste arquivo.")
+    args = parser.parse_args()
+    if args.modo == "api" and not args.token:
+        parser.error("--modo api exige --token.")
+
+    medidor = Medidor()
+    saida_json = os.path.abspath(args.json) if args.json else None
+    if args.modo == "apptest":
+        # Roda em uma cópia do app para não misturar as avaliações simuladas com as reais.
+        origem, pasta = os.getcwd(), tempfile.mkdtemp(prefix="teste_carga_")
+        for arquivo in ARQUIVOS_DO_APP + tuple(f for f in os.listdir(origem) if f.endswith(".py")):
+            if os.path.exists(arquivo): shutil.copy(arquivo, pasta)
+        os.chdir(pasta); sys.path.insert(0, pasta)
+        try:
+            executar_fases_apptest(args, medidor)
+        finally:
+            os.chdir(origem); shutil.rmtree(pasta, ignore_errors=True)
+    else:
+        asyncio.run(executar_fases_api(args, medidor))
+
+    linhas = medidor.resumo()
+    print(f"Modo {args.modo}, {args.sessoes} sessão(ões) simultânea(s):")
+    imprimir_resumo(linhas, medidor)
+    if saida_json:
+        with open(saida_json, 'w', encoding='utf-8') as f:
+            json.dump({"modo": args.modo, "sessoes": args.sessoes, "fases": linhas}, f, ensure_ascii=False, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+# --- tests/test_relatorios_em_lote.py ---
+"""Regressão de memória da geração de relatórios (python -m pytest tests, na raiz do projeto).
+
+Gera 500 relatórios sintéticos em um só processo (alguns minutos); para uma verificação rápida durante o
+desenvolvimento: RELATORIOS_VERIFICACAO_MEMORIA=60 python -m pytest tests
+"""
+import os
+
+from relatorios_em_lote import verificar_memoria
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RELATORIOS = int(os.environ.get("RELATORIOS_VERIFICACAO_MEMORIA", "500"))
+
+
+def test_memoria_estavel_sem_reciclar_processo(monkeypatch):
+    monkeypatch.chdir(RAIZ)
+    resumo, _ = verificar_memoria(RELATORIOS, processos=1, tolerancia_mb=20.0)
+    assert resumo["falhas"] == 0
+    assert resumo["relatorios_do_processo"] == RELATORIOS  # um só processo, nunca reciclado
+    assert resumo["crescimento_retido_mb"] <= 20.0, resumo
+    assert resumo["crescimento_rss_mb"] <= 20.0, resumo
@@ -0,0 +1,127 @@
+# --- validar_avaliacoes.py ---
+"""Confere todos os arquivos de avaliação contra o modelo de critérios e, opcionalmente, os compacta.
+
+Para cada arquivo são contadas as chaves:
+  - órfãs: não existem mais no modelo (critério reescrito ou removido; ver migrar_criterios.py);
+  - inválidas: status diferente de "Atende"/"Não Atende", observação que não é texto, links que não são lista;
+  - faltantes: subcritérios sem resposta (contam como "Atende" na pontuação);
+  - redundantes: observações vazias e listas de links vazias, iguais ao valor padrão da interface.
+
+Com --compactar, as chaves redundantes são removidas (e as órfãs também, com --remover-orfas),
+gravando sob a mesma trava e controle de versão do app. A verificação roda em um pool de processos.
+
+Uso:
+    python validar_avaliacoes.py
+    python validar_avaliacoes.py --compactar --remover-orfas --saida validacao.csv
+"""
+import argparse
+import csv
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import compressao
+from nucleo import (
+    ARQUIVO_CRITERIOS, PASTA_AVALIACOES, ConflitoDeVersao, TravaIndisponivel, carregar_avaliacao_com_meta,
+    carregar_criterios, listar_arquivos_avaliacao, resolver_entidade, salvar_avaliacao, segmentos,
+    tipos_de_chave, validar_respostas,
+)
+
+USUARIO_COMPACTACAO = "compactacao"
+CAMPOS_META_PRESERVADOS = ("regras", "indice", "selo", "criterios")
+
+# Estado de cada processo do pool (preenchido por _inicializar_worker).
+_MATRIZ_COMPLETA = None
+_TIPOS = {}
+
+
+def _inicializar_worker(matriz_completa):
+    global _MATRIZ_COMPLETA
+    _MATRIZ_COMPLETA = matriz_completa
+    _TIPOS.clear()
+
+def _tipos(segmento):
+    if segmento not in _TIPOS: _TIPOS[segmento] = tipos_de_chave(_MATRIZ_COMPLETA[segmento])
+    return _TIPOS[segmento]
+
+def redundante(tipo, valor):
+    """Valor igual ao padrão da interface (observação vazia, nenhum link): pode ser omitido do arquivo."""
+    return (tipo == "obs" and valor == "") or (tipo == "links" and valor == [])
+
+def verificar_respostas(respostas, segmento):
+    """Classifica as chaves das respostas. Devolve (órfãs, erros de valor, faltantes, redundantes)."""
+    tipos = _tipos(segmento)
+    orfas = [chave for chave in respostas if chave not in tipos]
+    conhecidas = {chave: valor for chave, valor in respostas.items() if chave in tipos}
+    erros = validar_respostas(conhecidas, _MATRIZ_COMPLETA[segmento])
+    faltantes = [chave for chave, tipo in tipos.items() if tipo == "status" and chave not in respostas]
+    redundantes = [chave for chave, valor in conhecidas.items() if redundante(tipos[chave], valor)]
+    return orfas, erros, faltantes, redundantes
+
+def validar_arquivo(caminho, segmento, compactar=False, remover_orfas=False):
+    """Valida (e compacta, se pedido) um arquivo. Devolve a linha do relatório."""
+    linha = {"arquivo": caminho, "segmento": segmento, "situacao": "ok", "orfas": 0, "invalidas": 0,
+             "faltantes": 0, "redundantes": 0, "removidas": 0, "exemplos": ""}
+    try:
+        respostas, meta = carregar_avaliacao_com_meta(caminho)
+    except (OSError, ValueError, compressao.ErroCompressao) as e:
+        linha["situacao"] = f"ilegível: {e}"
+        return linha
+    orfas, erros, faltantes, redundantes = verificar_respostas(respostas, segmento)
+    linha.update(orfas=len(orfas), invalidas=len(erros), faltantes=len(faltantes), redundantes=len(redundantes),
+                 exemplos=" | ".join(erros[:3] + [f"Chave desconhecida: '{c}'." for c in orfas[:3 - min(len(erros), 3)]]))
+    if erros or orfas: linha["situacao"] = "com problemas"
+
+    remover = set(redundantes) | (set(orfas) if remover_orfas else set())
+    if compactar and remover:
+        try:
+            salvar_avaliacao(caminho, {k: v for k, v in respostas.items() if k not in remover}, meta, USUARIO_COMPACTACAO,
+                             {campo: meta[campo] for campo in CAMPOS_META_PRESERVADOS if campo in meta})
+            linha["removidas"] = len(remover)
+        except (ConflitoDeVersao, TravaIndisponivel) as e:
+            linha["situacao"] = f"não compactado: {e}"
+    return linha
+
+def _validar_arquivo_args(args):
+    return validar_arquivo(*args)
+
+def validar_pasta(matriz_completa, pasta=PASTA_AVALIACOES, compactar=False, remover_orfas=False, processos=None):
+    """Valida todos os arquivos da pasta em paralelo. Devolve uma linha do relatório por arquivo."""
+    tarefas, linhas = [], []
+    for caminho, segmento, municipio, _ in listar_arquivos_avaliacao(pasta):
+        segmento, _ = resolver_entidade(matriz_completa, segmento, municipio)
+        if segmento in segmentos(matriz_completa):
+            tarefas.append((caminho, segmento, compactar, remover_orfas))
+        else:
+            linhas.append({"arquivo": caminho, "segmento": segmento, "situacao": "segmento desconhecido"})
+    with ProcessPoolExecutor(max_workers=processos, initializer=_inicializar_worker, initargs=(matriz_completa,)) as executor:
+        linhas += executor.map(_validar_arquivo_args, tarefas, chunksize=max(1, len(tarefas) // 64))
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida os arquivos de avaliação contra o modelo de critérios.")
+    parser.add_argument("--pasta", default=PASTA_AVALIACOES)
+    parser.add_argument("--criterios", default=ARQUIVO_CRITERIOS)
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--compactar", action="store_true", help="Remove observações e listas de links vazias.")
+    parser.add_argument("--remover-orfas", action="store_true", help="Com --compactar, remove também as chaves órfãs.")
+    parser.add_argument("--saida", default="validacao_avaliacoes.csv")
+    args = parser.parse_args()
+
+    linhas = validar_pasta(carregar_criterios(args.criterios), args.pasta, args.compactar, args.remover_orfas, args.processos)
+    campos = ["arquivo", "segmento", "situacao", "orfas", "invalidas", "faltantes", "redundantes", "removidas", "exemplos"]
+    with open(args.saida, 'w', encoding='utf-8-sig', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=campos, delimiter=";", restval="")
+        escritor.writeheader(); escritor.writerows(linhas)
+
+    situacoes = Counter(l["situacao"].split(":")[0] for l in linhas)
+    totais = {campo: sum(l.get(campo, 0) for l in linhas) for campo in ("orfas", "invalidas", "faltantes", "redundantes", "removidas")}
+    print(f"{len(linhas)} arquivo(s): " + ", ".join(f"{n} {situacao}" for situacao, n in situacoes.most_common()) + ".")
+    print("Chaves " + ", ".join(f"{campo}: {n}" for campo, n in totais.items()) + f". Detalhes em: {args.saida}")
+    if totais["invalidas"] or situacoes.get("ilegível"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()